@@ -0,0 +1,162 @@
+import threading
+from utils.store import collection, subscribe
+
+def _amount(value):
+    return round(value, 6)
+
+# --- Per-recipe Aggregates ---
+class RecipeAggregates:
+    """Memoized cost and nutrition per recipe, at the recipe's own servings.
+    An entry is dropped when its recipe changes or when any ingredient it
+    references changes (or is created/deleted), so unrelated writes keep
+    the rest of the user's entries warm."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._deps = {}
+        self._events = {}
+        self._epoch = 0
+        subscribe(self._on_change)
+
+    def _on_change(self, name, op, user_id, record_id, record):
+        if op == "reset":
+            if name in (None, "recipes", "ingredients"):
+                with self._lock:
+                    if user_id is not None:
+                        self._drop_user(user_id)
+                        self._bump(user_id)
+                    else:
+                        self._entries.clear()
+                        self._deps.clear()
+                        self._events.clear()
+                        self._epoch += 1
+            return
+        with self._lock:
+            if name == "recipes":
+                self._drop(user_id, record_id)
+            elif name == "ingredients":
+                for recipe_id in list(self._deps.get((user_id, record_id), ())):
+                    self._drop(user_id, recipe_id)
+            else:
+                return
+            self._bump(user_id)
+
+    def _bump(self, user_id):
+        self._events[user_id] = self._events.get(user_id, 0) + 1
+
+    def _drop(self, user_id, recipe_id):
+        entry = self._entries.pop((user_id, recipe_id), None)
+        if entry is None:
+            return
+        for ingredient_id in entry["_deps"]:
+            dependents = self._deps.get((user_id, ingredient_id))
+            if dependents is not None:
+                dependents.discard(recipe_id)
+                if not dependents:
+                    del self._deps[(user_id, ingredient_id)]
+
+    def _drop_user(self, user_id):
+        for key in [k for k in self._entries if k[0] == user_id]:
+            self._drop(*key)
+
+    def _store(self, user_id, seen, computed):
+        # Skip the insert if a write raced the computation
+        with self._lock:
+            if seen != (self._epoch, self._events.get(user_id, 0)):
+                return
+            for recipe_id, entry in computed.items():
+                self._drop(user_id, recipe_id)
+                self._entries[(user_id, recipe_id)] = entry
+                for ingredient_id in entry["_deps"]:
+                    self._deps.setdefault((user_id, ingredient_id), set()).add(recipe_id)
+
+    def _seen(self, user_id):
+        with self._lock:
+            return (self._epoch, self._events.get(user_id, 0))
+
+    # --- Queries ---
+    def for_recipe(self, user_id, recipe):
+        entry = self._entries.get((user_id, recipe["id"]))
+        if entry is None:
+            seen = self._seen(user_id)
+            ingredients = collection("ingredients")
+            lookup = {
+                ri["ingredientId"]: ingredients.get_for_user(user_id, ri["ingredientId"])
+                for ri in recipe.get("ingredients", [])
+            }
+            entry = _compute(recipe, lookup)
+            self._store(user_id, seen, {recipe["id"]: entry})
+        return entry
+
+    def for_user(self, user_id):
+        """{recipe id: aggregate} for all of the user's recipes; missing ones
+        are computed in one pass over a single read of the user's stock."""
+        recipes = collection("recipes").for_user(user_id)
+        result = {r["id"]: self._entries.get((user_id, r["id"])) for r in recipes}
+        stale = [r for r in recipes if result[r["id"]] is None]
+        if stale:
+            seen = self._seen(user_id)
+            lookup = {i["id"]: i for i in collection("ingredients").iter_for_user(user_id)}
+            computed = {r["id"]: _compute(r, lookup) for r in stale}
+            self._store(user_id, seen, computed)
+            result.update(computed)
+        return result
+
+def _compute(recipe, lookup):
+    cost = 0.0
+    nutrition = {}
+    lines = []
+    missing_cost = []
+    missing = []
+    servings = recipe.get("servings")
+    for ri in recipe.get("ingredients", []):
+        ingredient = lookup.get(ri["ingredientId"])
+        quantity = ri.get("quantity", 0)
+        line = {"ingredientId": ri["ingredientId"], "quantity": quantity}
+        lines.append(line)
+        if ingredient is None:
+            missing.append(ri["ingredientId"])
+            continue
+        line.update(name=ingredient.get("name"), unit=ingredient.get("unit"))
+        unit_cost = ingredient.get("unitCost")
+        if unit_cost is None:
+            missing_cost.append(ri["ingredientId"])
+        else:
+            line["cost"] = unit_cost * quantity
+            cost += line["cost"]
+        for nutrient, per_unit in (ingredient.get("nutrition") or {}).items():
+            nutrition[nutrient] = nutrition.get(nutrient, 0) + per_unit * quantity
+    return {
+        "servings": servings if isinstance(servings, (int, float)) and servings > 0 else 1,
+        "ingredients": lines,
+        "cost": cost,
+        "nutrition": nutrition,
+        "missingCost": missing_cost,
+        "missingIngredients": missing,
+        "_deps": frozenset(ri["ingredientId"] for ri in recipe.get("ingredients", [])),
+    }
+
+def scaled(entry, servings=None):
+    """The aggregate as an API payload, scaled from the recipe's servings."""
+    base = entry["servings"]
+    servings = base if servings is None else servings
+    factor = servings / base
+    return {
+        "servings": servings,
+        "scale": _amount(factor),
+        "ingredients": [
+            dict(line, quantity=_amount(line["quantity"] * factor),
+                 **({"cost": _amount(line["cost"] * factor)} if "cost" in line else {}))
+            for line in entry["ingredients"]
+        ],
+        # Partial when some ingredient has no unitCost; see missingCost
+        "totalCost": _amount(entry["cost"] * factor),
+        "costPerServing": _amount(entry["cost"] / base),
+        "nutrition": {k: _amount(v * factor) for k, v in entry["nutrition"].items()},
+        "nutritionPerServing": {k: _amount(v / base) for k, v in entry["nutrition"].items()},
+        "missingCost": list(entry["missingCost"]),
+        "missingIngredients": list(entry["missingIngredients"]),
+    }
+
+aggregates = RecipeAggregates()
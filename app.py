@@ -1,15 +1,82 @@
 from bottle import Bottle, run, request, response, abort
-from routes import home, auth, ingredients, recipes, meals
+import importlib
+import sys
+import threading
+import time
+from utils import store
 from utils.crypto import extract_user_id  
+from utils.http_cache import ConditionalGetPlugin
+from utils.idempotency import IdempotencyPlugin
+from utils.metrics import MetricsPlugin
+
+# --- Lazy Route Modules ---
+# Route modules are imported on the first request that reaches them (or by
+# warm()), not when app is imported, so a worker can answer within tens of
+# milliseconds of starting.
+ROUTE_MODULES = ("home", "auth", "ingredients", "recipes", "meals", "bulk", "health", "planner", "stock", "dashboard", "changes")
+
+def _lazy(module, name):
+    target = None
+
+    def handler(*args, **kwargs):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module), name)
+        return target(*args, **kwargs)
+
+    handler.__name__ = name
+    return handler
+
+class _LazyRoutes:
+    """Stands in for a route module: module.handler gives a callback that
+    imports the module on its first call."""
+
+    def __init__(self, module):
+        self.module = module
+
+    def __getattr__(self, name):
+        return _lazy(self.module, name)
+
+home, auth, ingredients, recipes, meals, bulk, health, planner, stock, dashboard, changes = (
+    _LazyRoutes(f"routes.{name}") for name in ROUTE_MODULES
+)
+
+def warm(background=True, data=True):
+    """Load the data files and import every route module ahead of traffic;
+    requests arriving meanwhile are served, just without the head start.
+    data=False only imports, e.g. in a supervisor about to fork workers."""
+    def load():
+        started = time.perf_counter()
+        try:
+            if data:
+                store.warm()
+            for name in ROUTE_MODULES:
+                importlib.import_module(f"routes.{name}")
+            if data:
+                # Recurring meals come due with the date, not with requests
+                importlib.import_module("routes.meals").start_materializer()
+        except Exception as e:
+            print(f"[app] warm-up failed: {e}", file=sys.stderr)
+            return
+        print(f"[app] warmed up in {(time.perf_counter() - started) * 1000:.0f} ms", file=sys.stderr)
+
+    if background:
+        threading.Thread(target=load, name="warmup", daemon=True).start()
+    else:
+        load()
 
 app = Bottle()
+app.install(MetricsPlugin())
+app.install(ConditionalGetPlugin())
+app.install(IdempotencyPlugin())
 
 # Public Routes
 PUBLIC_ROUTES = [
     "/", 
     "/api/signup", 
     "/api/login",
-    "/api/forgot-password"
+    "/api/forgot-password",
+    "/api/health"
 ]
 
 # --- Auth Middleware Route ---
@@ -26,8 +93,18 @@ def protect_routes():
         abort(401, {"success": False, "message": "Unauthorized: Missing or invalid token"})
     request.user_id = user_id
 
+# --- Shared State ---
+@app.hook('before_request')
+def sync_store():
+    # Under serve.py --workers other processes write to the same data
+    if store.MULTIPROCESS:
+        # Sharded tenants only need the requesting user's files checked
+        store.sync(getattr(request, "user_id", None))
+
 # --- Public Routes ---
 app.get("/")(home.home)
+app.get("/api/health")(health.health)
+app.get("/api/metrics")(health.metrics)
 
 # Auth Routes
 app.get("/api/signup")(lambda: {"message": "Use POST to Sign Up"})
@@ -36,38 +113,69 @@ app.get("/api/forgot-password")(lambda: {"message": "Use POST to Reset Password"
 app.post("/api/signup")(auth.signup)
 app.post("/api/login")(auth.login)
 app.post("/api/forgot-password")(auth.forgot_password)
+app.post("/api/logout")(auth.logout)
 # --- Protected Routes ---
+# GET routes list the collections their response depends on (cache=...),
+# which drives ETags and the response body cache.
 
 # Ingredient Routes
 app.post("/api/ingredients")(ingredients.add_ingredient)
-app.get("/api/ingredients/<id>")(ingredients.get_ingredient)
-app.get("/api/ingredients")(ingredients.get_ingredients)
+app.get("/api/ingredients/<id>", cache=("ingredients",))(ingredients.get_ingredient)
+app.get("/api/ingredients", cache=("ingredients",))(ingredients.get_ingredients)
 app.put("/api/ingredients/<id>")(ingredients.update_ingredient)
 app.delete("/api/ingredients/<id>")(ingredients.delete_ingredient)
-app.get("/api/ingredients/low-stock")(ingredients.get_low_stock_ingredients)
-app.get("/api/ingredients/expired")(ingredients.get_expired_ingredients)
+app.get("/api/ingredients/<id>/delete-preview", cache=("ingredients", "recipes", "meals"))(ingredients.preview_delete_ingredient)
+app.get("/api/ingredients/low-stock", cache=("ingredients",))(ingredients.get_low_stock_ingredients)
+app.get("/api/ingredients/expired", cache=("ingredients",))(ingredients.get_expired_ingredients)
+app.get("/api/ingredients/expiring", cache=("ingredients",))(ingredients.get_expiring_ingredients)
+app.post("/api/ingredients/import")(bulk.import_ingredients)
+app.get("/api/ingredients/export")(bulk.export_ingredients)
+app.get("/api/ingredients/<id>/movements", cache=("stock_movements", "ingredients"))(stock.get_movements)
+
+# Dashboard Route
+app.get("/api/dashboard", cache=("ingredients", "recipes", "meals"))(dashboard.get_dashboard)
+
+# Change Feed Routes
+app.get("/api/changes")(changes.get_changes)
+app.get("/api/changes/stream")(changes.stream_changes)
+
+# Stock Routes
+app.get("/api/stock/usage", cache=("stock_daily", "ingredients"))(stock.get_usage)
 
 # Recipe Routes
 app.post("/api/recipes")(recipes.add_recipe)
-app.get("/api/recipes/<id>")(recipes.get_recipe)
-app.get("/api/recipes")(recipes.get_recipes)
+app.get("/api/recipes/<id>", cache=("recipes",))(recipes.get_recipe)
+app.get("/api/recipes", cache=("recipes",))(recipes.get_recipes)
 app.put("/api/recipes/<id>")(recipes.update_recipe)
 app.delete("/api/recipes/<id>")(recipes.delete_recipe)
+app.get("/api/recipes/<id>/delete-preview", cache=("recipes", "meals"))(recipes.preview_delete_recipe)
+app.get("/api/recipes/<id>/summary", cache=("recipes", "ingredients"))(recipes.get_recipe_summary)
+app.get("/api/recipes/summaries", cache=("recipes", "ingredients"))(recipes.get_recipe_summaries)
+app.post("/api/recipes/import")(bulk.import_recipes)
+app.get("/api/recipes/export")(bulk.export_recipes)
 
 # Meal Routes
 app.post("/api/meals")(meals.add_meal)              
-app.get("/api/meals/<meal_id>")(meals.get_meal)     
-app.get("/api/meals")(meals.get_meals)              
+app.get("/api/meals/<meal_id>", cache=("meals",))(meals.get_meal)     
+app.get("/api/meals", cache=("meals", "meal_rules"))(meals.get_meals)              
 app.put("/api/meals/<meal_id>")(meals.update_meal)  
 app.put("/api/meals/<meal_id>/done")(meals.mark_meal_done)
 app.delete("/api/meals/<meal_id>")(meals.delete_meal)
+app.post("/api/meals/import")(bulk.import_meals)
+app.get("/api/meals/export")(bulk.export_meals)
+app.post("/api/meals/plan")(planner.plan_meals)
+app.post("/api/meals/rules")(meals.add_meal_rule)
+app.get("/api/meals/rules", cache=("meal_rules",))(meals.get_meal_rules)
+app.get("/api/meals/rules/<rule_id>", cache=("meal_rules",))(meals.get_meal_rule)
+app.put("/api/meals/rules/<rule_id>")(meals.update_meal_rule)
+app.delete("/api/meals/rules/<rule_id>")(meals.delete_meal_rule)
 
 # --- CORS Hook ---
 @app.hook('after_request')
 def enable_cors():
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Origin, Accept, Content-Type, Authorization'
+    response.headers['Access-Control-Allow-Headers'] = 'Origin, Accept, Content-Type, Authorization, Idempotency-Key, Last-Event-ID'
 
 # --- CORS Preflight Handler ---
 @app.route('/<:re:.*>', method='OPTIONS')
@@ -75,6 +183,7 @@ def options_handler():
     response.status = 200
     return ""
 
-# --- Run Server ---
+# --- Run Dev Server (production: python -m serve) ---
 if __name__ == "__main__":
+    warm()
     run(app, host='localhost', port=8000, debug=True, reloader=True)
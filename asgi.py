@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bottle import HTTPError
+from app import app as wsgi_app, warm
+from routes import health
+from utils import store
+from utils.http_cache import generation
+from utils.metrics import inc
+
+# Handlers, and with them storage reads/writes and password hashing, run on
+# this pool so the event loop only moves bytes.
+ASGI_THREADS = int(os.environ.get("BAKETRACK_ASGI_THREADS", "16"))
+MAX_BODY_BYTES = int(os.environ.get("BAKETRACK_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+# Chunks a streamed response may run ahead of the client
+STREAM_QUEUE_CHUNKS = 16
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi")
+
+# --- ASGI -> WSGI ---
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": store.MULTIPROCESS,
+        "wsgi.run_once": False,
+        # Handlers may hand back an async-iterable body here (see _produce)
+        "baketrack.async_streams": True,
+    }
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = "HTTP_" + key
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ and key.startswith("HTTP_") else value
+    return environ
+
+def _call(environ):
+    """Run the Bottle app; returns (status, headers, body iterable)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split()[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    body = wsgi_app(environ, start_response)
+    return started["status"], started["headers"], body
+
+def _produce(environ, loop, queue, stop):
+    """Run the app and iterate its body on this one pool thread. Bottle
+    encodes later str chunks with its thread-local response, and storage
+    cursors may be tied to the thread, so the body must not be pulled from
+    whichever pool thread is free. Chunks go to the event loop through the
+    bounded queue, which holds the producer back when the client is slow.
+    A body the handler put in environ["baketrack.stream"] (a change stream)
+    goes to the event loop whole: it waits there between chunks, so it
+    doesn't hold this thread for its lifetime."""
+    def put(*item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    try:
+        status, headers, iterable = _call(environ)
+    except Exception as e:
+        put("error", e)
+        return
+    stream = environ.get("baketrack.stream")
+    handed_over = False
+    try:
+        put("start", status, headers)
+        if stream is not None:
+            put("stream", stream)
+            handed_over = True
+            return
+        for chunk in iterable:
+            if stop.is_set():
+                return
+            if chunk:
+                put("body", chunk)
+        put("end")
+    except Exception as e:
+        print(f"[asgi] response body failed: {e!r}", file=sys.stderr)
+        if not stop.is_set():
+            put("error", e)
+    finally:
+        if not handed_over and hasattr(iterable, "close"):
+            iterable.close()
+
+def _call_buffered(environ):
+    status, headers, body = _call(environ)
+    try:
+        return status, headers, b"".join(body)
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+# --- Request Coalescing ---
+# Concurrent identical GETs of a cacheable route (same URL, same token, same
+# If-None-Match) share one handler run; every caller gets the same response.
+# The store generation is part of the key, so a request arriving after a
+# write never joins a run that started before it.
+_inflight = {}
+
+def _coalesce_key(environ):
+    if environ["REQUEST_METHOD"] not in ("GET", "HEAD") or "HTTP_X_PROFILE" in environ:
+        return None
+    try:
+        route, _ = wsgi_app.router.match(environ)
+    except HTTPError:
+        return None
+    if not route.config.get("cache"):
+        return None
+    return (environ["REQUEST_METHOD"], environ["PATH_INFO"], environ["QUERY_STRING"],
+            environ.get("HTTP_AUTHORIZATION"), environ.get("HTTP_IF_NONE_MATCH"), generation()), route.rule
+
+async def _shared(environ, key, rule):
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(_executor, _call_buffered, environ)
+        _inflight[key] = future
+        future.add_done_callback(lambda f: _inflight.pop(key) if _inflight.get(key) is f else None)
+    else:
+        inc("baketrack_coalesced_requests_total", route=rule)
+    # A caller that disconnects must not cancel the run the others wait on
+    return await asyncio.shield(future)
+
+# --- Application ---
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return False
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+async def _http(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    if body is False:
+        await send({"type": "http.response.start", "status": 413, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"success": false, "message": "Request body too large"}'})
+        return
+
+    environ = _environ(scope, body)
+    loop = asyncio.get_running_loop()
+    shared = _coalesce_key(environ)
+    if shared is not None:
+        status, headers, payload = await _shared(environ, *shared)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": payload})
+        return
+
+    # Everything else streams: exports pull each chunk from storage on the pool
+    queue = asyncio.Queue(STREAM_QUEUE_CHUNKS)
+    stop = threading.Event()
+    producer = loop.run_in_executor(_executor, _produce, environ, loop, queue, stop)
+    try:
+        kind, *message = await queue.get()
+        if kind == "error":
+            raise message[0]
+        await send({"type": "http.response.start", "status": message[0], "headers": message[1]})
+        while True:
+            kind, *message = await queue.get()
+            if kind == "stream":
+                try:
+                    async for chunk in message[0]:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                finally:
+                    message[0].close()
+                break
+            if kind != "body":
+                # An error after the start can only cut the body short
+                break
+            await send({"type": "http.response.body", "body": message[0], "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            warm()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            health.draining.set()
+            await asyncio.get_running_loop().run_in_executor(None, _executor.shutdown)
+            store.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    """ASGI entry point serving the same routes, hooks and plugins as app.py."""
+    if scope["type"] == "http":
+        await _http(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the BakeTrack API over ASGI (needs uvicorn).")
+    parser.add_argument("--host", default=os.environ.get("BAKETRACK_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("BAKETRACK_PORT", "8000")))
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("python -m asgi needs uvicorn (pip install uvicorn); any other ASGI server can load asgi:app")
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -1,24 +1,53 @@
 from bottle import request, response
-from utils.json_os import read_json, write_json
-from utils.crypto import hash_password, verify_password, generate_token
+from utils.store import collection, user_lock, process_lock
+from utils.crypto import hash_password, verify_password, verify_unknown, needs_rehash, generate_token, revoke_token, HashingBusy
+from utils.models import User, invalid_message
+import contextlib
+import functools
 import uuid
 
-USER_FILE = "data/users.json"
+def _users():
+    return collection("users")
+
+@contextlib.contextmanager
+def _account_lock(email):
+    # Writes to one account (signup, password reset, rehash) re-read the
+    # record under this lock, also across worker processes: hashing runs
+    # before it, so another write may have landed meanwhile
+    with user_lock(f"account:{email.strip().lower()}"), process_lock("accounts"):
+        yield
+
+def _hashing_backpressure(handler):
+    # Password hashing is pooled; when the pool is saturated shed load early
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        try:
+            return handler(*args, **kwargs)
+        except HashingBusy:
+            response.status = 429
+            response.set_header("Retry-After", "1")
+            return {"success": False, "message": "Server busy, please retry shortly"}
+    return wrapper
 
 # --- Signup ---
+@_hashing_backpressure
 def signup():
     user = request.json
-    if not user:
+    if not isinstance(user, dict) or not user:
         response.status = 400
         return {"success": False, "message": "Invalid JSON body"}
 
+    _, invalid = User.check(user)
+    if invalid:
+        response.status = 400
+        return {"success": False, "message": invalid_message([], invalid)}
+
     required = ["name", "email", "password"]
     if not all(k in user and user[k].strip() for k in required):
         response.status = 400
         return {"success": False, "message": "Name, email, and password are required"}
 
-    users = read_json(USER_FILE)
-    if any(u["email"].lower() == user["email"].lower() for u in users):
+    if _users().find("email", user["email"]):
         response.status = 400
         return {"success": False, "message": "Email already registered"}
 
@@ -29,12 +58,18 @@ def signup():
         "password": hash_password(user["password"].strip())
     }
 
-    users.append(new_user)
-    write_json(USER_FILE, users)
+    # Checked again: a concurrent signup with the same email may have
+    # finished while this one was hashing
+    with _account_lock(new_user["email"]):
+        if _users().find("email", new_user["email"]):
+            response.status = 400
+            return {"success": False, "message": "Email already registered"}
+        _users().insert(new_user)
 
     return {"success": True, "message": "Signup successful"}
 
 # --- Login ---
+@_hashing_backpressure
 def login():
     creds = request.json
     if not creds:
@@ -45,13 +80,26 @@ def login():
         response.status = 400
         return {"success": False, "message": "Email and password required"}
 
-    users = read_json(USER_FILE)
-    user = next((u for u in users if u["email"].lower() == creds["email"].strip().lower()), None)
+    user = _users().find("email", creds["email"])
+    password = creds["password"].strip()
 
-    if not user or not verify_password(creds["password"].strip(), user["password"]):
+    if not (verify_password(password, user["password"]) if user else verify_unknown(password)):
         response.status = 401
         return {"success": False, "message": "Invalid email or password"}
 
+    # Transparently move legacy/weaker hashes to the current scrypt cost
+    if needs_rehash(user["password"]):
+        try:
+            rehashed = hash_password(password)
+        except HashingBusy:
+            rehashed = None
+        if rehashed:
+            with _account_lock(user["email"]):
+                current = _users().find("email", user["email"])
+                # Unless the password was reset meanwhile
+                if current and current["password"] == user["password"]:
+                    _users().update(dict(current, password=rehashed))
+
     token = generate_token(user["id"])
     return {
         "success": True,
@@ -60,7 +108,13 @@ def login():
         "name": user["name"]
     }
 
+# --- Logout ---
+def logout():
+    revoke_token(request.headers.get("Authorization", ""))
+    return {"success": True, "message": "Logged out"}
+
 # --- update forgot Password ---    
+@_hashing_backpressure
 def forgot_password():
     data = request.json
     if not data:
@@ -72,14 +126,16 @@ def forgot_password():
         response.status = 400
         return {"success": False, "message": "Email and new password are required"}
 
-    users = read_json(USER_FILE)
-    user = next((u for u in users if u["email"].lower() == data["email"].strip().lower()), None)
+    user = _users().find("email", data["email"])
 
     if not user:
         response.status = 404
         return {"success": False, "message": "User not found"}
 
-    user["password"] = hash_password(data["new_password"].strip())
-    write_json(USER_FILE, users)
+    hashed = hash_password(data["new_password"].strip())
+    with _account_lock(user["email"]):
+        current = _users().find("email", user["email"])
+        if current:
+            _users().update(dict(current, password=hashed))
 
     return {"success": True, "message": "Password updated successfully"}
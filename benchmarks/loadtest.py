@@ -0,0 +1,468 @@
+"""Load test of every API route at a configurable synthetic data scale.
+
+Seeds tenants straight into a scratch store, then drives the Bottle app
+in-process through WSGI (no network): each route in app.py for --requests
+calls, then the scenarios with --threads concurrent clients. Prints p50/p99
+latency and throughput and can write JSON to compare runs between commits.
+
+    python -m benchmarks.loadtest --users 1000 --ingredients 200 --recipes 50 --meals 365 --out base.json
+    python -m benchmarks.loadtest --users 1000 --ingredients 200 --recipes 50 --meals 365 --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from utils import crypto, store
+from utils.recurrence import parse_rule, next_after
+from benchmarks.wsgi import call, stream
+
+PASSWORD = "bench-password"
+CATEGORIES = ["grains", "dairy", "produce", "spices", "sweeteners", "fats"]
+UNITS = ["kg", "g", "l", "pc"]
+TODAY = date.today()
+
+# --- Synthetic Data ---
+def _id(rng, prefix):
+    # 64 bits: at millions of records 32-bit ids would collide
+    return f"{prefix}{rng.getrandbits(64):016x}"
+
+def _tenant_records(rng, user_id, email, password_hash, scale):
+    n_ing, n_rec, n_meals = scale
+    ingredients = [{
+        "id": _id(rng, "ing"), "userId": user_id, "name": f"ingredient {i}",
+        "unit": rng.choice(UNITS), "category": rng.choice(CATEGORIES),
+        # Every tenth one is low on stock; recipes only use the others
+        "quantity": 0.5 if i % 10 == 9 else 10_000_000, "minQuantity": 1,
+        "expiryDate": (TODAY + timedelta(days=rng.randint(-60, 120))).isoformat(),
+        "unitCost": round(rng.uniform(0.1, 5), 2), "nutrition": {"calories": rng.randint(10, 400)},
+    } for i in range(n_ing)]
+    stocked = [ing for ing in ingredients if ing["quantity"] > 1]
+    recipes = [{
+        "id": _id(rng, "rec"), "userId": user_id, "name": f"recipe {i}",
+        "description": "", "instructions": "", "servings": 4, "prepTime": 10, "cookTime": 30,
+        "ingredients": [{"ingredientId": ing["id"], "quantity": 1}
+                        for ing in rng.sample(stocked, min(5, len(stocked)))],
+    } for i in range(n_rec if stocked else 0)]
+    start = TODAY - timedelta(days=n_meals // 2)
+    meals = [{
+        "id": _id(rng, "meal"), "userId": user_id, "date": (start + timedelta(days=d)).isoformat(),
+        "time": "dinner", "recipeId": rng.choice(recipes)["id"], "done": d < n_meals // 2,
+    } for d in range(n_meals if recipes else 0)]
+    user = {"id": user_id, "name": email.split("@")[0], "email": email, "password": password_hash}
+    return user, ingredients, recipes, meals
+
+def seed(rng, users, scale, sample, chunk=500):
+    """Insert users x scale records, chunk users per write. Returns the
+    sampled tenants with their record ids; the rest only exist in storage."""
+    password_hash = crypto.hash_password(PASSWORD)
+    tenants = []
+    for first in range(0, users, chunk):
+        batch = {"users": [], "ingredients": [], "recipes": [], "meals": []}
+        for n in range(first, min(users, first + chunk)):
+            user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            email = f"bench{n}@example.com"
+            user, ingredients, recipes, meals = _tenant_records(rng, user_id, email, password_hash, scale)
+            batch["users"].append(user)
+            batch["ingredients"] += ingredients
+            batch["recipes"] += recipes
+            batch["meals"] += meals
+            if n < sample:
+                tenants.append({
+                    "id": user_id, "email": email, "token": crypto.generate_token(user_id),
+                    "ingredients": [r["id"] for r in ingredients if r["quantity"] > 1],
+                    "recipes": [r["id"] for r in recipes],
+                    "meals": [r["id"] for r in meals],
+                })
+        with store.batch():
+            for name, records in batch.items():
+                if records:
+                    store.collection(name).insert_many(records)
+    return tenants
+
+# --- Route Requests ---
+# Each builder returns (method, path, body, headers) for one call. Any setup
+# it needs (fresh records to delete, new tokens) happens here, untimed.
+_counter = iter(range(10 ** 12))
+_counter_lock = threading.Lock()
+
+def _next():
+    with _counter_lock:
+        return next(_counter)
+
+def _fresh_id(prefix):
+    return f"{prefix}{uuid.uuid4().hex[:8]}"
+
+def _fresh_ingredient(t):
+    record = {"id": _fresh_id("ing"), "userId": t["id"], "name": "scratch", "unit": "kg",
+              "category": "grains", "quantity": 10_000_000, "minQuantity": 0}
+    store.collection("ingredients").insert(record)
+    return record["id"]
+
+def _fresh_recipe(t, ingredient_id=None):
+    ing = ingredient_id or random.choice(t["ingredients"])
+    record = {"id": _fresh_id("rec"), "userId": t["id"], "name": "scratch",
+              "ingredients": [{"ingredientId": ing, "quantity": 1}]}
+    store.collection("recipes").insert(record)
+    return record["id"]
+
+def _fresh_meal(t, recipe_id=None):
+    record = {"id": _fresh_id("meal"), "userId": t["id"], "date": "2099-01-01",
+              "time": f"scratch{_next()}", "recipeId": recipe_id or random.choice(t["recipes"]), "done": True}
+    store.collection("meals").insert(record)
+    return record["id"]
+
+def _rule_fields(t):
+    # Starting far enough out that nothing materializes (or deducts stock)
+    return {"recipeId": random.choice(t["recipes"]), "time": f"rule{_next()}", "start": "2101-01-03", "freq": "weekly"}
+
+def _fresh_rule(t):
+    record = dict(parse_rule(_rule_fields(t)), id=_fresh_id("rule"), userId=t["id"], through="2101-01-02")
+    record["next"] = next_after(record, record["through"])
+    store.collection("meal_rules").insert(record)
+    return record["id"]
+
+def _slot():
+    n = _next()
+    return (date(2100, 1, 1) + timedelta(days=n % 3650)).isoformat(), f"bench{n}"
+
+def _ndjson(records):
+    return "".join(json.dumps(r) + "\n" for r in records).encode(), {"Content-Type": "application/x-ndjson"}
+
+def _new_ingredient():
+    return {"name": f"new {_next()}", "unit": "kg", "category": "grains", "quantity": 5, "minQuantity": 1}
+
+def _import_ingredients(t):
+    body, headers = _ndjson([_new_ingredient() for _ in range(20)])
+    return "POST", "/api/ingredients/import", body, headers
+
+def _import_recipes(t):
+    body, headers = _ndjson([{"name": f"imported {_next()}", "ingredients": [{"ingredientId": random.choice(t["ingredients"]), "quantity": 1}]}
+                             for _ in range(20)])
+    return "POST", "/api/recipes/import", body, headers
+
+def _import_meals(t):
+    recipe = random.choice(t["recipes"])
+    meals = []
+    for _ in range(20):
+        day, time_ = _slot()
+        meals.append({"date": day, "time": time_, "recipeId": recipe})
+    body, headers = _ndjson(meals)
+    return "POST", "/api/meals/import", body, headers
+
+def _plan(t):
+    slots = [{"date": (TODAY + timedelta(days=d)).isoformat(), "time": "lunch", "recipeId": random.choice(t["recipes"])}
+             for d in range(7)]
+    return "POST", "/api/meals/plan", {"slots": slots}, None
+
+def _week(t):
+    return f"/api/meals?from={TODAY.isoformat()}&to={(TODAY + timedelta(days=7)).isoformat()}"
+
+def _cursor():
+    # The change feed's position right now, as a client would hold it
+    from routes.changes import feed
+    return feed.cursor()
+
+ROUTES = {
+    "GET /": lambda t: ("GET", "/", None, None),
+    "GET /api/health": lambda t: ("GET", "/api/health", None, None),
+    "GET /api/metrics": lambda t: ("GET", "/api/metrics", None, None),
+    "OPTIONS /api/ingredients": lambda t: ("OPTIONS", "/api/ingredients", None, None),
+    "GET /api/signup": lambda t: ("GET", "/api/signup", None, None),
+    "GET /api/login": lambda t: ("GET", "/api/login", None, None),
+    "GET /api/forgot-password": lambda t: ("GET", "/api/forgot-password", None, None),
+    "POST /api/signup": lambda t: ("POST", "/api/signup", {"name": "n", "email": f"signup{_next()}@example.com", "password": PASSWORD}, None),
+    "POST /api/login": lambda t: ("POST", "/api/login", {"email": t["email"], "password": PASSWORD}, None),
+    "POST /api/forgot-password": lambda t: ("POST", "/api/forgot-password", {"email": t["email"], "new_password": PASSWORD}, None),
+    "POST /api/logout": lambda t: ("POST", "/api/logout", None, {"Authorization": f"Bearer {crypto.generate_token(t['id'])}"}),
+
+    "POST /api/ingredients": lambda t: ("POST", "/api/ingredients", _new_ingredient(), None),
+    "GET /api/ingredients": lambda t: ("GET", "/api/ingredients", None, None),
+    "GET /api/ingredients?limit=50": lambda t: ("GET", "/api/ingredients?limit=50", None, None),
+    "GET /api/ingredients?category=": lambda t: ("GET", f"/api/ingredients?category={random.choice(CATEGORIES)}", None, None),
+    "GET /api/ingredients/<id>": lambda t: ("GET", f"/api/ingredients/{random.choice(t['ingredients'])}", None, None),
+    "PUT /api/ingredients/<id>": lambda t: ("PUT", f"/api/ingredients/{random.choice(t['ingredients'])}", {"minQuantity": 1}, None),
+    "DELETE /api/ingredients/<id>": lambda t: ("DELETE", f"/api/ingredients/{_fresh_ingredient(t)}", None, None),
+    "GET /api/ingredients/<id>/delete-preview": lambda t: ("GET", f"/api/ingredients/{random.choice(t['ingredients'])}/delete-preview", None, None),
+    "GET /api/ingredients/low-stock": lambda t: ("GET", "/api/ingredients/low-stock", None, None),
+    "GET /api/ingredients/expired": lambda t: ("GET", "/api/ingredients/expired", None, None),
+    "GET /api/ingredients/expiring": lambda t: ("GET", "/api/ingredients/expiring?days=14", None, None),
+    "POST /api/ingredients/import": _import_ingredients,
+    "GET /api/ingredients/export": lambda t: ("GET", "/api/ingredients/export", None, None),
+
+    "POST /api/recipes": lambda t: ("POST", "/api/recipes", {"name": "new", "ingredients": [{"ingredientId": random.choice(t["ingredients"]), "quantity": 1}]}, None),
+    "GET /api/recipes": lambda t: ("GET", "/api/recipes", None, None),
+    "GET /api/recipes?prefix=": lambda t: ("GET", "/api/recipes?prefix=recipe%201&limit=50", None, None),
+    "GET /api/recipes/<id>": lambda t: ("GET", f"/api/recipes/{random.choice(t['recipes'])}", None, None),
+    "PUT /api/recipes/<id>": lambda t: ("PUT", f"/api/recipes/{random.choice(t['recipes'])}", {"servings": 4}, None),
+    "DELETE /api/recipes/<id>": lambda t: ("DELETE", f"/api/recipes/{_fresh_recipe(t)}", None, None),
+    "GET /api/recipes/<id>/delete-preview": lambda t: ("GET", f"/api/recipes/{random.choice(t['recipes'])}/delete-preview", None, None),
+    "GET /api/recipes/<id>/summary": lambda t: ("GET", f"/api/recipes/{random.choice(t['recipes'])}/summary?servings=10", None, None),
+    "GET /api/recipes/summaries": lambda t: ("GET", "/api/recipes/summaries", None, None),
+    "GET /api/ingredients/<id>/movements": lambda t: ("GET", f"/api/ingredients/{random.choice(t['ingredients'])}/movements?limit=50", None, None),
+    "GET /api/stock/usage": lambda t: ("GET", "/api/stock/usage?period=week", None, None),
+    "GET /api/dashboard": lambda t: ("GET", "/api/dashboard", None, None),
+    "POST /api/recipes/import": _import_recipes,
+    "GET /api/recipes/export": lambda t: ("GET", "/api/recipes/export?format=csv", None, None),
+
+    "POST /api/meals": lambda t: ("POST", "/api/meals", dict(zip(("date", "time"), _slot()), recipeId=random.choice(t["recipes"])), None),
+    "GET /api/meals": lambda t: ("GET", "/api/meals", None, None),
+    "GET /api/meals?from=&to=": lambda t: ("GET", _week(t), None, None),
+    "GET /api/meals/<meal_id>": lambda t: ("GET", f"/api/meals/{random.choice(t['meals'])}", None, None),
+    "PUT /api/meals/<meal_id>": lambda t: ("PUT", f"/api/meals/{_fresh_meal(t)}", {"recipeId": random.choice(t["recipes"])}, None),
+    "PUT /api/meals/<meal_id>/done": lambda t: ("PUT", f"/api/meals/{_fresh_meal(t)}/done", None, None),
+    "DELETE /api/meals/<meal_id>": lambda t: ("DELETE", f"/api/meals/{_fresh_meal(t)}", None, None),
+    "POST /api/meals/import": _import_meals,
+    "GET /api/meals/export": lambda t: ("GET", "/api/meals/export", None, None),
+    "POST /api/meals/plan": _plan,
+    "POST /api/meals/rules": lambda t: ("POST", "/api/meals/rules", _rule_fields(t), None),
+    "GET /api/meals/rules": lambda t: ("GET", "/api/meals/rules", None, None),
+    "GET /api/meals/rules/<rule_id>": lambda t: ("GET", f"/api/meals/rules/{_fresh_rule(t)}", None, None),
+    "PUT /api/meals/rules/<rule_id>": lambda t: ("PUT", f"/api/meals/rules/{_fresh_rule(t)}", {"interval": 2}, None),
+    "DELETE /api/meals/rules/<rule_id>": lambda t: ("DELETE", f"/api/meals/rules/{_fresh_rule(t)}", None, None),
+
+    "GET /api/changes": lambda t: ("GET", "/api/changes", None, None),
+    "GET /api/changes?since=": lambda t: ("GET", f"/api/changes?since={_cursor()}", None, None),
+    # Without a cursor the stream sends one resync event and ends; the
+    # change-stream scenario holds streams open
+    "GET /api/changes/stream": lambda t: ("GET", "/api/changes/stream", None, None),
+}
+
+# --- Measurement ---
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+def summarize(latencies, statuses, elapsed):
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "statuses": dict(Counter(str(s) for s in statuses)),
+    }
+
+def timed_call(app, tenant, build):
+    method, path, body, headers = build(tenant)
+    headers = dict(headers or {})
+    token = None if "Authorization" in headers else tenant["token"]
+    started = time.perf_counter()
+    status, _, _ = call(app, method, path, body, token, headers)
+    return time.perf_counter() - started, status
+
+def run_route(app, tenants, build, requests):
+    latencies, statuses = [], []
+    started = time.perf_counter()
+    for i in range(requests):
+        latency, status = timed_call(app, tenants[i % len(tenants)], build)
+        latencies.append(latency)
+        statuses.append(status)
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+def run_concurrent(app, tenants, steps, threads, iterations):
+    """threads clients each running the step builders iterations times;
+    one summary per step plus an overall one."""
+    results = {name: ([], []) for name, _ in steps}
+    lock = threading.Lock()
+
+    def client(n):
+        rng = random.Random(n)
+        local = {name: ([], []) for name, _ in steps}
+        for _ in range(iterations):
+            tenant = rng.choice(tenants)
+            for name, build in steps:
+                latency, status = timed_call(app, tenant, build)
+                local[name][0].append(latency)
+                local[name][1].append(status)
+        with lock:
+            for name, (lat, st) in local.items():
+                results[name][0].extend(lat)
+                results[name][1].extend(st)
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    summary = {name: summarize(lat, st, elapsed) for name, (lat, st) in results.items()}
+    summary["overall"] = summarize(
+        [x for lat, _ in results.values() for x in lat], [x for _, st in results.values() for x in st], elapsed)
+    return summary
+
+# --- Scenarios ---
+def dashboard(app, tenants, args):
+    steps = [(name, ROUTES[name]) for name in (
+        "GET /api/ingredients?limit=50", "GET /api/ingredients/low-stock", "GET /api/ingredients/expired",
+        "GET /api/ingredients/expiring", "GET /api/recipes?prefix=", "GET /api/meals?from=&to=",
+    )]
+    return run_concurrent(app, tenants, steps, args.threads, args.iterations)
+
+def dashboard_endpoint(app, tenants, args):
+    # The same screen from the single /api/dashboard request
+    return run_concurrent(app, tenants, [("GET /api/dashboard", ROUTES["GET /api/dashboard"])], args.threads, args.iterations)
+
+def scheduling_burst(app, tenants, args):
+    # Every client books into the same few tenants, so per-user locks contend
+    hot = tenants[:max(1, len(tenants) // 10)]
+    return run_concurrent(app, hot, [("POST /api/meals", ROUTES["POST /api/meals"])], args.threads, args.iterations)
+
+def cascade_delete(app, tenants, args):
+    """DELETE of ingredients used by --fanout recipes, each with a booked meal."""
+    def build(t):
+        ing = _fresh_ingredient(t)
+        for _ in range(args.fanout):
+            _fresh_meal(t, _fresh_recipe(t, ing))
+        return "DELETE", f"/api/ingredients/{ing}", None, None
+    return run_concurrent(app, tenants, [("DELETE /api/ingredients/<id>", build)], args.threads, args.iterations)
+
+def change_stream(app, tenants, args):
+    """Clients each hold a change stream open on their own tenant and time
+    --iterations writes from the PUT until its event arrives on the stream.
+    Bounded: one event read per write, and no more clients than the server
+    allows open streams."""
+    from routes.changes import MAX_STREAMS
+    readers = max(1, min(args.threads, MAX_STREAMS, len(tenants)))
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def client(n):
+        rng = random.Random(n)
+        tenant = tenants[n]
+        local_lat, local_st = [], []
+        status, _, body = stream(app, "GET", f"/api/changes/stream?since={_cursor()}", token=tenant["token"])
+        try:
+            if status != 200:
+                local_st.append(status)
+                return
+            chunks = iter(body)
+            next(chunks, None)  # the retry: preamble
+            for _ in range(args.iterations):
+                path = f"/api/ingredients/{rng.choice(tenant['ingredients'])}"
+                started = time.perf_counter()
+                call(app, "PUT", path, {"minQuantity": rng.randint(1, 5)}, tenant["token"])
+                # The next chunk is the change, or a heartbeat/resync if it was lost
+                chunk = next(chunks, b"")
+                kind = "change" if b"event: change" in chunk else "resync" if b"event: resync" in chunk else "lost"
+                local_lat.append(time.perf_counter() - started)
+                local_st.append(kind)
+                if kind != "change":
+                    break
+        finally:
+            body.close()
+            with lock:
+                latencies.extend(local_lat)
+                statuses.extend(local_st)
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(readers)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return {"PUT -> change event": summarize(latencies, statuses, time.perf_counter() - started)}
+
+SCENARIOS = {"dashboard": dashboard, "dashboard-endpoint": dashboard_endpoint,
+             "scheduling-burst": scheduling_burst, "cascade-delete": cascade_delete,
+             "change-stream": change_stream}
+
+# --- Reporting ---
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def _print_table(title, results, baseline=None):
+    print(f"\n{title}")
+    print(f"  {'':44} {'count':>6} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for name, r in results.items():
+        if not r.get("count"):
+            continue
+        line = f"  {name:44} {r['count']:6d} {r['p50_ms']:9.3f} {r['p99_ms']:9.3f} {r['throughput_rps'] or 0:9.1f}"
+        before = (baseline or {}).get(name)
+        if before and before.get("count"):
+            line += f"   p50 {_delta(before['p50_ms'], r['p50_ms'])}  p99 {_delta(before['p99_ms'], r['p99_ms'])}"
+        print(line)
+
+def _delta(before, after):
+    return f"{(after - before) / before * 100:+6.1f}%" if before else "   n/a"
+
+def run(args):
+    store.configure(data_dir=args.data_dir or tempfile.mkdtemp(prefix="baketrack-load-"), backend=args.backend)
+    from app import app
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    scale = (args.ingredients, args.recipes, args.meals)
+    started = time.perf_counter()
+    tenants = seed(rng, args.users, scale, min(args.sample, args.users))
+    seeded = time.perf_counter() - started
+    print(f"seeded {args.users} users x {scale} (ingredients, recipes, meals) in {seeded:.1f}s, backend={args.backend}")
+
+    selected = [name for name in ROUTES if not args.routes or any(f in name for f in args.routes)]
+    report = {
+        "meta": {
+            "commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "backend": args.backend, "seed": args.seed,
+            "scale": {"users": args.users, "ingredients": args.ingredients, "recipes": args.recipes, "meals": args.meals},
+            "requests": args.requests, "threads": args.threads, "iterations": args.iterations, "seed_seconds": round(seeded, 2),
+        },
+        "routes": {name: run_route(app, tenants, ROUTES[name], args.requests) for name in selected},
+        "scenarios": {name: SCENARIOS[name](app, tenants, args) for name in args.scenarios},
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_table("routes", report["routes"], baseline and baseline.get("routes"))
+    for name, results in report["scenarios"].items():
+        _print_table(f"scenario {name} ({args.threads} threads)", results,
+                     baseline and baseline.get("scenarios", {}).get(name))
+
+    # Flag routes in app.py that no builder exercises
+    covered = {name.split("?")[0] for name in ROUTES}
+    missing = [f"{r.method} {r.rule}" for r in app.routes
+               if r.method != "OPTIONS" and f"{r.method} {r.rule}" not in covered]
+    if missing:
+        print("\nroutes without a load test: " + ", ".join(missing))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ingredients", type=int, default=200, help="per user")
+    parser.add_argument("--recipes", type=int, default=50, help="per user")
+    parser.add_argument("--meals", type=int, default=365, help="per user")
+    parser.add_argument("--sample", type=int, default=50, help="tenants requests are spread over")
+    parser.add_argument("--requests", type=int, default=200, help="calls per route")
+    parser.add_argument("--routes", nargs="*", help="only routes whose name contains one of these")
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients in scenarios")
+    parser.add_argument("--iterations", type=int, default=25, help="per client in scenarios")
+    parser.add_argument("--fanout", type=int, default=10, help="recipes per ingredient in cascade-delete")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--data-dir", help="defaults to a fresh temporary directory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier run to diff against")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,80 @@
+"""Login throughput at several scrypt cost settings.
+
+Seeds users hashed at each cost, then hammers POST /api/login from many
+threads. Reports logins/s, latency percentiles and how many requests were
+shed with 429 by the hashing pool's queue limit.
+
+    python -m benchmarks.login_throughput --costs 12 14 15 --threads 32 --logins 400
+"""
+import argparse
+import tempfile
+import threading
+import time
+import uuid
+from utils import crypto, store
+from benchmarks.wsgi import call
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def seed(users):
+    records = [{
+        "id": str(uuid.uuid4()),
+        "name": f"user{i}",
+        "email": f"user{i}@bench.local",
+        "password": crypto.hash_password("secret"),
+    } for i in range(users)]
+    store.collection("users").insert_many(records)
+    return [r["email"] for r in records]
+
+def run_cost(app, log2n, args):
+    crypto.SCRYPT_N = 2 ** log2n
+    store.configure(data_dir=tempfile.mkdtemp(prefix="baketrack-bench-"))
+    emails = seed(args.users)
+
+    latencies, statuses, lock = [], {}, threading.Lock()
+    per_thread = args.logins // args.threads
+
+    def worker(n):
+        local, codes = [], {}
+        for i in range(per_thread):
+            email = emails[(n + i) % len(emails)]
+            started = time.perf_counter()
+            status, _, _ = call(app, "POST", "/api/login", {"email": email, "password": "secret"})
+            local.append(time.perf_counter() - started)
+            codes[status] = codes.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for code, count in codes.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.get(200, 0)
+    print(f"N=2^{log2n:<3} {ok / elapsed:8.1f} logins/s  "
+          f"p50={percentile(latencies, 50) * 1000:7.1f}ms  p99={percentile(latencies, 99) * 1000:7.1f}ms  "
+          f"429={statuses.get(429, 0)}  other={sum(v for k, v in statuses.items() if k not in (200, 429))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--costs", type=int, nargs="+", default=[12, 14, 15], help="log2 of scrypt N")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=crypto.HASH_WORKERS, help="hashing processes (0 = inline)")
+    parser.add_argument("--queue-limit", type=int, default=crypto.HASH_QUEUE_LIMIT)
+    args = parser.parse_args()
+
+    crypto.configure_hashing(workers=args.workers, queue_limit=args.queue_limit)
+    from app import app
+    print(f"threads={args.threads} hash_workers={args.workers} queue_limit={args.queue_limit}")
+    for log2n in args.costs:
+        run_cost(app, log2n, args)
+    crypto.configure_hashing()
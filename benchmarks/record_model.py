@@ -0,0 +1,111 @@
+"""Memory and codec cost of dict records versus the slotted models.
+
+Builds --records synthetic records per collection (ingredients, recipes,
+meals) and compares, for each:
+  - resident memory of parsed dicts versus Record.from_dict() objects
+  - file size and parse time of indent=2 JSON versus the compact encoding
+  - rewriting the whole file after one record changed: json.dump(indent=2)
+    versus write_records() with cached per-record encodings
+
+    python -m benchmarks.record_model --records 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from utils.json_os import encode_record
+from utils.models import MODELS
+
+def make_records(name, count, rng):
+    user_ids = [f"user{n:05d}" for n in range(max(1, count // 1000))]
+    for n in range(count):
+        user_id = user_ids[n % len(user_ids)]
+        if name == "ingredients":
+            yield {"name": f"ingredient {n}", "unit": "kg", "category": rng.choice(["grains", "dairy", "produce"]),
+                   "quantity": rng.random() * 10, "minQuantity": 0.5, "expiryDate": "2030-07-31",
+                   "id": f"ing{n:08x}", "userId": user_id}
+        elif name == "recipes":
+            yield {"name": f"recipe {n}", "description": "", "instructions": "mix and bake", "servings": 4,
+                   "prepTime": 10, "cookTime": 30,
+                   "ingredients": [{"ingredientId": f"ing{rng.getrandbits(32):08x}", "quantity": 1} for _ in range(5)],
+                   "id": f"rec{n:08x}", "userId": user_id}
+        else:
+            yield {"date": f"2030-{n % 12 + 1:02d}-{n % 28 + 1:02d}", "time": "dinner",
+                   "recipeId": f"rec{rng.getrandbits(32):08x}", "done": n % 2 == 0,
+                   "id": f"meal{n:08x}", "userId": user_id}
+
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+def bench(name, count, rng):
+    model = MODELS[name]
+    records = list(make_records(name, count, rng))
+    indented = json.dumps(records, indent=2)
+    compact_chunks = [encode_record(r) for r in records]
+    compact = b"[\n" + b",\n".join(compact_chunks) + b"\n]\n"
+    del records
+    gc.collect()
+
+    dicts, dict_bytes = measure_memory(lambda: json.loads(compact))
+    # Parsed fresh so the models own their values rather than sharing the dicts'
+    objects, object_bytes = measure_memory(lambda: [model.from_dict(r) for r in json.loads(compact)])
+    _, convert_s = timed(lambda: [model.from_dict(r) for r in dicts])
+    del objects
+    _, parse_indented_s = timed(lambda: json.loads(indented))
+    _, parse_compact_s = timed(lambda: json.loads(compact))
+
+    # One record changed: full re-encode versus reusing every other cached chunk
+    changed = count // 2
+    _, dump_indented_s = timed(lambda: json.dumps(dicts, indent=2))
+    _, dump_compact_s = timed(lambda: b",\n".join(encode_record(r) for r in dicts))
+    def cached():
+        compact_chunks[changed] = encode_record(dicts[changed])
+        return b"[\n" + b",\n".join(compact_chunks) + b"\n]\n"
+    _, dump_cached_s = timed(cached)
+
+    return {
+        "records": count,
+        "memory_dict_mb": round(dict_bytes / 1e6, 1),
+        "memory_model_mb": round(object_bytes / 1e6, 1),
+        "file_indented_mb": round(len(indented.encode()) / 1e6, 1),
+        "file_compact_mb": round(len(compact) / 1e6, 1),
+        "parse_indented_s": round(parse_indented_s, 3),
+        "parse_compact_s": round(parse_compact_s, 3),
+        "dict_to_model_s": round(convert_s, 3),
+        "encode_indented_s": round(dump_indented_s, 3),
+        "encode_compact_s": round(dump_compact_s, 3),
+        "encode_cached_s": round(dump_cached_s, 3),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000, help="per collection")
+    parser.add_argument("--collections", nargs="*", default=["ingredients", "recipes", "meals"])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    results = {name: bench(name, args.records, rng) for name in args.collections}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name} ({r['records']} records)")
+            print(f"  memory  dict {r['memory_dict_mb']:8.1f} MB   slotted model {r['memory_model_mb']:8.1f} MB")
+            print(f"  file    indent=2 {r['file_indented_mb']:8.1f} MB   compact {r['file_compact_mb']:8.1f} MB")
+            print(f"  parse   indent=2 {r['parse_indented_s']:8.3f} s    compact {r['parse_compact_s']:8.3f} s"
+                  f"   (+ dict->model {r['dict_to_model_s']:.3f} s)")
+            print(f"  rewrite indent=2 {r['encode_indented_s']:8.3f} s    compact {r['encode_compact_s']:8.3f} s"
+                  f"   cached {r['encode_cached_s']:.3f} s")
@@ -0,0 +1,139 @@
+"""Cold start of an API worker, measured in fresh interpreters.
+
+Headline: time from spawning `python -m serve` to the first 200 from
+GET /api/ingredients for a seeded user. Also reports bare interpreter
+startup, wall time of `import app`, and the slowest imports from
+`python -X importtime`. Medians over --runs.
+
+    python -m benchmarks.startup --runs 10 --out startup.json
+    python -m benchmarks.startup --runs 10 --compare startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from utils import crypto, store
+
+ROOT = os.getcwd()
+
+def seed(data_dir, ingredients):
+    os.makedirs(data_dir, exist_ok=True)
+    store.configure(data_dir=data_dir)
+    user_id = str(uuid.uuid4())
+    store.collection("users").insert({"id": user_id, "name": "bench", "email": "bench@bench.local",
+                                      "password": crypto.hash_password("secret")})
+    store.collection("ingredients").insert_many([{
+        "id": f"ing{n:08x}", "userId": user_id, "name": f"ingredient {n}", "unit": "kg",
+        "category": "grains", "quantity": 10, "minQuantity": 1,
+    } for n in range(ingredients)])
+    token = crypto.generate_token(user_id)
+    store.flush()
+    return token
+
+def _env(data_dir):
+    # Bytecode caching on, as in a deployed image
+    env = dict(os.environ, BAKETRACK_DATA_DIR=data_dir)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+def _timed(cmd, env):
+    started = time.perf_counter()
+    subprocess.run(cmd, cwd=ROOT, env=env, check=True, capture_output=True)
+    return (time.perf_counter() - started) * 1000
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def first_response(env, token, timeout=30.0):
+    """ms from spawning the server to its first 200 on /api/ingredients."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/ingredients?limit=50"
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "serve", "--host", "127.0.0.1", "--port", str(port)],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+                with urllib.request.urlopen(req, timeout=timeout) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.001)
+        raise RuntimeError("server did not answer in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def import_breakdown(env, top):
+    """The slowest modules by cumulative import time, in ms."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                         cwd=ROOT, env=env, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    return {name.strip(): round(ms, 1) for ms, name in sorted(rows, reverse=True)[:top]}
+
+def run(args):
+    data_dir = tempfile.mkdtemp(prefix="baketrack-startup-")
+    token = seed(data_dir, args.ingredients)
+    env = _env(data_dir)
+    # One untimed pass writes the bytecode caches
+    _timed([sys.executable, "-c", "import app"], env)
+
+    samples = {"interpreter_ms": [], "import_app_ms": [], "first_response_ms": []}
+    for _ in range(args.runs):
+        samples["interpreter_ms"].append(_timed([sys.executable, "-c", "pass"], env))
+        samples["import_app_ms"].append(_timed([sys.executable, "-c", "import app"], env))
+        samples["first_response_ms"].append(first_response(env, token))
+    return {
+        "python": platform.python_version(),
+        "ingredients": args.ingredients,
+        "runs": args.runs,
+        "median": {name: round(statistics.median(values), 1) for name, values in samples.items()},
+        "max": {name: round(max(values), 1) for name, values in samples.items()},
+        "slowest_imports_ms": import_breakdown(env, args.top),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--ingredients", type=int, default=1000, help="seeded for the benchmark user")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier --out to diff against")
+    args = parser.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f"median of {args.runs} runs (python {report['python']}, {args.ingredients} ingredients)")
+    for name, ms in report["median"].items():
+        line = f"  {name:20} {ms:8.1f} ms   (max {report['max'][name]:.1f})"
+        before = baseline and baseline["median"].get(name)
+        if before:
+            line += f"   {(ms - before) / before * 100:+6.1f}%"
+        print(line)
+    print("slowest imports (cumulative ms)")
+    for name, ms in report["slowest_imports_ms"].items():
+        print(f"  {name:40} {ms:8.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
@@ -0,0 +1,100 @@
+"""Concurrent meal scheduling against a shared ingredient stock.
+
+Every thread books, re-books and cancels meals for the same users through the
+Bottle app. At the end each user's remaining stock must equal the starting
+stock minus one unit per meal still booked; anything else is a lost update.
+
+    python -m benchmarks.stock_contention --threads 16 --meals 40 --backend json
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+import uuid
+from utils import store
+from utils.crypto import generate_token
+from benchmarks.wsgi import call
+
+def seed(users, stock):
+    tenants = []
+    for _ in range(users):
+        user_id = str(uuid.uuid4())
+        ing_id = f"ing{uuid.uuid4().hex[:8]}"
+        store.collection("ingredients").insert({
+            "id": ing_id, "userId": user_id, "name": "Flour", "unit": "kg",
+            "category": "grains", "quantity": stock, "minQuantity": 0,
+        })
+        cheap = {"id": f"rec{uuid.uuid4().hex[:8]}", "userId": user_id, "name": "bread",
+                 "servings": 1, "ingredients": [{"ingredientId": ing_id, "quantity": 1}]}
+        # Always fails validation, so re-booking to it must roll back the restore
+        greedy = {"id": f"rec{uuid.uuid4().hex[:8]}", "userId": user_id, "name": "feast",
+                  "servings": 1, "ingredients": [{"ingredientId": ing_id, "quantity": stock + 1}]}
+        store.collection("recipes").insert_many([cheap, greedy])
+        tenants.append((user_id, generate_token(user_id), ing_id, cheap["id"], greedy["id"]))
+    return tenants
+
+def worker(app, tenants, thread_no, meals, stats, lock):
+    rng = random.Random(thread_no)
+    counts = {"booked": 0, "rejected": 0, "cancelled": 0, "rebooked": 0}
+    for i in range(meals):
+        _, token, _, cheap, greedy = rng.choice(tenants)
+        date = f"2030-{thread_no % 12 + 1:02d}-{i % 28 + 1:02d}"
+        status, _, body = call(app, "POST", "/api/meals",
+                               {"date": date, "time": f"slot{thread_no}-{i}", "recipeId": cheap}, token)
+        if status != 201:
+            counts["rejected"] += 1
+            continue
+        counts["booked"] += 1
+        meal_id = body["mealId"]
+        roll = rng.random()
+        if roll < 0.3:
+            call(app, "DELETE", f"/api/meals/{meal_id}", token=token)
+            counts["cancelled"] += 1
+        elif roll < 0.5:
+            call(app, "PUT", f"/api/meals/{meal_id}", {"recipeId": greedy}, token)
+            counts["rebooked"] += 1
+    with lock:
+        for key, value in counts.items():
+            stats[key] = stats.get(key, 0) + value
+
+def run(args):
+    store.configure(data_dir=tempfile.mkdtemp(prefix="baketrack-bench-"), backend=args.backend)
+    from app import app
+
+    tenants = seed(args.users, args.stock)
+    stats, lock = {}, threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(app, tenants, n, args.meals, stats, lock))
+        for n in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    lost = 0
+    for user_id, _, ing_id, _, _ in tenants:
+        remaining = store.collection("ingredients").get(ing_id)["quantity"]
+        booked = len(store.collection("meals").for_user(user_id))
+        if remaining != args.stock - booked or remaining < 0:
+            lost += 1
+            print(f"user {user_id}: stock {remaining}, expected {args.stock - booked}")
+
+    requests = sum(stats.values())
+    print(f"backend={args.backend} threads={args.threads} users={args.users} "
+          f"requests={requests} elapsed={elapsed:.2f}s ({requests / elapsed:.0f} req/s)")
+    print("  " + ", ".join(f"{k}={v}" for k, v in sorted(stats.items())))
+    print("  stock consistent" if not lost else f"  LOST UPDATES for {lost} user(s)")
+    return 0 if not lost else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--meals", type=int, default=40, help="booking attempts per thread")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--stock", type=int, default=200)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    raise SystemExit(run(parser.parse_args()))
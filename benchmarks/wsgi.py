@@ -0,0 +1,82 @@
+import io
+import json
+import sys
+
+# --- In-process WSGI client ---
+def _environ(method, path, body, token, headers):
+    path, _, query = path.partition("?")
+    raw = body if isinstance(body, bytes) else json.dumps(body).encode() if body is not None else b""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(raw)),
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8000",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.input": io.BytesIO(raw),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if token:
+        environ["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    for name, value in (headers or {}).items():
+        if name.lower() == "content-type":
+            environ["CONTENT_TYPE"] = value
+        else:
+            environ["HTTP_" + name.upper().replace("-", "_")] = value
+    return environ
+
+def _start(app, method, path, body, token, headers):
+    status = {}
+    def start_response(line, response_headers, exc_info=None):
+        status["code"] = int(line.split()[0])
+        status["headers"] = dict(response_headers)
+
+    result = app(_environ(method, path, body, token, headers), start_response)
+    return status, result
+
+def call(app, method, path, body=None, token=None, headers=None):
+    """Run one request through a WSGI app without a network hop.
+    Returns (status, headers, payload); payload is decoded JSON when possible."""
+    status, result = _start(app, method, path, body, token, headers)
+    try:
+        data = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+    try:
+        payload = json.loads(data) if data else None
+    except ValueError:
+        payload = data
+    return status["code"], status["headers"], payload
+
+def stream(app, method, path, body=None, token=None, headers=None):
+    """Like call(), but returns (status, headers, body) with the body as the
+    app's iterable, for reading long responses (event streams) a chunk at a
+    time. The caller must close() it."""
+    status, result = _start(app, method, path, body, token, headers)
+    # A WSGI app may hold start_response back until its first chunk
+    chunks = iter(result)
+    first = next(chunks, b"")
+    return status["code"], status["headers"], _Body(first, chunks, result)
+
+class _Body:
+    def __init__(self, first, chunks, result):
+        self._first = [first] if first else []
+        self._chunks = chunks
+        self._result = result
+
+    def __iter__(self):
+        yield from self._first
+        self._first = []
+        yield from self._chunks
+
+    def close(self):
+        if hasattr(self._result, "close"):
+            self._result.close()
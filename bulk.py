@@ -0,0 +1,273 @@
+from bottle import request, response
+import csv
+import io
+import json
+import os
+import uuid
+from utils.store import collection, transaction
+from utils.models import Ingredient, Recipe, Meal, invalid_message
+from routes.recipes import validate_ingredient_ownership
+from routes.meals import validate_and_deduct_ingredients
+from utils.ledger import record_movement
+from utils.recurrence import iso_date
+
+MAX_IMPORT_RECORDS = int(os.environ.get("BAKETRACK_MAX_IMPORT_RECORDS", "10000"))
+
+# CSV cells are text: these columns are read back as numbers, and a recipe's
+# ingredients column and an ingredient's nutrition column hold JSON. Exports
+# write the same columns.
+CSV_FIELDS = {
+    "ingredients": ["id", "name", "unit", "category", "quantity", "minQuantity", "expiryDate", "unitCost", "nutrition"],
+    "recipes": ["id", "name", "description", "instructions", "servings", "prepTime", "cookTime", "ingredients"],
+    "meals": ["id", "date", "time", "recipeId", "done"],
+}
+NUMERIC_FIELDS = {"quantity", "minQuantity", "unitCost", "servings", "prepTime", "cookTime"}
+BOOLEAN_FIELDS = {"done"}
+JSON_FIELDS = {"ingredients", "nutrition"}
+
+# --- Parsing ---
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def _from_csv(row):
+    record = {}
+    for field, value in row.items():
+        if field is None or value in (None, ""):
+            continue
+        if field in NUMERIC_FIELDS:
+            value = _number(value)
+        elif field in BOOLEAN_FIELDS:
+            value = value.strip().lower() == "true"
+        elif field in JSON_FIELDS:
+            value = json.loads(value)
+        record[field] = value
+    return record
+
+def _parse(body):
+    kind = request.content_type.split(";")[0].strip().lower()
+    if kind in ("application/x-ndjson", "application/jsonl"):
+        for n, line in enumerate(body, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    raise ValueError(f"Line {n}: invalid JSON")
+    elif kind == "text/csv":
+        for n, row in enumerate(csv.DictReader(body), 2):
+            try:
+                yield _from_csv(row)
+            except ValueError:
+                raise ValueError(f"Line {n}: invalid value")
+    elif kind == "application/json":
+        try:
+            records = json.load(body)
+        except ValueError:
+            raise ValueError("Invalid JSON")
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array")
+        yield from records
+    else:
+        raise ValueError("Send a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv)")
+
+def parse_records():
+    """Records from the request body, read line by line for NDJSON and CSV.
+    Raises ValueError on malformed input or more than MAX_IMPORT_RECORDS."""
+    body = io.TextIOWrapper(request.body, encoding="utf-8", newline="")
+    try:
+        records = []
+        for record in _parse(body):
+            if not isinstance(record, dict):
+                raise ValueError(f"Record {len(records) + 1}: expected an object")
+            records.append(record)
+            if len(records) > MAX_IMPORT_RECORDS:
+                raise ValueError(f"At most {MAX_IMPORT_RECORDS} records per import")
+    except UnicodeDecodeError:
+        raise ValueError("Body must be UTF-8")
+    finally:
+        body.detach()
+    if not records:
+        raise ValueError("No records to import")
+    return records
+
+def _rejected(errors):
+    response.status = 400
+    return {"success": False, "message": f"{len(errors)} record(s) rejected, nothing imported", "errors": errors}
+
+def _bad_request(e):
+    response.status = 400
+    return {"success": False, "message": str(e)}
+
+# --- Imports ---
+# All-or-nothing: every record is validated first, then the batch is
+# written with one write per collection.
+def import_ingredients():
+    try:
+        records = parse_records()
+    except ValueError as e:
+        return _bad_request(e)
+
+    errors = []
+    for n, record in enumerate(records, 1):
+        missing, invalid = Ingredient.check(record)
+        if missing or invalid:
+            errors.append({"record": n, "message": invalid_message(missing, invalid)})
+    if errors:
+        return _rejected(errors)
+
+    user_id = request.user_id
+    with transaction(user_id) as tx:
+        for record in records:
+            opening = record.pop("quantity")
+            record.update({"id": f"ing{uuid.uuid4().hex[:8]}", "userId": user_id, "quantity": 0})
+            record_movement(tx, record, opening, "initial")
+        tx.commit()
+
+    response.status = 201
+    return {"success": True, "message": f"Imported {len(records)} ingredient(s)", "ids": [r["id"] for r in records]}
+
+def import_recipes():
+    try:
+        records = parse_records()
+    except ValueError as e:
+        return _bad_request(e)
+
+    user_id = request.user_id
+    with transaction(user_id) as tx:
+        # One ownership snapshot for the whole batch, taken under the user's lock
+        owned = {i["id"] for i in collection("ingredients").iter_for_user(user_id)}
+        errors = []
+        for n, record in enumerate(records, 1):
+            _, invalid = Recipe.check(record)
+            if invalid:
+                errors.append({"record": n, "message": invalid_message([], invalid)})
+                continue
+            unauthorized = validate_ingredient_ownership(record.get("ingredients", []), user_id, owned)
+            if unauthorized:
+                errors.append({"record": n, "message": f"You don't own the following ingredients: {', '.join(unauthorized)}"})
+        if errors:
+            return _rejected(errors)
+
+        for record in records:
+            record.update({"id": f"rec{uuid.uuid4().hex[:8]}", "userId": user_id})
+            tx.put("recipes", record)
+        tx.commit()
+
+    response.status = 201
+    return {"success": True, "message": f"Imported {len(records)} recipe(s)", "ids": [r["id"] for r in records]}
+
+def import_meals():
+    try:
+        records = parse_records()
+    except ValueError as e:
+        return _bad_request(e)
+
+    user_id = request.user_id
+    with transaction(user_id) as tx:
+        taken = {(m["date"], m["time"]) for m in collection("meals").iter_for_user(user_id)}
+        errors = []
+        meals = []
+        for n, record in enumerate(records, 1):
+            missing, invalid = Meal.check(record)
+            if missing or invalid:
+                errors.append({"record": n, "message": invalid_message(missing, invalid)})
+                continue
+            date = record["date"]
+            time = record["time"].strip().lower()
+            recipe_id = record["recipeId"]
+            if not (date and time and recipe_id):
+                errors.append({"record": n, "message": "Missing fields (date, time, recipeId)"})
+                continue
+            try:
+                date = iso_date(date)
+            except ValueError as e:
+                errors.append({"record": n, "message": str(e)})
+                continue
+            if (date, time) in taken:
+                errors.append({"record": n, "message": f"Meal already exists for {time} on {date}"})
+                continue
+
+            # Deductions accumulate on tx, so stock is checked against the whole
+            # batch. Meals already done (e.g. from an export) used their stock then.
+            done = bool(record.get("done", False))
+            if not done:
+                valid, error = validate_and_deduct_ingredients(tx, recipe_id)
+                if not valid:
+                    errors.append({"record": n, "message": error})
+                    continue
+            elif not tx.get_for_user("recipes", recipe_id):
+                errors.append({"record": n, "message": "Recipe not found"})
+                continue
+
+            taken.add((date, time))
+            meals.append({
+                "id": f"meal{uuid.uuid4().hex[:8]}",
+                "userId": user_id,
+                "date": date,
+                "time": time,
+                "recipeId": recipe_id,
+                "done": done
+            })
+        if errors:
+            return _rejected(errors)
+
+        for meal in meals:
+            tx.put("meals", meal)
+        tx.commit()
+
+    response.status = 201
+    return {"success": True, "message": f"Imported {len(meals)} meal(s)", "ids": [m["id"] for m in meals]}
+
+# --- Exports ---
+# Streamed: records are encoded one at a time as the response is written.
+def _csv_lines(name, records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS[name], extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        row = dict(record)
+        for field in JSON_FIELDS & row.keys():
+            row[field] = json.dumps(row[field])
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _json_array(records):
+    yield "["
+    separator = ""
+    for record in records:
+        yield separator + json.dumps(record)
+        separator = ","
+    yield "]"
+
+def _export(name):
+    fmt = request.query.get("format", "ndjson")
+    records = collection(name).iter_for_user(request.user_id)
+    if fmt == "ndjson":
+        response.content_type = "application/x-ndjson"
+        body = (json.dumps(record) + "\n" for record in records)
+    elif fmt == "csv":
+        response.content_type = "text/csv; charset=utf-8"
+        body = _csv_lines(name, records)
+    elif fmt == "json":
+        response.content_type = "application/json"
+        body = _json_array(records)
+    else:
+        response.status = 400
+        return {"success": False, "message": "format must be ndjson, csv or json"}
+    response.set_header("Content-Disposition", f'attachment; filename="{name}.{fmt}"')
+    return body
+
+def export_ingredients():
+    return _export("ingredients")
+
+def export_recipes():
+    return _export("recipes")
+
+def export_meals():
+    return _export("meals")
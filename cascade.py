@@ -0,0 +1,38 @@
+from utils.store import collection
+
+# What goes away with a record: (dependent collection, field referencing it)
+DEPENDENTS = {
+    "ingredients": [("recipes", "ingredientId")],
+    "recipes": [("meals", "recipeId"), ("meal_rules", "recipeId")],
+}
+
+# --- Planning ---
+def plan_delete(user_id, name, record_id):
+    """Dependent records removed along with (name, record_id), grouped by
+    collection. Walks the reverse indexes, so only affected records are read."""
+    plan = {}
+    seen = set()
+    frontier = [(name, record_id)]
+    while frontier:
+        parent, parent_id = frontier.pop()
+        for child, field in DEPENDENTS.get(parent, ()):
+            for record in collection(child).referencing(field, parent_id, user_id):
+                if (child, record["id"]) in seen:
+                    continue
+                seen.add((child, record["id"]))
+                plan.setdefault(child, []).append(record)
+                frontier.append((child, record["id"]))
+    return plan
+
+def summarize(plan):
+    return {name: [r["id"] for r in records] for name, records in plan.items()}
+
+# --- Execution ---
+def cascade_delete(tx, name, record_id):
+    """Stage the record and all of its dependents for deletion on tx."""
+    plan = plan_delete(tx.user_id, name, record_id)
+    tx.delete(name, record_id)
+    for child, records in plan.items():
+        for record in records:
+            tx.delete(child, record["id"])
+    return plan
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from bottle import request, response
+from utils import store
+from utils.store import collection, subscribe
+from utils.pagination import MAX_PAGE_SIZE
+
+FEED_COLLECTIONS = ("ingredients", "recipes", "meals", "meal_rules")
+# Changes kept per user; a reader further behind gets a snapshot instead
+CHANGE_BUFFER = int(os.environ.get("BAKETRACK_CHANGE_BUFFER", "1000"))
+# Under serve.py each open stream holds one of the worker's request threads,
+# so they are capped at MAX_STREAMS (serve.py sets half of --threads unless
+# BAKETRACK_MAX_STREAMS is given). Under asgi.py a stream waits on the event
+# loop without a thread, and the much larger MAX_ASYNC_STREAMS applies.
+# Streams end after STREAM_SECONDS; clients reconnect with Last-Event-ID.
+MAX_STREAMS = int(os.environ.get("BAKETRACK_MAX_STREAMS", "4"))
+MAX_ASYNC_STREAMS = int(os.environ.get("BAKETRACK_MAX_ASYNC_STREAMS", "1000"))
+STREAM_SECONDS = float(os.environ.get("BAKETRACK_STREAM_SECONDS", "300"))
+HEARTBEAT_SECONDS = 15.0
+
+# --- Change Feed ---
+class ChangeFeed:
+    """Per-user ring buffers of create/update/delete events, numbered by one
+    sequence per process. Fed from the store's change events, so every write
+    path (handlers, imports, cascades, stock deductions) shows up. A cursor
+    is "<boot id>.<seq>"; one the buffer no longer covers (trimmed, data
+    reloaded from disk, another process or a restart) needs a snapshot."""
+
+    def __init__(self, collections=FEED_COLLECTIONS, size=CHANGE_BUFFER):
+        self.collections = set(collections)
+        self.size = size
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self._floor = 0
+        self._floors = {}
+        self._buffers = {}
+        self._changed = threading.Condition()
+        # Event-loop waiters by user: (loop, future)
+        self._waiters = {}
+
+    def __call__(self, name, op, user_id, record_id, record):
+        if name is not None and name not in self.collections:
+            return
+        with self._changed:
+            self.seq += 1
+            if op == "reset":
+                if user_id is None:
+                    self._floor = self.seq
+                    self._floors.clear()
+                    self._buffers.clear()
+                else:
+                    self._floors[user_id] = self.seq
+                    self._buffers.pop(user_id, None)
+            elif user_id is not None:
+                buffer = self._buffers.get(user_id)
+                if buffer is None:
+                    buffer = self._buffers[user_id] = deque(maxlen=self.size)
+                elif len(buffer) == self.size:
+                    self._floors[user_id] = buffer[0]["seq"]
+                buffer.append({"seq": self.seq, "collection": name, "op": op, "id": record_id, "record": record})
+            self._changed.notify_all()
+            groups = self._waiters.values() if user_id is None else [self._waiters.get(user_id, ())]
+            for group in groups:
+                for loop, future in group:
+                    loop.call_soon_threadsafe(_wake, future)
+
+    def cursor(self, seq=None):
+        return f"{self.boot_id}.{self.seq if seq is None else seq}"
+
+    def parse(self, cursor):
+        # None unless the cursor was issued by this process
+        boot_id, _, seq = (cursor or "").partition(".")
+        if boot_id != self.boot_id or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    def _covers(self, user_id, seq):
+        return seq >= max(self._floor, self._floors.get(user_id, 0))
+
+    def since(self, user_id, seq, limit=None):
+        """(events, cursor) for the user's changes after seq, oldest first,
+        or None when the buffer no longer reaches back to seq."""
+        with self._changed:
+            if not self._covers(user_id, seq):
+                return None
+            events = []
+            for event in reversed(self._buffers.get(user_id, ())):
+                if event["seq"] <= seq:
+                    break
+                events.append(event)
+            events.reverse()
+            if limit is not None and len(events) > limit:
+                events = events[:limit]
+                return events, self.cursor(events[-1]["seq"])
+            # Nothing of this user's between here and the latest seq
+            return events, self.cursor()
+
+    def _ready(self, user_id, seq):
+        buffer = self._buffers.get(user_id)
+        return not self._covers(user_id, seq) or bool(buffer) and buffer[-1]["seq"] > seq
+
+    def wait(self, user_id, seq, timeout):
+        """Block until the user has changes after seq (or seq stops being
+        covered); False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._ready(user_id, seq), timeout)
+
+    async def wait_async(self, user_id, seq, timeout):
+        """wait() for the event loop: parks a future, not a thread."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._changed:
+            if self._ready(user_id, seq):
+                return True
+            self._waiters.setdefault(user_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._changed:
+                group = self._waiters.get(user_id)
+                if group is not None:
+                    group.discard(waiter)
+                    if not group:
+                        del self._waiters[user_id]
+
+def _wake(future):
+    if not future.done():
+        future.set_result(True)
+
+feed = ChangeFeed()
+subscribe(feed)
+
+# --- Helpers ---
+def _snapshot(user_id):
+    # Cursor first: changes landing during the reads are replayed, not lost
+    cursor = feed.cursor()
+    data = {name: collection(name).for_user(user_id) for name in FEED_COLLECTIONS}
+    return {"success": True, "snapshot": True, "data": data, "cursor": cursor}
+
+def _sse(event, data, event_id=None):
+    lines = f"id: {event_id}\n" if event_id else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+_streams = threading.BoundedSemaphore(MAX_STREAMS)
+_async_streams = threading.BoundedSemaphore(MAX_ASYNC_STREAMS)
+
+def configure_streams(max_streams):
+    """Set MAX_STREAMS (streams already open keep their slot)."""
+    global MAX_STREAMS, _streams
+    MAX_STREAMS = max_streams
+    _streams = threading.BoundedSemaphore(max_streams)
+
+# --- Delta Sync ---
+def get_changes():
+    """Changes to the user's ingredients, recipes, meals and meal rules after ?since=
+    (a cursor from an earlier response), at most ?limit= of them. Without
+    a usable cursor the response is a snapshot of those collections;
+    either way it carries the cursor to ask with next time."""
+    limit = request.query.get("limit") or str(MAX_PAGE_SIZE)
+    if not limit.isdigit() or not 0 < int(limit) <= MAX_PAGE_SIZE:
+        response.status = 400
+        return {"success": False, "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}
+
+    user_id = request.user_id
+    seq = feed.parse(request.query.get("since"))
+    result = feed.since(user_id, seq, int(limit)) if seq is not None else None
+    if result is None:
+        return _snapshot(user_id)
+    events, cursor = result
+    return {"success": True, "snapshot": False, "data": events, "cursor": cursor}
+
+# --- Server-Sent Events ---
+RETRY = b"retry: 3000\n\n"
+KEEP_ALIVE = b": keep-alive\n\n"
+
+class ChangeStream:
+    """One client's event stream, holding a slot of its semaphore until
+    close(). Iterating it blocks the thread between changes (serve.py);
+    asgi.py iterates it with async for, which waits on the event loop."""
+
+    def __init__(self, user_id, seq, slots):
+        self.user_id = user_id
+        self.seq = seq
+        self._slots = slots
+        self._closed = False
+
+    def _available(self):
+        # (chunks ready now, whether the stream is over)
+        result = feed.since(self.user_id, self.seq, MAX_PAGE_SIZE) if self.seq is not None else None
+        if result is None:
+            return [_sse("resync", {"cursor": feed.cursor()})], True
+        events = result[0]
+        if events:
+            self.seq = events[-1]["seq"]
+        return [_sse("change", event, feed.cursor(event["seq"])) for event in events], False
+
+    def __iter__(self):
+        yield RETRY
+        deadline = time.monotonic() + STREAM_SECONDS
+        while True:
+            chunks, done = self._available()
+            yield from chunks
+            remaining = deadline - time.monotonic()
+            if done or remaining <= 0:
+                return
+            if not feed.wait(self.user_id, self.seq, min(HEARTBEAT_SECONDS, remaining)):
+                if store.MULTIPROCESS:
+                    # Writes by other workers arrive as resets on sync
+                    store.sync(self.user_id)
+                yield KEEP_ALIVE
+
+    async def __aiter__(self):
+        yield RETRY
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + STREAM_SECONDS
+        while True:
+            chunks, done = self._available()
+            for chunk in chunks:
+                yield chunk
+            remaining = deadline - time.monotonic()
+            if done or remaining <= 0:
+                return
+            if not await feed.wait_async(self.user_id, self.seq, min(HEARTBEAT_SECONDS, remaining)):
+                if store.MULTIPROCESS:
+                    await loop.run_in_executor(None, store.sync, self.user_id)
+                yield KEEP_ALIVE
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._slots.release()
+
+def stream_changes():
+    """The same changes as a text/event-stream: one "change" event each
+    (its id is the cursor after it), starting after Last-Event-ID or
+    ?since=. A "resync" event means the cursor is no longer covered and the
+    client should fetch a snapshot from /api/changes."""
+    # asgi.py sets this and takes the stream from the environ
+    on_loop = request.environ.get("baketrack.async_streams", False)
+    slots = _async_streams if on_loop else _streams
+    if not slots.acquire(blocking=False):
+        response.status = 503
+        response.set_header("Retry-After", "5")
+        return {"success": False, "message": "Too many open change streams, try again shortly"}
+
+    seq = feed.parse(request.headers.get("Last-Event-ID") or request.query.get("since"))
+    response.content_type = "text/event-stream"
+    response.set_header("Cache-Control", "no-cache")
+    response.set_header("X-Accel-Buffering", "no")
+    stream = ChangeStream(request.user_id, seq, slots)
+    if on_loop:
+        request.environ["baketrack.stream"] = stream
+    return stream
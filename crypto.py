@@ -1,14 +1,228 @@
+import base64
 import hashlib
-import uuid
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from utils import store
+from utils.metrics import observe
+from utils.json_os import read_json, write_json
 
-def hash_password(password: str) -> str:
+# scrypt cost parameters; each hash records its own, so raising them only
+# affects new hashes (and upgrades old ones on the next login).
+SCRYPT_N = int(os.environ.get("BAKETRACK_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("BAKETRACK_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("BAKETRACK_SCRYPT_P", "1"))
+
+# Hashing runs in a process pool so it never holds a request thread's GIL.
+# At most HASH_QUEUE_LIMIT hashes may be queued or running; beyond that
+# callers get HashingBusy. HASH_WORKERS=0 hashes inline.
+HASH_WORKERS = int(os.environ.get("BAKETRACK_HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_QUEUE_LIMIT = int(os.environ.get("BAKETRACK_HASH_QUEUE_LIMIT", "64"))
+
+class HashingBusy(Exception):
+    pass
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+def configure_hashing(workers=None, queue_limit=None):
+    global _pool, _slots, HASH_WORKERS, HASH_QUEUE_LIMIT
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+        if workers is not None:
+            HASH_WORKERS = workers
+        if queue_limit is not None:
+            HASH_QUEUE_LIMIT = queue_limit
+            _slots = threading.BoundedSemaphore(queue_limit)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Imported here: multiprocessing is slow to import and only
+                # login/signup need it, not worker startup
+                from concurrent.futures import ProcessPoolExecutor
+                _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _pool
+
+def _run(fn, *args):
+    start = time.perf_counter()
+    if not HASH_WORKERS:
+        result = fn(*args)
+    else:
+        slots = _slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            result = _get_pool().submit(fn, *args).result()
+        finally:
+            slots.release()
+    observe("baketrack_password_hash_duration_seconds", time.perf_counter() - start)
+    return result
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+
+def _sha256(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
+# --- Passwords ---
+def hash_password(password: str) -> str:
+    salt = os.urandom(16)
+    digest = _run(_scrypt, password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
 def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+    if hashed.startswith("scrypt$"):
+        _, n, r, p, salt, digest = hashed.split("$")
+        actual = _run(_scrypt, password, bytes.fromhex(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(actual.hex(), digest)
+    # Legacy unsalted SHA-256
+    return hmac.compare_digest(_sha256(password), hashed)
+
+def verify_unknown(password: str) -> bool:
+    """False, after as much work as verify_password: login runs it for
+    unknown emails so response times don't reveal which accounts exist."""
+    verify_password(password, f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${'00' * 16}${'00' * 32}")
+    return False
+
+def needs_rehash(hashed: str) -> bool:
+    return not hashed.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+# --- Tokens ---
+# Tokens are "v1.<kid>.<payload>.<sig>": payload is base64url("userId|exp|jti")
+# and sig an HMAC-SHA256 under signing key <kid>. Verification is pure CPU
+# plus an LRU of already-verified tokens; keys are read once and the
+# revocation list is re-read at most every REVOCATION_RECHECK seconds.
+TOKEN_TTL = int(os.environ.get("BAKETRACK_TOKEN_TTL", str(7 * 24 * 3600)))
+TOKEN_CACHE_SIZE = int(os.environ.get("BAKETRACK_TOKEN_CACHE_SIZE", "4096"))
+KEY_HISTORY = 3
+REVOCATION_RECHECK = 5.0
+
+_keys = None
+_keys_reloaded_at = 0.0
+_revoked = {}
+_revoked_signature = None
+_revoked_checked_at = 0.0
+_verified = OrderedDict()
+_token_lock = threading.Lock()
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _keys_path() -> str:
+    return os.path.join(store.DATA_DIR, "token_keys.json")
+
+def _revoked_path() -> str:
+    return os.path.join(store.DATA_DIR, "revoked_tokens.txt")
+
+def _new_key() -> dict:
+    return {"kid": secrets.token_hex(4), "secret": secrets.token_hex(32)}
+
+def _load_keys() -> list:
+    # BAKETRACK_TOKEN_KEYS="kid:secret,..." (newest first) overrides the key file
+    configured = os.environ.get("BAKETRACK_TOKEN_KEYS")
+    if configured:
+        return [(kid, secret.encode()) for kid, secret in (item.split(":", 1) for item in configured.split(","))]
+    keys = read_json(_keys_path())
+    if not keys:
+        # Workers starting together must agree on the first key
+        with store.process_lock("token_keys"):
+            keys = read_json(_keys_path())
+            if not keys:
+                keys = [_new_key()]
+                write_json(_keys_path(), keys)
+    return [(k["kid"], bytes.fromhex(k["secret"])) for k in keys]
+
+def _signing_keys() -> list:
+    global _keys
+    if _keys is None:
+        with _token_lock:
+            if _keys is None:
+                _keys = _load_keys()
+    return _keys
+
+def _key_for(kid: str) -> bytes | None:
+    global _keys, _keys_reloaded_at
+    key = dict(_signing_keys()).get(kid)
+    if key is None and time.monotonic() - _keys_reloaded_at > 1.0:
+        # Another worker may have rotated; pick up its key file at most once a second
+        _keys_reloaded_at = time.monotonic()
+        _keys = _load_keys()
+        key = dict(_keys).get(kid)
+    return key
+
+def rotate_token_key() -> str:
+    """Sign new tokens with a fresh key; the previous KEY_HISTORY - 1 keys
+    keep verifying so outstanding sessions survive the rotation."""
+    global _keys
+    with _token_lock, store.process_lock("token_keys"):
+        keys = [_new_key()] + read_json(_keys_path())[:KEY_HISTORY - 1]
+        write_json(_keys_path(), keys)
+        _keys = [(k["kid"], bytes.fromhex(k["secret"])) for k in keys]
+        _verified.clear()
+    return keys[0]["kid"]
+
+def _sign(secret: bytes, body: str) -> str:
+    return _b64(hmac.new(secret, body.encode(), hashlib.sha256).digest())
+
+def _verify(token: str) -> tuple | None:
+    parts = token.split(".")
+    if len(parts) != 4 or parts[0] != "v1":
+        return None
+    _, kid, payload, sig = parts
+    secret = _key_for(kid)
+    if secret is None or not hmac.compare_digest(_sign(secret, f"v1.{kid}.{payload}"), sig):
+        return None
+    try:
+        user_id, exp, jti = _unb64(payload).decode().split("|")
+        return user_id, int(exp), jti
+    except ValueError:
+        return None
+
+def _refresh_revocations(now: float):
+    global _revoked, _revoked_signature, _revoked_checked_at
+    if now - _revoked_checked_at < REVOCATION_RECHECK:
+        return
+    _revoked_checked_at = now
+    path = _revoked_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return
+    signature = (st.st_mtime_ns, st.st_size)
+    if signature == _revoked_signature:
+        return
+    with open(path) as f:
+        entries = [line.split() for line in f if line.strip()]
+    _revoked = {jti: int(exp) for jti, exp in entries if int(exp) > now}
+    _revoked_signature = signature
+    if len(_revoked) < len(entries):
+        # Expired tokens can't be replayed anyway; drop them from the file
+        with store.process_lock("revoked_tokens"):
+            with open(path) as f:
+                live = [line for line in f if line.strip() and int(line.split()[1]) > now]
+            with open(path + ".tmp", "w") as f:
+                f.writelines(live)
+            os.replace(path + ".tmp", path)
+        _revoked_signature = None
 
 def generate_token(user_id: str) -> str:
-    return f"{user_id}:{uuid.uuid4().hex}"
+    kid, secret = _signing_keys()[0]
+    exp = int(time.time()) + TOKEN_TTL
+    payload = _b64(f"{user_id}|{exp}|{secrets.token_hex(8)}".encode())
+    body = f"v1.{kid}.{payload}"
+    return f"{body}.{_sign(secret, body)}"
 
 def extract_user_id(token: str | None) -> str | None:
     if not token:
@@ -18,14 +232,37 @@ def extract_user_id(token: str | None) -> str | None:
     if token.startswith("Bearer "):
         token = token[len("Bearer "):]
 
-    if ":" in token:
-        user_id, token_part = token.split(":", 1)
-        try:
-            uuid.UUID(token_part)
-            return user_id
-        except ValueError:
+    now = time.time()
+    _refresh_revocations(now)
+    claims = _verified.get(token)
+    if claims is None:
+        claims = _verify(token)
+        if claims is None:
             return None
-    return None
-
+        with _token_lock:
+            _verified[token] = claims
+            if len(_verified) > TOKEN_CACHE_SIZE:
+                _verified.popitem(last=False)
+    else:
+        with _token_lock:
+            if token in _verified:
+                _verified.move_to_end(token)
 
+    user_id, exp, jti = claims
+    if exp <= now or jti in _revoked:
+        return None
+    return user_id
 
+def revoke_token(token: str) -> bool:
+    if token.startswith("Bearer "):
+        token = token[len("Bearer "):]
+    claims = _verify(token)
+    if claims is None:
+        return False
+    _, exp, jti = claims
+    with _token_lock, store.process_lock("revoked_tokens"):
+        _revoked[jti] = exp
+        _verified.pop(token, None)
+        with open(_revoked_path(), "a") as f:
+            f.write(f"{jti} {exp}\n")
+    return True
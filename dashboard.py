@@ -0,0 +1,74 @@
+from bottle import request, response
+from datetime import date, timedelta
+from utils.indexes import CountIndex
+from utils.pagination import PREFIX_END
+from routes.ingredients import _low_stock_index, _expiry_index
+from routes.meals import _schedule_index, _state_index
+
+MAX_UPCOMING = 100
+
+# Counts kept alongside the ingredient and meal indexes; like them, they are
+# maintained from the store's change events, so every mutation path
+# (ingredients, recipes, meals, imports, cascades) updates them in place.
+_ingredient_count = CountIndex("ingredients")
+_recipe_count = CountIndex("recipes")
+_meal_count = CountIndex("meals", lambda m: "done" if m.get("done") else "pending")
+
+# --- Helpers ---
+def _int_param(name, default, maximum=None):
+    value = request.query.get(name, str(default))
+    if not value.isdigit() or (maximum is not None and int(value) > maximum):
+        bound = f" up to {maximum}" if maximum is not None else ""
+        raise ValueError(f"{name} must be a non-negative integer{bound}")
+    return int(value)
+
+def _records(index, user_id, entries):
+    return index.records(user_id, [record_id for _, record_id in entries])
+
+# --- Dashboard ---
+def get_dashboard():
+    """Everything the dashboard shows in one response, read from per-user
+    indexes: counts, low-stock, expired and expiring (?days=, default 7)
+    ingredients, today's meals and the next pending ones (?upcoming=)."""
+    try:
+        days = _int_param("days", 7)
+        upcoming_limit = _int_param("upcoming", 10, MAX_UPCOMING)
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+
+    user_id = request.user_id
+    today = date.today()
+    today_key = today.isoformat()
+    tomorrow_key = (today + timedelta(days=1)).isoformat()
+
+    low_stock = _low_stock_index.records(user_id, _low_stock_index.ids(user_id))
+    expired = _records(_expiry_index, user_id, _expiry_index.range(user_id, stop=(today,)))
+    expiring = _records(_expiry_index, user_id, _expiry_index.range(
+        user_id, start=(today,), stop=(today + timedelta(days=days + 1),)))
+    today_meals = _records(_schedule_index, user_id, _schedule_index.range(
+        user_id, start=((today_key,),), stop=((today_key, PREFIX_END),)))
+    upcoming = _records(_state_index, user_id, _state_index.range(
+        user_id, start=((False, tomorrow_key),), stop=((False, PREFIX_END),), limit=upcoming_limit))
+    meals = _meal_count.counts(user_id)
+
+    return {
+        "success": True,
+        "data": {
+            "counts": {
+                "ingredients": _ingredient_count.counts(user_id).get("total", 0),
+                "recipes": _recipe_count.counts(user_id).get("total", 0),
+                "meals": sum(meals.values()),
+                "mealsPending": meals.get("pending", 0),
+                "mealsDone": meals.get("done", 0),
+                "lowStock": len(low_stock),
+                "expired": len(expired),
+                "expiring": len(expiring),
+            },
+            "lowStock": low_stock,
+            "expired": expired,
+            "expiring": expiring,
+            "todayMeals": today_meals,
+            "upcomingMeals": upcoming,
+        },
+    }
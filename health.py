@@ -0,0 +1,25 @@
+from bottle import response
+import threading
+from utils.store import collection
+from utils.metrics import render
+
+# Set by serve.py once shutdown starts; the server keeps accepting for its
+# --drain-grace period so load balancers see this and stop routing here.
+draining = threading.Event()
+
+# --- Health / Readiness ---
+def health():
+    if draining.is_set():
+        response.status = 503
+        return {"success": False, "status": "draining"}
+    try:
+        collection("users").get("")
+    except Exception as e:
+        response.status = 503
+        return {"success": False, "status": "storage unavailable", "message": str(e)}
+    return {"success": True, "status": "ok"}
+
+# --- Metrics (Prometheus text format) ---
+def metrics():
+    response.content_type = "text/plain; version=0.0.4; charset=utf-8"
+    return render()
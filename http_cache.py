@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date
+from bottle import request, response
+from utils.store import subscribe
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("BAKETRACK_RESPONSE_CACHE_SIZE", "2048"))
+
+# --- Version Counters ---
+# Bumped on every committed write for (userId, collection); a reset (reload,
+# reconfigure) bumps the epoch instead, unless it was limited to one user. The boot id keeps ETags from two
+# processes with coincidentally equal counters apart.
+_boot_id = uuid.uuid4().hex[:8]
+_versions = {}
+_epoch = 0
+_generation = 0
+_versions_lock = threading.Lock()
+
+def _on_change(name, op, user_id, record_id, record):
+    global _epoch, _generation
+    with _versions_lock:
+        _generation += 1
+        if op == "reset" and user_id is None:
+            _epoch += 1
+        else:
+            _versions[(user_id, name)] = _versions.get((user_id, name), 0) + 1
+
+subscribe(_on_change)
+
+def version(user_id, name):
+    return _versions.get((user_id, name), 0)
+
+def generation():
+    # Changes on any write by any user: cheap, no token needed to read it
+    return _generation
+
+# --- Serialized Body Cache ---
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+def _matches(header, etag):
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+# --- Plugin ---
+class ConditionalGetPlugin:
+    """Strong ETags, If-None-Match -> 304, and cached JSON bodies for GET
+    routes declared with cache=(collection, ...). A response is keyed by
+    user, path, query, today's date and the versions of those collections,
+    so unchanged reads skip both the handler and JSON encoding."""
+
+    name = "conditional_get"
+    api = 2
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.bodies = LRUCache(size)
+
+    def apply(self, callback, route):
+        collections = route.config.get("cache")
+        if not collections or route.method != "GET":
+            return callback
+
+        def wrapper(*args, **kwargs):
+            user_id = getattr(request, "user_id", None)
+            key = (
+                user_id, request.path, request.query_string, date.today().toordinal(),
+                _boot_id, _epoch, tuple(version(user_id, name) for name in collections),
+            )
+            etag = '"' + hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest() + '"'
+            if _matches(request.headers.get("If-None-Match"), etag):
+                response.status = 304
+                response.set_header("ETag", etag)
+                return ""
+
+            body = self.bodies.get(key)
+            if body is None:
+                result = callback(*args, **kwargs)
+                if not isinstance(result, dict) or response.status_code != 200:
+                    return result
+                body = json.dumps(result).encode()
+                self.bodies.put(key, body)
+
+            response.content_type = "application/json"
+            response.set_header("ETag", etag)
+            return body
+
+        return wrapper
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from bottle import request, response
+from utils.metrics import inc
+
+# A stored response is replayed for IDEMPOTENCY_TTL seconds; each user keeps
+# at most IDEMPOTENCY_KEYS_PER_USER of them (oldest evicted first).
+IDEMPOTENCY_TTL = float(os.environ.get("BAKETRACK_IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_KEYS_PER_USER = int(os.environ.get("BAKETRACK_IDEMPOTENCY_KEYS_PER_USER", "1000"))
+# How long a duplicate waits for the original request to finish
+IDEMPOTENCY_WAIT = float(os.environ.get("BAKETRACK_IDEMPOTENCY_WAIT", "30"))
+MAX_KEY_LENGTH = 255
+METHODS = ("POST", "PUT", "DELETE")
+
+# --- Response Store ---
+class _Entry:
+    __slots__ = ("fingerprint", "expires", "done", "status", "content_type", "body")
+
+    def __init__(self, fingerprint, expires):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.done = threading.Event()
+        self.status = None
+        self.content_type = None
+        self.body = None
+
+class IdempotencyStore:
+    """Per-user responses by Idempotency-Key. An entry is claimed before
+    the request runs, so duplicates arriving meanwhile find it and wait
+    on it instead of running the request again."""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, per_user=IDEMPOTENCY_KEYS_PER_USER):
+        self.ttl = ttl
+        self.per_user = per_user
+        self._users = {}
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+
+    def claim(self, user_id, key, fingerprint):
+        """(entry, owner); owner is True when the caller has to run the request."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._swept > 60:
+                self._sweep(now)
+            entries = self._users.setdefault(user_id, OrderedDict())
+            self._expire(entries, now)
+            entry = entries.get(key)
+            if entry is not None:
+                return entry, False
+            entry = entries[key] = _Entry(fingerprint, now + self.ttl)
+            while len(entries) > self.per_user:
+                entries.popitem(last=False)
+            return entry, True
+
+    def finish(self, user_id, key, entry, keep):
+        # Without keep (an error, no response to replay) the key is freed
+        with self._lock:
+            entries = self._users.get(user_id)
+            if not keep and entries is not None and entries.get(key) is entry:
+                del entries[key]
+        entry.done.set()
+
+    def _expire(self, entries, now):
+        # Same TTL for all, so insertion order is expiry order
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.expires > now:
+                break
+            del entries[key]
+
+    def _sweep(self, now):
+        for user_id in list(self._users):
+            self._expire(self._users[user_id], now)
+            if not self._users[user_id]:
+                del self._users[user_id]
+        self._swept = now
+
+# --- Plugin ---
+def _error(status, message):
+    response.status = status
+    return {"success": False, "message": message}
+
+class IdempotencyPlugin:
+    """Honors an Idempotency-Key header on authenticated POST/PUT/DELETE
+    routes. The first request with a key runs and its response is kept;
+    retries with the same key get that response back (marked with
+    Idempotent-Replayed: true) without running the handler. Server errors
+    aren't kept, so those can be retried."""
+
+    name = "idempotency"
+    api = 2
+
+    def __init__(self, store=None):
+        self.store = store or IdempotencyStore()
+
+    def apply(self, callback, route):
+        if route.method not in METHODS:
+            return callback
+
+        def wrapper(*args, **kwargs):
+            key = request.headers.get("Idempotency-Key")
+            user_id = getattr(request, "user_id", None)
+            if not key or user_id is None:
+                return callback(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(400, f"Idempotency-Key is limited to {MAX_KEY_LENGTH} characters")
+
+            digest = hashlib.sha256(f"{request.method} {request.path}?{request.query_string}\n".encode())
+            digest.update(request.body.read())
+            fingerprint = digest.hexdigest()
+
+            while True:
+                entry, owner = self.store.claim(user_id, key, fingerprint)
+                if owner:
+                    break
+                if entry.fingerprint != fingerprint:
+                    return _error(422, "Idempotency-Key was already used for a different request")
+                if not entry.done.wait(IDEMPOTENCY_WAIT):
+                    return _error(409, "A request with this Idempotency-Key is still in progress")
+                if entry.status is not None:
+                    inc("baketrack_idempotent_replays_total", route=route.rule)
+                    response.status = entry.status
+                    response.content_type = entry.content_type
+                    response.set_header("Idempotent-Replayed", "true")
+                    return entry.body
+                # The original failed without a response; claim the key again
+
+            keep = False
+            try:
+                result = callback(*args, **kwargs)
+                if response.status_code < 500 and isinstance(result, (dict, str, bytes)):
+                    entry.body = json.dumps(result).encode() if isinstance(result, dict) else result
+                    entry.content_type = "application/json" if isinstance(result, dict) else response.content_type
+                    entry.status = response.status_code
+                    keep = True
+                return result
+            finally:
+                self.store.finish(user_id, key, entry, keep)
+
+        return wrapper
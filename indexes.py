@@ -0,0 +1,157 @@
+import bisect
+import threading
+from utils.store import collection, subscribe
+
+# --- Per-user Derived Indexes ---
+class UserIndex:
+    """Secondary index over one collection, kept per user. A user's slice is
+    built from for_user() on first query and afterwards maintained from the
+    store's change events, so queries never rescan the collection."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._users = {}
+        self._events = {}
+        self._epoch = 0
+        subscribe(self._on_change)
+
+    def _on_change(self, name, op, user_id, record_id, record):
+        if op == "reset":
+            if name in (None, self.name):
+                with self._lock:
+                    if user_id is not None:
+                        # Only this user's records were reloaded
+                        self._users.pop(user_id, None)
+                        self._events[user_id] = self._events.get(user_id, 0) + 1
+                    else:
+                        self._users.clear()
+                        self._events.clear()
+                        self._epoch += 1
+            return
+        if name != self.name:
+            return
+        with self._lock:
+            self._events[user_id] = self._events.get(user_id, 0) + 1
+            state = self._users.get(user_id)
+            if state is not None:
+                self._discard(state, record_id)
+                if record is not None:
+                    self._add(state, record)
+
+    def _state(self, user_id):
+        state = self._users.get(user_id)
+        while state is None:
+            # Build without holding the lock; retry if a write raced the snapshot
+            with self._lock:
+                seen = (self._epoch, self._events.get(user_id, 0))
+            candidate = self._new()
+            for record in collection(self.name).for_user(user_id):
+                self._add(candidate, record)
+            with self._lock:
+                if seen == (self._epoch, self._events.get(user_id, 0)):
+                    state = self._users[user_id] = candidate
+        return state
+
+    def records(self, user_id, record_ids):
+        coll = collection(self.name)
+        return [r for r in (coll.get_for_user(user_id, i) for i in record_ids) if r is not None]
+
+    def _new(self):
+        raise NotImplementedError
+
+    def _add(self, state, record):
+        raise NotImplementedError
+
+    def _discard(self, state, record_id):
+        raise NotImplementedError
+
+class SetIndex(UserIndex):
+    """Ids of the user's records matching predicate, in insertion order."""
+
+    def __init__(self, name, predicate):
+        self.predicate = predicate
+        super().__init__(name)
+
+    def _new(self):
+        return {}
+
+    def _add(self, state, record):
+        if self.predicate(record):
+            state[record["id"]] = True
+
+    def _discard(self, state, record_id):
+        state.pop(record_id, None)
+
+    def ids(self, user_id):
+        state = self._state(user_id)
+        with self._lock:
+            return list(state)
+
+class SortedIndex(UserIndex):
+    """The user's records ordered by key(record); records whose key is None
+    are left out. Entries are (key, id) tuples, so ranges bisect on them."""
+
+    def __init__(self, name, key):
+        self.key = key
+        super().__init__(name)
+
+    def _new(self):
+        return ([], {})
+
+    def _add(self, state, record):
+        key = self.key(record)
+        if key is not None:
+            entries, keys = state
+            bisect.insort(entries, (key, record["id"]))
+            keys[record["id"]] = key
+
+    def _discard(self, state, record_id):
+        entries, keys = state
+        key = keys.pop(record_id, None)
+        if key is not None:
+            del entries[bisect.bisect_left(entries, (key, record_id))]
+
+    def range(self, user_id, start=None, stop=None, after=None, limit=None):
+        """Entries with start <= (key, id) < stop, strictly past the entry
+        `after` and at most `limit` of them; every bound may be omitted."""
+        entries, _ = self._state(user_id)
+        with self._lock:
+            lo = 0 if start is None else bisect.bisect_left(entries, start)
+            if after is not None:
+                lo = max(lo, bisect.bisect_right(entries, after))
+            hi = len(entries) if stop is None else bisect.bisect_left(entries, stop)
+            if limit is not None:
+                hi = min(hi, lo + limit)
+            return entries[lo:hi]
+
+class CountIndex(UserIndex):
+    """Number of the user's records per key(record); None keys are not
+    counted. Keeps dashboards from scanning records just to count them."""
+
+    def __init__(self, name, key=lambda record: "total"):
+        self.key = key
+        super().__init__(name)
+
+    def _new(self):
+        return ({}, {})
+
+    def _add(self, state, record):
+        key = self.key(record)
+        if key is not None:
+            counts, keys = state
+            counts[key] = counts.get(key, 0) + 1
+            keys[record["id"]] = key
+
+    def _discard(self, state, record_id):
+        counts, keys = state
+        key = keys.pop(record_id, None)
+        if key is not None:
+            counts[key] -= 1
+            if not counts[key]:
+                del counts[key]
+
+    def counts(self, user_id):
+        counts, _ = self._state(user_id)
+        with self._lock:
+            return dict(counts)
@@ -1,32 +1,38 @@
 from bottle import request, response
 import uuid
-from datetime import datetime
-from utils.json_os import read_json, write_json
-from routes.recipes import remove_recipes_with_ingredient
-from routes.meals import remove_meals_with_recipes
-
-FILE_PATH = 'data/ingredients.json'
+from datetime import datetime, date, timedelta
+from utils.store import collection, transaction
+from utils.cascade import plan_delete, cascade_delete, summarize
+from utils.indexes import SetIndex, SortedIndex
+from utils.pagination import page, PREFIX_END
+from utils.models import Ingredient, invalid_message
+from utils.ledger import record_movement, to_decimal
 
 # --- Helpers ---
-def _load_data():
-    return read_json(FILE_PATH)
-
-def _save_data(data):
-    write_json(FILE_PATH, data)
+def _store():
+    return collection("ingredients")
 
-def _validate_fields(ingredient):
-    required = ["name", "unit", "category", "quantity", "minQuantity"]
-    return [f for f in required if f not in ingredient]
+def _is_low_stock(ingredient):
+    try:
+        return ingredient.get("quantity", 0) < ingredient.get("minQuantity", 0)
+    except TypeError:
+        return False
 
-def _is_expired(ingredient):
+def _expiry_date(ingredient):
     date_str = ingredient.get("expiryDate")
     if not date_str:
-        return False
+        return None
     try:
-        expiry = datetime.strptime(date_str, "%Y-%m-%d").date()
-        return expiry < datetime.today().date()
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
     except Exception:
-        return False
+        return None
+
+# Maintained from store change events: stock edits, meal deductions and
+# restores all land here without rescanning the user's ingredients.
+_low_stock_index = SetIndex("ingredients", _is_low_stock)
+_expiry_index = SortedIndex("ingredients", _expiry_date)
+_name_index = SortedIndex("ingredients", lambda i: (str(i.get("name", "")).lower(),))
+_category_index = SortedIndex("ingredients", lambda i: (str(i.get("category", "")).lower(), str(i.get("name", "")).lower()))
 
 # --- CREATE ---
 def add_ingredient():
@@ -35,18 +41,20 @@ def add_ingredient():
         response.status = 400
         return {"success": False, "message": "Invalid JSON"}
 
-    missing = _validate_fields(new)
-    if missing:
+    missing, invalid = Ingredient.check(new)
+    if missing or invalid:
         response.status = 400
-        return {"success": False, "message": f"Missing fields: {', '.join(missing)}"}
+        return {"success": False, "message": invalid_message(missing, invalid)}
 
     user_id = request.user_id
     new_id = f"ing{uuid.uuid4().hex[:8]}"
-    new.update({"id": new_id, "userId": user_id})
+    opening = new.pop("quantity")
+    new.update({"id": new_id, "userId": user_id, "quantity": 0})
 
-    data = _load_data()
-    data.append(new)
-    _save_data(data)
+    with transaction(user_id) as tx:
+        # The opening stock is the ingredient's first ledger entry
+        record_movement(tx, new, opening, "initial")
+        tx.commit()
 
     response.status = 201
     return {"success": True, "message": "Ingredient added", "id": new_id}
@@ -54,18 +62,24 @@ def add_ingredient():
 # --- READ ALL ---
 def get_ingredients():
     user_id = request.user_id
-    data = _load_data()
-    user_ingredients = [item for item in data if item.get("userId") == user_id]
-    user_ingredients.sort(key=lambda x: x["name"].lower())
-    return {"success": True, "data": user_ingredients}
+    category = request.query.get("category", "").lower()
+    try:
+        if category:
+            user_ingredients, cursor = page(_category_index, user_id, request.query,
+                                            start=((category,),), stop=((category, PREFIX_END),))
+        else:
+            user_ingredients, cursor = page(_name_index, user_id, request.query)
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+    return {"success": True, "data": user_ingredients, "nextCursor": cursor}
 
 # --- READ ONE ---
 def get_ingredient(id):
     user_id = request.user_id
-    data = _load_data()
-    for item in data:
-        if item["id"] == id and item.get("userId") == user_id:
-            return {"success": True, "data": item}
+    item = _store().get_for_user(user_id, id)
+    if item:
+        return {"success": True, "data": item}
     response.status = 404
     return {"success": False, "message": "Ingredient not found"}
 
@@ -76,14 +90,24 @@ def update_ingredient(id):
         response.status = 400
         return {"success": False, "message": "Invalid JSON"}
 
+    _, invalid = Ingredient.check(updates, partial=True)
+    if invalid:
+        response.status = 400
+        return {"success": False, "message": invalid_message([], invalid)}
+
     user_id = request.user_id
-    data = _load_data()
-    for i, item in enumerate(data):
-        if item["id"] == id and item.get("userId") == user_id:
+    with transaction(user_id) as tx:
+        item = tx.get_for_user("ingredients", id)
+        if item:
             updates.pop("id", None)
             updates.pop("userId", None)
-            data[i].update(updates)
-            _save_data(data)
+            quantity = updates.pop("quantity", None)
+            item.update(updates)
+            tx.put("ingredients", item)
+            if quantity is not None:
+                # Manual stock edits go through the ledger as adjustments
+                record_movement(tx, item, to_decimal(quantity) - to_decimal(item.get("quantity")), "adjust")
+            tx.commit()
             return {"success": True, "message": "Ingredient updated"}
 
     response.status = 404
@@ -92,37 +116,49 @@ def update_ingredient(id):
 # --- DELETE ---
 def delete_ingredient(id):
     user_id = request.user_id
-    data = _load_data()
-    new_data = [item for item in data if not (item["id"] == id and item.get("userId") == user_id)]
-
-    if len(new_data) == len(data):
-        response.status = 404
-        return {"success": False, "message": "Ingredient not found or unauthorized"}
-
-    # Remove dependent recipes and meals
-    removed_recipe_ids = remove_recipes_with_ingredient(id, user_id)
-    if removed_recipe_ids:
-        remove_meals_with_recipes(user_id, removed_recipe_ids)
-
-    _save_data(new_data)
+    with transaction(user_id) as tx:
+        if not tx.get_for_user("ingredients", id):
+            response.status = 404
+            return {"success": False, "message": "Ingredient not found or unauthorized"}
+
+        # Remove dependent recipes and meals in the same commit
+        removed = cascade_delete(tx, "ingredients", id)
+        tx.commit()
     return {
         "success": True,
-        "message": f"Ingredient deleted. Also removed {len(removed_recipe_ids)} recipe(s) and associated meal(s)."
+        "message": f"Ingredient deleted. Also removed {len(removed.get('recipes', []))} recipe(s) and associated meal(s)."
     }
 
+# --- DELETE PREVIEW ---
+def preview_delete_ingredient(id):
+    user_id = request.user_id
+    if not _store().get_for_user(user_id, id):
+        response.status = 404
+        return {"success": False, "message": "Ingredient not found or unauthorized"}
+    return {"success": True, "data": summarize(plan_delete(user_id, "ingredients", id))}
+
 # --- LOW STOCK ---
 def get_low_stock_ingredients():
     user_id = request.user_id
-    data = _load_data()
-    low_stock = [
-        item for item in data
-        if item.get("userId") == user_id and item.get("quantity", 0) < item.get("minQuantity", 0)
-    ]
+    low_stock = _low_stock_index.records(user_id, _low_stock_index.ids(user_id))
     return {"success": True, "data": low_stock}
 
 # --- EXPIRED ---
 def get_expired_ingredients():
     user_id = request.user_id
-    data = _load_data()
-    expired = [item for item in data if item.get("userId") == user_id and _is_expired(item)]
+    entries = _expiry_index.range(user_id, stop=(date.today(),))
+    expired = _expiry_index.records(user_id, [record_id for _, record_id in entries])
     return {"success": True, "data": expired}
+
+# --- EXPIRING SOON ---
+def get_expiring_ingredients():
+    days = request.query.get("days", "7")
+    if not days.isdigit():
+        response.status = 400
+        return {"success": False, "message": "days must be a non-negative integer"}
+
+    user_id = request.user_id
+    today = date.today()
+    entries = _expiry_index.range(user_id, start=(today,), stop=(today + timedelta(days=int(days) + 1),))
+    expiring = _expiry_index.records(user_id, [record_id for _, record_id in entries])
+    return {"success": True, "data": expiring}
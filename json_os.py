@@ -1,12 +1,68 @@
 import json
 import os
+import tempfile
+from utils.metrics import StorageTimer
+
+# --- Compact Encoding ---
+# No indentation and minimal separators: smaller files and faster parsing.
+_encoder = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+def dumps_compact(data):
+    return _encoder.encode(data)
+
+def encode_record(record):
+    return _encoder.encode(record).encode()
 
 def read_json(file_path):
     if not os.path.exists(file_path):
         return []
-    with open(file_path, 'r') as f:
-        return json.load(f)
+    with StorageTimer("read") as io, open(file_path, 'r') as f:
+        data = json.load(f)
+        io.bytes = f.tell()
+    return data
 
 def write_json(file_path, data):
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    if isinstance(data, list):
+        write_records(file_path, [encode_record(item) for item in data])
+    else:
+        _write_atomic(file_path, dumps_compact(data).encode())
+
+def write_records(file_path, encoded):
+    """Write a JSON array from already-encoded records, one per line."""
+    _write_atomic(file_path, b"[\n" + b",\n".join(encoded) + b"\n]\n" if encoded else b"[]\n")
+
+def _write_atomic(file_path, payload):
+    # Write to a temp file and rename so a crash never leaves a truncated file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", suffix=".tmp")
+    try:
+        with StorageTimer("write") as io, os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            io.bytes = len(payload)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# --- Journal (one compact JSON entry per line) ---
+def encode_entry(entry):
+    return dumps_compact(entry) + "\n"
+
+def read_journal(file_path):
+    """Return (entries, valid_bytes); parsing stops at a torn trailing line."""
+    entries = []
+    valid = 0
+    if not os.path.exists(file_path):
+        return entries, valid
+    with StorageTimer("read") as io, open(file_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            valid += len(line)
+        io.bytes = valid
+    return entries, valid
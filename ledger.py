@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+# Stock amounts are computed in Decimal at this precision, then stored as
+# the shortest JSON number, so repeated deductions never drift (no more
+# 1.2000000000000002).
+QUANTUM = Decimal("0.000001")
+
+# Movement reasons and the daily bucket field each one adds to
+REASONS = {"deduct": "used", "restore": "restored", "adjust": "adjusted", "initial": "adjusted"}
+
+def to_decimal(value):
+    return Decimal(str(value or 0)).quantize(QUANTUM)
+
+def to_number(value):
+    value = value.quantize(QUANTUM).normalize()
+    return int(value) if value == value.to_integral_value() else float(value)
+
+def bucket_id(ingredient_id, day):
+    return f"{ingredient_id}:{day}"
+
+# --- Movements ---
+def record_movement(tx, ingredient, delta, reason, **ref):
+    """Apply delta to the ingredient's running balance (its quantity) and
+    stage the ledger entry and the day's bucket on tx, so stock, history
+    and rollups commit together. ref (e.g. recipeId) is kept on the entry.
+    Returns the entry."""
+    delta = to_decimal(delta)
+    balance = to_decimal(ingredient.get("quantity")) + delta
+    ingredient["quantity"] = to_number(balance)
+    tx.put("ingredients", ingredient)
+
+    at = datetime.now().isoformat()
+    entry = dict(ref, **{
+        "id": f"mov{uuid.uuid4().hex[:12]}",
+        "userId": tx.user_id,
+        "ingredientId": ingredient["id"],
+        "reason": reason,
+        "delta": to_number(delta),
+        "balance": ingredient["quantity"],
+        "at": at,
+    })
+    tx.put("stock_movements", entry)
+
+    day = at[:10]
+    bucket = tx.get_for_user("stock_daily", bucket_id(ingredient["id"], day)) or {
+        "id": bucket_id(ingredient["id"], day), "userId": tx.user_id, "ingredientId": ingredient["id"],
+        "day": day, "used": 0, "restored": 0, "adjusted": 0, "movements": 0,
+    }
+    field = REASONS[reason]
+    amount = -delta if field == "used" else delta
+    bucket[field] = to_number(to_decimal(bucket[field]) + amount)
+    bucket["movements"] += 1
+    tx.put("stock_daily", bucket)
+    return entry
+
+def has_enough(ingredient, quantity):
+    return to_decimal(ingredient.get("quantity")) >= to_decimal(quantity)
@@ -1,124 +1,314 @@
 from bottle import request, response
-from utils.json_os import read_json, write_json
+from utils.store import collection, transaction
+from utils.indexes import SortedIndex
+from utils.pagination import page, parse_page, check_cursor, encode_cursor, PREFIX_END, MAX_PAGE_SIZE
+from utils.ledger import record_movement, has_enough
+from utils.models import Meal, invalid_message
+from utils.recurrence import parse_rule, occurrences, next_after, iso_date
+import heapq
+import os
+import threading
+import time
 import uuid
-from datetime import datetime
+from datetime import date, timedelta
+from itertools import islice
 
-# --- Constants ---
-MEAL_FILE = "data/meals.json"
-RECIPE_FILE = "data/recipes.json"
-INGREDIENT_FILE = "data/ingredients.json"
+# Recurring rules turn into real meals, deducting stock, once an occurrence
+# is within RECURRING_HORIZON_DAYS of today; later ones are only expanded
+# when read. Occurrences come due with the date, not with requests, so a
+# background pass materializes them every MATERIALIZE_INTERVAL seconds
+# (reads never write).
+RECURRING_HORIZON_DAYS = int(os.environ.get("BAKETRACK_RECURRING_HORIZON_DAYS", "7"))
+MATERIALIZE_INTERVAL = float(os.environ.get("BAKETRACK_MATERIALIZE_INTERVAL", "300"))
 
 # --- Composite Helpers ---
-def get_user_recipe(user_id, recipe_id):
-    recipes = read_json(RECIPE_FILE)
-    return next((r for r in recipes if r["id"] == recipe_id and r["userId"] == user_id), None)
+def _meals():
+    return collection("meals")
 
-def get_user_ingredients(user_id):
-    return [i for i in read_json(INGREDIENT_FILE) if i["userId"] == user_id]
+def _rules():
+    return collection("meal_rules")
 
-def get_user_ingredient_map(user_id):
-    return {i["id"]: i for i in get_user_ingredients(user_id)}
+def _slot(meal):
+    # A record with a non-text date or time (written before dates were
+    # validated) is left out of the schedule instead of breaking its order
+    slot = (meal.get("date"), meal.get("time"))
+    return slot if all(isinstance(v, str) for v in slot) else None
 
-def save_ingredients(all_ingredients, updated_map, user_id):
-    new_data = []
-    for ing in all_ingredients:
-        if ing["userId"] == user_id and ing["id"] in updated_map:
-            new_data.append(updated_map[ing["id"]])
-        else:
-            new_data.append(ing)
-    write_json(INGREDIENT_FILE, new_data)
-
-def remove_meals_with_recipes(user_id, recipe_ids):
-    meals = read_json(MEAL_FILE)
-    new_meals = [m for m in meals if not (m["userId"] == user_id and m["recipeId"] in recipe_ids)]
-    write_json(MEAL_FILE, new_meals)
-
-def remove_meals_with_recipe(user_id, recipe_id):
-    remove_meals_with_recipes(user_id, [recipe_id])
+# Schedule order, and the same split by done state so ?done= stays a range
+_schedule_index = SortedIndex("meals", _slot)
+_state_index = SortedIndex("meals", lambda m: (bool(m.get("done")),) + _slot(m) if _slot(m) else None)
+# Rules by their next unmaterialized occurrence; finished rules are left out
+_due_index = SortedIndex("meal_rules", lambda r: (r["next"],) if r.get("next") else None)
 
+def _slot_taken(user_id, day, time):
+    return bool(_schedule_index.range(user_id, start=((day, time),), stop=((day, time, ""),), limit=1))
 
 # --- Ingredient Management ---
-def validate_and_deduct_ingredients(user_id, recipe_id):
-    recipe = get_user_recipe(user_id, recipe_id)
+# Both helpers stage their changes on the caller's transaction, so the
+# stock check, the deduction, its ledger entry and the meal write commit
+# or abort together.
+def validate_and_deduct_ingredients(tx, recipe_id):
+    recipe = tx.get_for_user("recipes", recipe_id)
     if not recipe:
         return False, "Recipe not found"
 
-    all_ingredients = read_json(INGREDIENT_FILE)
-    user_ing_map = get_user_ingredient_map(user_id)
-
-    for ri in recipe["ingredients"]:
-        ing = user_ing_map.get(ri["ingredientId"])
+    # Recipes may have been saved without an ingredients list
+    lines = recipe.get("ingredients") or []
+    for ri in lines:
+        ing = tx.get_for_user("ingredients", ri["ingredientId"])
         if not ing:
             return False, f"Missing ingredient: {ri['ingredientId']}"
-        if ing["quantity"] < ri["quantity"]:
+        if not has_enough(ing, ri["quantity"]):
             return False, f"Not enough {ing['name']} (required {ri['quantity']}, available {ing['quantity']})"
 
-    for ri in recipe["ingredients"]:
-        user_ing_map[ri["ingredientId"]]["quantity"] -= ri["quantity"]
+    for ri in lines:
+        ing = tx.get_for_user("ingredients", ri["ingredientId"])
+        record_movement(tx, ing, -ri["quantity"], "deduct", recipeId=recipe_id)
 
-    save_ingredients(all_ingredients, user_ing_map, user_id)
     return True, None
 
-def restore_ingredients(user_id, recipe_id):
-    recipe = get_user_recipe(user_id, recipe_id)
+def restore_ingredients(tx, recipe_id):
+    recipe = tx.get_for_user("recipes", recipe_id)
     if not recipe:
         return
 
-    all_ingredients = read_json(INGREDIENT_FILE)
-    user_ing_map = get_user_ingredient_map(user_id)
-
-    for ri in recipe["ingredients"]:
-        if ri["ingredientId"] in user_ing_map:
-            user_ing_map[ri["ingredientId"]]["quantity"] += ri["quantity"]
-
-    save_ingredients(all_ingredients, user_ing_map, user_id)
+    for ri in recipe.get("ingredients") or []:
+        ing = tx.get_for_user("ingredients", ri["ingredientId"])
+        if ing:
+            record_movement(tx, ing, ri["quantity"], "restore", recipeId=recipe_id)
+
+# --- Recurring Meals ---
+def _horizon():
+    return (date.today() + timedelta(days=RECURRING_HORIZON_DAYS)).isoformat()
+
+def _materialize(tx, rule, horizon, taken):
+    """Stage a meal, and its deduction, on tx for each of the rule's
+    occurrences up to horizon, advancing rule["through"] and rule["next"]
+    (the caller puts the rule). A slot that already has a meal is skipped;
+    an occurrence the stock can't cover stops the rule there, as "blocked",
+    until a later check. Occurrences before today (missed while blocked)
+    are skipped, never backfilled. Returns the new meals."""
+    created = []
+    rule.pop("blocked", None)
+    today = date.today()
+    if rule.get("next") and rule["next"] < today.isoformat():
+        rule["through"] = (today - timedelta(days=1)).isoformat()
+        rule["next"] = next_after(rule, rule["through"])
+    while rule.get("next") and rule["next"] <= horizon:
+        day = rule["next"]
+        slot = (day, rule["time"])
+        if slot not in taken and not _slot_taken(tx.user_id, *slot):
+            valid, error = validate_and_deduct_ingredients(tx, rule["recipeId"])
+            if not valid:
+                rule["blocked"] = {"date": day, "message": error}
+                break
+            meal = {
+                "id": f"meal{uuid.uuid4().hex[:8]}",
+                "userId": tx.user_id,
+                "date": day,
+                "time": rule["time"],
+                "recipeId": rule["recipeId"],
+                "done": False,
+                "ruleId": rule["id"],
+            }
+            tx.put("meals", meal)
+            taken.add(slot)
+            created.append(meal)
+        rule["through"] = day
+        rule["next"] = next_after(rule, day)
+    return created
+
+def materialize_due(user_id):
+    """Turn the user's rule occurrences that have come within the horizon
+    into meals. One index lookup when nothing is due."""
+    horizon = _horizon()
+    due = _due_index.range(user_id, stop=((horizon, PREFIX_END),))
+    if not due:
+        return []
+    created = []
+    with transaction(user_id) as tx:
+        taken = set()
+        for _, rule_id in due:
+            rule = tx.get_for_user("meal_rules", rule_id)
+            if rule:
+                before = dict(rule)
+                created += _materialize(tx, rule, horizon, taken)
+                # A still-blocked rule is left as it was
+                if rule != before:
+                    tx.put("meal_rules", rule)
+        tx.commit()
+    return created
+
+def materialize_all():
+    """materialize_due() for every user with a rule due within the horizon.
+    Reads every rule, so in the sharded layout every tenant's file. A user
+    whose rules fail is logged and skipped; the others still get theirs."""
+    horizon = _horizon()
+    users = {r["userId"] for r in _rules().all() if r.get("next") and r["next"] <= horizon}
+    created = []
+    for user_id in users:
+        try:
+            created += materialize_due(user_id)
+        except Exception as e:
+            print(f"[meals] materializing recurring meals for {user_id} failed: {e!r}")
+    return created
+
+_materializer = None
+
+def _materialize_loop():
+    while True:
+        try:
+            materialize_all()
+        except Exception as e:
+            # The thread must outlive any one pass
+            print(f"[meals] materializing recurring meals failed: {e!r}")
+        time.sleep(MATERIALIZE_INTERVAL)
+
+def start_materializer():
+    global _materializer
+    if _materializer is None:
+        _materializer = threading.Thread(target=_materialize_loop, name="meal-materializer", daemon=True)
+        _materializer.start()
+
+def _virtual_entries(user_id, rule, start_date, end_date, state, records):
+    # The rule's occurrences past its materialized ones (and from today on,
+    # as earlier ones never materialize), as index entries; their meals land
+    # in records as they are generated
+    first = max(rule["next"], start_date, date.today().isoformat())
+    for day in occurrences(rule, date.fromisoformat(first)):
+        day = day.isoformat()
+        if day > end_date:
+            return
+        if _slot_taken(user_id, day, rule["time"]):
+            continue
+        meal_id = f"{rule['id']}:{day}"
+        records[meal_id] = {
+            "id": meal_id,
+            "userId": user_id,
+            "date": day,
+            "time": rule["time"],
+            "recipeId": rule["recipeId"],
+            "done": False,
+            "ruleId": rule["id"],
+            "virtual": True,
+        }
+        key = (day, rule["time"])
+        yield ((state,) + key if state is not None else key), meal_id
+
+def _expanded_page(user_id, query, rules, start_date, end_date, state):
+    """page() over the schedule (state None) or pending meals (state False)
+    with the rules' upcoming occurrences merged in as virtual meals. The
+    occurrences are generated lazily, so at most a page of them is built;
+    without ?limit= a page holds MAX_PAGE_SIZE."""
+    limit, after = parse_page(query)
+    limit = limit or MAX_PAGE_SIZE
+    if start_date:
+        try:
+            date.fromisoformat(start_date)
+        except ValueError:
+            raise ValueError("from must be a date (YYYY-MM-DD)")
+    index = _schedule_index if state is None else _state_index
+    prefix = () if state is None else (state,)
+    if after is not None:
+        check_cursor(index, user_id, after)
+    records = {}
+    try:
+        real = index.range(user_id, start=(prefix + (start_date,),), stop=(prefix + (end_date, PREFIX_END),),
+                           after=after, limit=limit + 1)
+        merged = heapq.merge(real, *(_virtual_entries(user_id, rule, start_date, end_date, state, records) for rule in rules))
+        entries = list(islice((e for e in merged if after is None or e > after), limit + 1))
+    except TypeError:
+        if after is None:
+            raise
+        raise ValueError("Invalid cursor")
+    cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        cursor = encode_cursor(entries[-1])
+    meals = (records.get(meal_id) or _meals().get_for_user(user_id, meal_id) for _, meal_id in entries)
+    return [m for m in meals if m is not None], cursor
 
 # --- Routes ---
 def add_meal():
     user_id = request.user_id
     body = request.json
-    date = body.get("date")
-    time = body.get("time", "").strip().lower()
-    recipe_id = body.get("recipeId")
+    if not isinstance(body, dict):
+        response.status = 400
+        return {"success": False, "message": "Invalid JSON"}
+    missing, invalid = Meal.check(body)
+    if missing or invalid:
+        response.status = 400
+        return {"success": False, "message": invalid_message(missing, invalid)}
 
+    date = body["date"]
+    time = body["time"].strip().lower()
+    recipe_id = body["recipeId"]
     if not (date and time and recipe_id):
         response.status = 400
         return {"success": False, "message": "Missing fields (date, time, recipeId)"}
-
-    valid, error = validate_and_deduct_ingredients(user_id, recipe_id)
-    if not valid:
+    try:
+        date = iso_date(date)
+    except ValueError as e:
         response.status = 400
-        return {"success": False, "message": error}
+        return {"success": False, "message": str(e)}
+
+    with transaction(user_id) as tx:
+        if _slot_taken(user_id, date, time):
+            response.status = 400
+            return {"success": False, "message": f"Meal already exists for {time} on {date}"}
+
+        valid, error = validate_and_deduct_ingredients(tx, recipe_id)
+        if not valid:
+            response.status = 400
+            return {"success": False, "message": error}
+
+        meal_id = f"meal{uuid.uuid4().hex[:8]}"
+        new_meal = {
+            "id": meal_id,
+            "userId": user_id,
+            "date": date,
+            "time": time,
+            "recipeId": recipe_id,
+            "done": False
+        }
+
+        tx.put("meals", new_meal)
+        tx.commit()
 
-    meals = read_json(MEAL_FILE)
-    if any(m["date"] == date and m["time"] == time and m["userId"] == user_id for m in meals):
-        response.status = 400
-        return {"success": False, "message": f"Meal already exists for {time} on {date}"}
-
-    meal_id = f"meal{uuid.uuid4().hex[:8]}"
-    new_meal = {
-        "id": meal_id,
-        "userId": user_id,
-        "date": date,
-        "time": time,
-        "recipeId": recipe_id,
-        "done": False
-    }
-
-    meals.append(new_meal)
-    write_json(MEAL_FILE, meals)
     response.status = 201
     return {"success": True, "message": "Meal added", "mealId": meal_id, "data": new_meal}
 
 def get_meals():
     user_id = request.user_id
-    meals = [m for m in read_json(MEAL_FILE) if m["userId"] == user_id]
-    return {"success": True, "data": meals}
+    query = request.query
+    start_date = query.get("from", "")
+    end_date = query.get("to", PREFIX_END)
+    done = query.get("done")
+    if done not in (None, "true", "false"):
+        response.status = 400
+        return {"success": False, "message": "done must be true or false"}
+
+    # Pending schedules include the rules' occurrences not yet materialized
+    rules = [r for r in _rules().for_user(user_id) if r.get("next")] if done != "true" else []
+    try:
+        if rules:
+            meals, cursor = _expanded_page(user_id, query, rules, start_date, end_date,
+                                           None if done is None else False)
+        elif done is None:
+            meals, cursor = page(_schedule_index, user_id, query,
+                                 start=((start_date,),), stop=((end_date, PREFIX_END),))
+        else:
+            state = done == "true"
+            meals, cursor = page(_state_index, user_id, query,
+                                 start=((state, start_date),), stop=((state, end_date, PREFIX_END),))
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+    return {"success": True, "data": meals, "nextCursor": cursor}
 
 def get_meal(meal_id):
     user_id = request.user_id
-    meals = read_json(MEAL_FILE)
-    meal = next((m for m in meals if m["id"] == meal_id and m["userId"] == user_id), None)
+    meal = _meals().get_for_user(user_id, meal_id)
 
     if not meal:
         response.status = 404
@@ -128,26 +318,34 @@ def get_meal(meal_id):
 def update_meal(meal_id):
     user_id = request.user_id
     updates = request.json
+    if not isinstance(updates, dict):
+        response.status = 400
+        return {"success": False, "message": "Invalid JSON"}
+    _, invalid = Meal.check(updates, partial=True)
+    if invalid:
+        response.status = 400
+        return {"success": False, "message": invalid_message([], invalid)}
     new_recipe_id = updates.get("recipeId")
 
     if not new_recipe_id:
         response.status = 400
         return {"success": False, "message": "Missing recipeId"}
 
-    meals = read_json(MEAL_FILE)
-    for meal in meals:
-        if meal["id"] == meal_id and meal["userId"] == user_id:
-            # Restore old ingredients if not done
+    with transaction(user_id) as tx:
+        meal = tx.get_for_user("meals", meal_id)
+        if meal:
+            # Restore old ingredients if not done; discarded if the new recipe fails
             if not meal.get("done"):
-                restore_ingredients(user_id, meal["recipeId"])
+                restore_ingredients(tx, meal["recipeId"])
 
-            valid, error = validate_and_deduct_ingredients(user_id, new_recipe_id)
+            valid, error = validate_and_deduct_ingredients(tx, new_recipe_id)
             if not valid:
                 response.status = 400
                 return {"success": False, "message": error}
 
             meal["recipeId"] = new_recipe_id
-            write_json(MEAL_FILE, meals)
+            tx.put("meals", meal)
+            tx.commit()
             return {"success": True, "message": "Meal updated", "data": meal}
 
     response.status = 404
@@ -155,11 +353,12 @@ def update_meal(meal_id):
 
 def mark_meal_done(meal_id):
     user_id = request.user_id
-    meals = read_json(MEAL_FILE)
-    for meal in meals:
-        if meal["id"] == meal_id and meal["userId"] == user_id:
+    with transaction(user_id) as tx:
+        meal = tx.get_for_user("meals", meal_id)
+        if meal:
             meal["done"] = True
-            write_json(MEAL_FILE, meals)
+            tx.put("meals", meal)
+            tx.commit()
             return {"success": True, "message": "Meal marked as done"}
 
     response.status = 404
@@ -167,14 +366,95 @@ def mark_meal_done(meal_id):
 
 def delete_meal(meal_id):
     user_id = request.user_id
-    meals = read_json(MEAL_FILE)
-    for i, meal in enumerate(meals):
-        if meal["id"] == meal_id and meal["userId"] == user_id:
+    with transaction(user_id) as tx:
+        meal = tx.get_for_user("meals", meal_id)
+        if meal:
             if not meal.get("done"):
-                restore_ingredients(user_id, meal["recipeId"])
-            meals.pop(i)
-            write_json(MEAL_FILE, meals)
+                restore_ingredients(tx, meal["recipeId"])
+            tx.delete("meals", meal_id)
+            tx.commit()
             return {"success": True, "message": "Meal deleted"}
 
     response.status = 404
-    return {"success": False, "message": "Meal not found"}
\ No newline at end of file
+    return {"success": False, "message": "Meal not found"}
+# --- Recurring Meal Routes ---
+# A rule is one record however many meals it stands for. Occurrences before
+# today are never materialized; editing or deleting a rule only affects the
+# occurrences that haven't been materialized yet.
+def add_meal_rule():
+    user_id = request.user_id
+    try:
+        fields = parse_rule(request.json)
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+
+    with transaction(user_id) as tx:
+        if not tx.get_for_user("recipes", fields["recipeId"]):
+            response.status = 400
+            return {"success": False, "message": "Recipe not found"}
+
+        rule = dict(fields, id=f"rule{uuid.uuid4().hex[:8]}", userId=user_id)
+        rule["through"] = (max(date.fromisoformat(rule["start"]), date.today()) - timedelta(days=1)).isoformat()
+        rule["next"] = next_after(rule, rule["through"])
+        if not rule["next"]:
+            response.status = 400
+            return {"success": False, "message": "The rule has no occurrences from today on"}
+
+        created = _materialize(tx, rule, _horizon(), set())
+        tx.put("meal_rules", rule)
+        tx.commit()
+
+    response.status = 201
+    return {"success": True, "message": "Meal rule added", "ruleId": rule["id"], "data": rule, "meals": created}
+
+def get_meal_rules():
+    return {"success": True, "data": _rules().for_user(request.user_id)}
+
+def get_meal_rule(rule_id):
+    rule = _rules().get_for_user(request.user_id, rule_id)
+    if not rule:
+        response.status = 404
+        return {"success": False, "message": "Meal rule not found"}
+    return {"success": True, "data": rule}
+
+def update_meal_rule(rule_id):
+    user_id = request.user_id
+    updates = request.json
+    if not isinstance(updates, dict):
+        response.status = 400
+        return {"success": False, "message": "Send a JSON object"}
+
+    with transaction(user_id) as tx:
+        rule = tx.get_for_user("meal_rules", rule_id)
+        if not rule:
+            response.status = 404
+            return {"success": False, "message": "Meal rule not found"}
+        try:
+            fields = parse_rule(dict(rule, **updates))
+        except ValueError as e:
+            response.status = 400
+            return {"success": False, "message": str(e)}
+        if not tx.get_for_user("recipes", fields["recipeId"]):
+            response.status = 400
+            return {"success": False, "message": "Recipe not found"}
+
+        rule.pop("byDay", None)
+        rule.update(fields)
+        rule["next"] = next_after(rule, rule["through"])
+        created = _materialize(tx, rule, _horizon(), set())
+        tx.put("meal_rules", rule)
+        tx.commit()
+
+    return {"success": True, "message": "Meal rule updated", "data": rule, "meals": created}
+
+def delete_meal_rule(rule_id):
+    user_id = request.user_id
+    with transaction(user_id) as tx:
+        if not tx.get_for_user("meal_rules", rule_id):
+            response.status = 404
+            return {"success": False, "message": "Meal rule not found"}
+        # Meals it already materialized stay, like any other meal
+        tx.delete("meal_rules", rule_id)
+        tx.commit()
+    return {"success": True, "message": "Meal rule deleted"}
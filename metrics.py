@@ -0,0 +1,220 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from bottle import request, response, HTTPResponse, HTTPError
+
+# Seconds; shared by the request latency and password hashing histograms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Profiling is off unless enabled; then a request opts in with
+# "X-Profile: cpu" or "X-Profile: memory", or is sampled at PROFILE_SAMPLE_RATE.
+PROFILING = os.environ.get("BAKETRACK_PROFILING", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("BAKETRACK_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("BAKETRACK_PROFILE_DIR", "profiles")
+
+# --- Registry ---
+# Values live in this process; with serve.py --workers each worker reports its own.
+METRICS = {
+    "baketrack_http_requests_total": ("counter", "HTTP requests by route, method and status."),
+    "baketrack_http_request_duration_seconds": ("histogram", "HTTP request latency by route and method."),
+    "baketrack_storage_operations_total": ("counter", "Storage reads and writes (JSON files, journals, SQLite)."),
+    "baketrack_storage_seconds_total": ("counter", "Time spent in storage reads and writes."),
+    "baketrack_storage_bytes_total": ("counter", "Bytes read from and written to storage."),
+    "baketrack_password_hash_duration_seconds": ("histogram", "Password hashing and verification time, including queueing."),
+    "baketrack_coalesced_requests_total": ("counter", "ASGI requests answered by joining an identical in-flight request."),
+    "baketrack_idempotent_replays_total": ("counter", "Mutating requests answered with the stored response for their Idempotency-Key."),
+}
+
+_counters = {}
+_histograms = {}
+_lock = threading.Lock()
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        state = _histograms.get(key)
+        if state is None:
+            state = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+class StorageTimer:
+    """with StorageTimer("read") as io: ... io.bytes = n"""
+
+    def __init__(self, op):
+        self.op = op
+        self.bytes = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        with _lock:
+            for name, value in (
+                ("baketrack_storage_operations_total", 1),
+                ("baketrack_storage_seconds_total", elapsed),
+                ("baketrack_storage_bytes_total", self.bytes),
+            ):
+                key = (name, (("op", self.op),))
+                _counters[key] = _counters.get(key, 0) + value
+
+# --- Prometheus Text Format ---
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(b), s, c) for key, (b, s, c) in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, pairs), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+            continue
+        for (metric, pairs), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(pairs + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(pairs + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(pairs)} {count}")
+    return "\n".join(lines) + "\n"
+
+# --- Profiling ---
+_tracemalloc_lock = threading.Lock()
+
+def _profile_mode():
+    if not PROFILING:
+        return None
+    mode = request.headers.get("X-Profile")
+    if mode in ("cpu", "memory"):
+        return mode
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "cpu"
+    return None
+
+def _profile_path(route, suffix):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    rule = re.sub(r"[^A-Za-z0-9]+", "_", route.rule).strip("_")
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(PROFILE_DIR, f"{stamp}-{route.method}-{rule}-{uuid.uuid4().hex[:6]}{suffix}")
+
+def _profiled(mode, route, callback, args, kwargs):
+    if mode == "cpu":
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(callback, *args, **kwargs)
+        finally:
+            path = _profile_path(route, ".prof")
+            profiler.dump_stats(path)
+            response.set_header("X-Profile-File", path)
+
+    # tracemalloc is process-wide, so one memory profile at a time
+    if not _tracemalloc_lock.acquire(blocking=False):
+        response.set_header("X-Profile-File", "busy")
+        return callback(*args, **kwargs)
+    try:
+        tracemalloc.start()
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = _profile_path(route, ".txt")
+            with open(path, "w") as f:
+                f.write(f"peak {peak} bytes\n")
+                f.writelines(f"{stat}\n" for stat in snapshot.statistics("lineno")[:25])
+            response.set_header("X-Profile-File", path)
+    finally:
+        _tracemalloc_lock.release()
+
+# --- Plugin ---
+class MetricsPlugin:
+    """Counts requests by route, method and status and records their latency.
+    Timing runs from the first before_request hook to after_request, so
+    requests rejected by auth or never routed are counted as well."""
+
+    name = "metrics"
+    api = 2
+
+    def setup(self, app):
+        self.app = app
+        app.add_hook("before_request", self._start)
+        app.add_hook("after_request", self._finish)
+
+    def _start(self):
+        request.environ["metrics.start"] = time.perf_counter()
+
+    def _finish(self):
+        start = request.environ.get("metrics.start")
+        if start is None:
+            return
+        route = request.environ.get("bottle.route")
+        if route is None:
+            # Rejected in a before_request hook (e.g. 401) before routing
+            try:
+                route, _ = self.app.router.match(request.environ)
+            except HTTPError:
+                pass
+        rule = route.rule if route is not None else "unmatched"
+        status = 500 if request.environ.get("metrics.failed") else response.status_code
+        inc("baketrack_http_requests_total", route=rule, method=request.method, status=status)
+        observe("baketrack_http_request_duration_seconds", time.perf_counter() - start,
+                route=rule, method=request.method)
+
+    def apply(self, callback, route):
+        def wrapper(*args, **kwargs):
+            try:
+                mode = _profile_mode()
+                if mode:
+                    return _profiled(mode, route, callback, args, kwargs)
+                return callback(*args, **kwargs)
+            except HTTPResponse:
+                raise
+            except Exception:
+                # after_request still sees the default 200 for unhandled errors
+                request.environ["metrics.failed"] = True
+                raise
+
+        return wrapper
@@ -0,0 +1,21 @@
+import argparse
+from utils import store
+
+COLLECTIONS = ["users", "ingredients", "recipes", "meals", "meal_rules", "stock_movements", "stock_daily"]
+
+# --- JSON -> SQLite ---
+def migrate_to_sqlite(data_dir):
+    # Journaled loading also picks up entries not yet compacted into the snapshot
+    store.configure(data_dir=data_dir, backend="json", journal=True)
+    snapshot = {name: store.collection(name).all() for name in COLLECTIONS}
+
+    store.configure(backend="sqlite")
+    for name, records in snapshot.items():
+        store.collection(name).insert_many(records)
+        print(f"{name}: imported {len(records)} record(s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the JSON data files into the SQLite backend.")
+    parser.add_argument("--data-dir", default=store.DATA_DIR)
+    args = parser.parse_args()
+    migrate_to_sqlite(args.data_dir)
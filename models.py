@@ -0,0 +1,112 @@
+NUMBER = (int, float)
+_MISSING = object()
+
+# --- Record Models ---
+class Record:
+    """Typed, slotted form of a stored record. FIELDS maps each known field
+    to its accepted types; fields a client sent beyond those are kept in
+    extra, so from_dict/to_dict round-trips losslessly. Slots that were
+    never set are simply absent from to_dict()."""
+
+    __slots__ = ("id", "userId", "extra")
+    FIELDS = {}
+    REQUIRED = ()
+    NESTED = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        extra = dict(data)
+        for name in cls._names:
+            value = extra.pop(name, _MISSING)
+            if value is _MISSING:
+                continue
+            nested = cls.NESTED.get(name)
+            if nested is not None and isinstance(value, list):
+                value = [nested.from_dict(item) if isinstance(item, dict) else item for item in value]
+            setattr(record, name, value)
+        record.extra = extra or None
+        return record
+
+    def to_dict(self):
+        data = {}
+        for name in self._names:
+            value = getattr(self, name, _MISSING)
+            if value is _MISSING:
+                continue
+            if name in self.NESTED and isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, Record) else item for item in value]
+            data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def check(cls, data, partial=False):
+        """(missing, invalid) field names of a client payload. partial skips
+        the required check, for updates that only carry changed fields."""
+        missing = [] if partial else [f for f in cls.REQUIRED if data.get(f) is None]
+        invalid = []
+        for name, types in cls.FIELDS.items():
+            value = data.get(name)
+            if value is None:
+                continue
+            if not isinstance(value, types) or (types is NUMBER and isinstance(value, bool)):
+                invalid.append(name)
+            elif types is dict and not all(_is_number(v) for v in value.values()):
+                # Mapping fields hold per-unit amounts, e.g. nutrition
+                invalid.append(name)
+            elif name in cls.NESTED:
+                item_model = cls.NESTED[name]
+                if not all(isinstance(item, dict) and item_model.check(item) == ([], []) for item in value):
+                    invalid.append(name)
+        return missing, invalid
+
+def _is_number(value):
+    return isinstance(value, NUMBER) and not isinstance(value, bool)
+
+def _model(cls):
+    # Known fields first, then id/userId: the order records are built in
+    cls._names = tuple(cls.FIELDS) + ("id", "userId")
+    return cls
+
+@_model
+class User(Record):
+    __slots__ = ("name", "email", "password")
+    FIELDS = {"name": str, "email": str, "password": str}
+    REQUIRED = ("name", "email", "password")
+
+@_model
+class Ingredient(Record):
+    __slots__ = ("name", "unit", "category", "quantity", "minQuantity", "expiryDate", "unitCost", "nutrition")
+    # Optional: unitCost is the price of one unit; nutrition maps a nutrient
+    # name (e.g. "calories") to its amount per unit
+    FIELDS = {"name": str, "unit": str, "category": str, "quantity": NUMBER, "minQuantity": NUMBER, "expiryDate": str,
+              "unitCost": NUMBER, "nutrition": dict}
+    REQUIRED = ("name", "unit", "category", "quantity", "minQuantity")
+
+@_model
+class RecipeIngredient(Record):
+    __slots__ = ("ingredientId", "quantity")
+    FIELDS = {"ingredientId": str, "quantity": NUMBER}
+    REQUIRED = ("ingredientId", "quantity")
+
+@_model
+class Recipe(Record):
+    __slots__ = ("name", "description", "instructions", "servings", "prepTime", "cookTime", "ingredients")
+    FIELDS = {"name": str, "description": str, "instructions": str, "servings": NUMBER,
+              "prepTime": NUMBER, "cookTime": NUMBER, "ingredients": list}
+    NESTED = {"ingredients": RecipeIngredient}
+
+@_model
+class Meal(Record):
+    __slots__ = ("date", "time", "recipeId", "done")
+    FIELDS = {"date": str, "time": str, "recipeId": str, "done": bool}
+    REQUIRED = ("date", "time", "recipeId")
+
+MODELS = {"users": User, "ingredients": Ingredient, "recipes": Recipe, "meals": Meal}
+
+def invalid_message(missing, invalid):
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    return f"Invalid fields: {', '.join(invalid)}"
@@ -0,0 +1,64 @@
+import base64
+import json
+
+MAX_PAGE_SIZE = 1000
+
+# Sorts after every string with the given prefix, for prefix range stops
+PREFIX_END = "\U0010ffff"
+
+# --- Cursors ---
+# Opaque to clients: base64url of the last returned index entry (key, id).
+def encode_cursor(entry):
+    key, record_id = entry
+    raw = json.dumps([list(key), record_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, record_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    # Index keys are flat tuples of scalars
+    if not isinstance(key, list) or not isinstance(record_id, str) or \
+            not all(isinstance(part, (str, int, float, bool)) for part in key):
+        raise ValueError("Invalid cursor")
+    return tuple(key), record_id
+
+def parse_page(query):
+    """(limit, after) from ?limit=&after=; no limit means the whole range.
+    Raises ValueError on bad input."""
+    limit = query.get("limit") or None
+    if limit is not None:
+        if not limit.isdigit() or not 0 < int(limit) <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        limit = int(limit)
+    after = query.get("after")
+    return limit, decode_cursor(after) if after else None
+
+# --- Paged Range Queries ---
+def check_cursor(index, user_id, after):
+    """ValueError unless the cursor's key has the shape of the index's keys
+    (as one from another index, or a hand-made one, may not)."""
+    sample = index.range(user_id, limit=1)
+    if sample and [type(part) for part in sample[0][0]] != [type(part) for part in after[0]]:
+        raise ValueError("Invalid cursor")
+
+def page(index, user_id, query, start=None, stop=None):
+    """One page of a SortedIndex range for the request's limit/after.
+    Returns (records, next_cursor); next_cursor is None on the last page."""
+    limit, after = parse_page(query)
+    if after is not None:
+        check_cursor(index, user_id, after)
+    try:
+        entries = index.range(user_id, start, stop, after, limit + 1 if limit else None)
+    except TypeError:
+        if after is None:
+            raise
+        # Well-formed, but its key doesn't compare with this index's keys
+        raise ValueError("Invalid cursor")
+    next_cursor = None
+    if limit and len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1])
+    return index.records(user_id, [record_id for _, record_id in entries]), next_cursor
@@ -0,0 +1,150 @@
+from bottle import request, response
+from collections import Counter
+from datetime import date
+from itertools import islice
+from utils.store import collection
+from utils.recurrence import iso_date, occurrences
+from routes.meals import _slot_taken
+
+MAX_PLAN_SLOTS = 1000
+
+# --- Helpers ---
+def _requirements(recipe):
+    need = Counter()
+    for ri in recipe.get("ingredients", []):
+        need[ri["ingredientId"]] += ri["quantity"]
+    return need
+
+def _amount(value):
+    return round(value, 6)
+
+def _parse_slots(body):
+    slots = body.get("slots") if isinstance(body, dict) else body
+    if not isinstance(slots, list) or not slots:
+        raise ValueError("Send a non-empty list of slots {date, time, recipeId}")
+    if len(slots) > MAX_PLAN_SLOTS:
+        raise ValueError(f"At most {MAX_PLAN_SLOTS} slots per plan")
+    parsed = []
+    for n, slot in enumerate(slots, 1):
+        if not isinstance(slot, dict) or not (slot.get("date") and slot.get("time") and slot.get("recipeId")):
+            raise ValueError(f"Slot {n}: missing fields (date, time, recipeId)")
+        if not isinstance(slot["time"], str) or not slot["time"].strip():
+            raise ValueError(f"Slot {n}: time must be text")
+        try:
+            day = iso_date(slot["date"])
+        except ValueError as e:
+            raise ValueError(f"Slot {n}: {e}")
+        parsed.append({"date": day, "time": slot["time"].strip().lower(), "recipeId": slot["recipeId"]})
+    return parsed
+
+def _pending(user_id, last_day):
+    # Occurrences of the user's meal rules from today through last_day that
+    # aren't meals yet (so haven't deducted stock); at most MAX_PLAN_SLOTS
+    # per rule
+    today = date.today().isoformat()
+    for rule in collection("meal_rules").iter_for_user(user_id):
+        if not rule.get("next"):
+            continue
+        for day in islice(occurrences(rule, date.fromisoformat(max(rule["next"], today))), MAX_PLAN_SLOTS):
+            day = day.isoformat()
+            if day > last_day:
+                break
+            if not _slot_taken(user_id, day, rule["time"]):
+                yield {"date": day, "time": rule["time"], "recipeId": rule["recipeId"], "ruleId": rule["id"]}
+
+# --- Planning ---
+def plan_meals():
+    """Check a batch of meal slots against current stock without scheduling
+    anything. Works from one snapshot of the user's recipes and ingredients;
+    slots consume stock in date order, and a slot that can't be cooked
+    doesn't consume any. Recurring meals not yet materialized take their
+    stock first on their dates ("reserved"), as they will when they are,
+    and their slots count as taken."""
+    try:
+        slots = _parse_slots(request.json)
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+
+    user_id = request.user_id
+    recipes = {r["id"]: r for r in collection("recipes").iter_for_user(user_id)}
+    stock = {i["id"]: i for i in collection("ingredients").iter_for_user(user_id)}
+    needs = {recipe_id: _requirements(recipe) for recipe_id, recipe in recipes.items()}
+
+    demand = Counter()
+    reserved = Counter()
+    remaining = {ing_id: ing.get("quantity", 0) for ing_id, ing in stock.items()}
+    seen = set()
+    results = [None] * len(slots)
+    pending = list(_pending(user_id, max(slot["date"] for slot in slots)))
+    blocked = set()
+    # Pending occurrences go ahead of plan slots on the same date
+    order = sorted([(p["date"], False, n) for n, p in enumerate(pending)] +
+                   [(s["date"], True, n) for n, s in enumerate(slots)])
+    for _, is_slot, n in order:
+        if not is_slot:
+            occurrence = pending[n]
+            seen.add((occurrence["date"], occurrence["time"]))
+            need = needs.get(occurrence["recipeId"])
+            # A rule the stock can't cover stops there, as materializing would
+            if occurrence["ruleId"] in blocked or need is None or any(
+                    ing_id not in stock or remaining[ing_id] < qty for ing_id, qty in need.items()):
+                blocked.add(occurrence["ruleId"])
+                continue
+            for ing_id, qty in need.items():
+                remaining[ing_id] -= qty
+            reserved.update(need)
+            continue
+        slot = slots[n]
+        result = dict(slot, feasible=False)
+        results[n] = result
+        key = (slot["date"], slot["time"])
+        need = needs.get(slot["recipeId"])
+        if need is None:
+            result["reason"] = "Recipe not found"
+        elif key in seen or _slot_taken(user_id, *key):
+            result["reason"] = f"Meal already exists for {slot['time']} on {slot['date']}"
+        elif any(ing_id not in stock for ing_id in need):
+            result["reason"] = "Missing ingredient"
+        else:
+            # Counts toward the plan's demand whether or not stock suffices
+            demand.update(need)
+            short = {ing_id: _amount(qty - remaining[ing_id]) for ing_id, qty in need.items() if remaining[ing_id] < qty}
+            if short:
+                result["reason"] = "Not enough stock"
+                result["missing"] = short
+            else:
+                for ing_id, qty in need.items():
+                    remaining[ing_id] -= qty
+                result["feasible"] = True
+        seen.add(key)
+
+    shortfall = {
+        ing_id: _amount(qty + reserved[ing_id] - stock[ing_id].get("quantity", 0))
+        for ing_id, qty in demand.items()
+        if ing_id in stock and stock[ing_id].get("quantity", 0) < qty + reserved[ing_id]
+    }
+    shopping_list = sorted(
+        (
+            {
+                "ingredientId": ing_id,
+                "name": stock[ing_id].get("name"),
+                "category": stock[ing_id].get("category"),
+                "unit": stock[ing_id].get("unit"),
+                "quantity": qty,
+            }
+            for ing_id, qty in shortfall.items()
+        ),
+        key=lambda item: (str(item["category"]).lower(), str(item["name"]).lower()),
+    )
+    return {
+        "success": True,
+        "data": {
+            "slots": results,
+            "feasible": sum(r["feasible"] for r in results),
+            "required": {ing_id: _amount(qty) for ing_id, qty in demand.items()},
+            "reserved": {ing_id: _amount(qty) for ing_id, qty in reserved.items()},
+            "shortfall": shortfall,
+            "shoppingList": shopping_list,
+        },
+    }
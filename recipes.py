@@ -1,45 +1,30 @@
 from bottle import request, response
 import uuid
-from utils.json_os import read_json, write_json
-from routes.meals import remove_meals_with_recipe
-
-FILE_PATH = "data/recipes.json"
-INGREDIENT_FILE = "data/ingredients.json"
+from utils.store import collection, transaction
+from utils.cascade import plan_delete, cascade_delete, summarize
+from utils.indexes import SortedIndex
+from utils.pagination import page, PREFIX_END
+from utils.models import Recipe, invalid_message
+from utils.aggregates import aggregates, scaled
 
 # --- Helpers ---
-def _load_recipes():
-    return read_json(FILE_PATH)
-
-def _save_recipes(data):
-    write_json(FILE_PATH, data)
+def _store():
+    return collection("recipes")
 
-def _load_ingredients():
-    return read_json(INGREDIENT_FILE)
+_name_index = SortedIndex("recipes", lambda r: (str(r.get("name", "")).lower(),))
 
-def validate_ingredient_ownership(ingredients, user_id):
-    all_ingredients = _load_ingredients()
-    owned_keys = {(i["userId"], i["id"]) for i in all_ingredients}
-    
+def validate_ingredient_ownership(ingredients, user_id, owned=None):
+    """Ingredient ids the user doesn't own. Pass owned (a set of ids) to
+    check many recipes against one snapshot instead of a lookup per id."""
+    if owned is not None:
+        return [ing["ingredientId"] for ing in ingredients if ing["ingredientId"] not in owned]
+    ingredient_store = collection("ingredients")
     return [
         ing["ingredientId"]
         for ing in ingredients
-        if (user_id, ing["ingredientId"]) not in owned_keys
+        if not ingredient_store.get_for_user(user_id, ing["ingredientId"])
     ]
 
-def remove_recipes_with_ingredient(ingredient_id, user_id):
-    recipes = _load_recipes()
-    new_recipes = []
-    removed_recipe_ids = []
-
-    for recipe in recipes:
-        if recipe.get("userId") == user_id and any(ing["ingredientId"] == ingredient_id for ing in recipe.get("ingredients", [])):
-            removed_recipe_ids.append(recipe["id"])
-        else:
-            new_recipes.append(recipe)
-
-    _save_recipes(new_recipes)
-    return removed_recipe_ids
-
 # --- CREATE ---
 def add_recipe():
     recipe = request.json
@@ -47,6 +32,11 @@ def add_recipe():
         response.status = 400
         return {"success": False, "message": "Invalid JSON"}
 
+    _, invalid = Recipe.check(recipe)
+    if invalid:
+        response.status = 400
+        return {"success": False, "message": invalid_message([], invalid)}
+
     user_id = request.user_id
     unauthorized = validate_ingredient_ownership(recipe.get("ingredients", []), user_id)
 
@@ -60,9 +50,7 @@ def add_recipe():
     recipe_id = f"rec{uuid.uuid4().hex[:8]}"
     recipe.update({"id": recipe_id, "userId": user_id})
 
-    recipes = _load_recipes()
-    recipes.append(recipe)
-    _save_recipes(recipes)
+    _store().insert(recipe)
 
     response.status = 201
     return {"success": True, "message": "Recipe added", "id": recipe_id}
@@ -70,17 +58,24 @@ def add_recipe():
 # --- READ ALL ---
 def get_recipes():
     user_id = request.user_id
-    recipes = _load_recipes()
-    user_recipes = [r for r in recipes if r.get("userId") == user_id]
-    return {"success": True, "data": user_recipes}
+    prefix = request.query.get("prefix", "").lower()
+    try:
+        if prefix:
+            user_recipes, cursor = page(_name_index, user_id, request.query,
+                                        start=((prefix,),), stop=((prefix + PREFIX_END,),))
+        else:
+            user_recipes, cursor = page(_name_index, user_id, request.query)
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+    return {"success": True, "data": user_recipes, "nextCursor": cursor}
 
 # --- READ ONE ---
 def get_recipe(id):
     user_id = request.user_id
-    recipes = _load_recipes()
-    for r in recipes:
-        if r["id"] == id and r.get("userId") == user_id:
-            return {"success": True, "data": r}
+    r = _store().get_for_user(user_id, id)
+    if r:
+        return {"success": True, "data": r}
     response.status = 404
     return {"success": False, "message": "Recipe not found"}
 
@@ -91,11 +86,15 @@ def update_recipe(id):
         response.status = 400
         return {"success": False, "message": "Invalid JSON"}
 
-    user_id = request.user_id
-    recipes = _load_recipes()
+    _, invalid = Recipe.check(updates, partial=True)
+    if invalid:
+        response.status = 400
+        return {"success": False, "message": invalid_message([], invalid)}
 
-    for i, r in enumerate(recipes):
-        if r["id"] == id and r.get("userId") == user_id:
+    user_id = request.user_id
+    with transaction(user_id) as tx:
+        r = tx.get_for_user("recipes", id)
+        if r:
             unauthorized = validate_ingredient_ownership(updates.get("ingredients", []), user_id)
             if unauthorized:
                 response.status = 403
@@ -106,26 +105,66 @@ def update_recipe(id):
 
             updates.pop("id", None)
             updates.pop("userId", None)
-            recipes[i].update(updates)
-            _save_recipes(recipes)
+            r.update(updates)
+            tx.put("recipes", r)
+            tx.commit()
             return {"success": True, "message": "Recipe updated"}
 
     response.status = 404
     return {"success": False, "message": "Recipe not found or unauthorized"}
 
+# --- SUMMARY ---
+def _servings_param():
+    raw = request.query.get("servings")
+    if raw is None or raw == "":
+        return None
+    try:
+        servings = float(raw)
+    except ValueError:
+        servings = 0
+    if not servings > 0:
+        raise ValueError("servings must be a positive number")
+    return int(servings) if servings.is_integer() else servings
+
+def get_recipe_summary(id):
+    """Ingredient quantities, cost and nutrition, scaled to ?servings=N
+    (default: the recipe's own servings)."""
+    try:
+        servings = _servings_param()
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+
+    user_id = request.user_id
+    r = _store().get_for_user(user_id, id)
+    if not r:
+        response.status = 404
+        return {"success": False, "message": "Recipe not found"}
+    return {"success": True, "data": dict(scaled(aggregates.for_recipe(user_id, r), servings), recipeId=id)}
+
+def get_recipe_summaries():
+    """Summaries of all the user's recipes at their own servings."""
+    summaries = aggregates.for_user(request.user_id)
+    return {"success": True, "data": [dict(scaled(entry), recipeId=recipe_id) for recipe_id, entry in summaries.items()]}
+
 # --- DELETE ---
 def delete_recipe(id):
     user_id = request.user_id
-    recipes = _load_recipes()
-    new_recipes = [r for r in recipes if not (r["id"] == id and r["userId"] == user_id)]
+    with transaction(user_id) as tx:
+        if not tx.get_for_user("recipes", id):
+            response.status = 404
+            return {"success": False, "message": "Recipe not found or unauthorized"}
 
-    if len(new_recipes) == len(recipes):
-        response.status = 404
-        return {"success": False, "message": "Recipe not found or unauthorized"}
-
-    _save_recipes(new_recipes)
+        # Also delete meals using this recipe
+        cascade_delete(tx, "recipes", id)
+        tx.commit()
 
-    # Also delete meals using this recipe
-    remove_meals_with_recipe(user_id, id)
+    return {"success": True, "message": "Recipe and associated meals deleted"}
 
-    return {"success": True, "message": "Recipe and associated meals deleted"}
\ No newline at end of file
+# --- DELETE PREVIEW ---
+def preview_delete_recipe(id):
+    user_id = request.user_id
+    if not _store().get_for_user(user_id, id):
+        response.status = 404
+        return {"success": False, "message": "Recipe not found or unauthorized"}
+    return {"success": True, "data": summarize(plan_delete(user_id, "recipes", id))}
\ No newline at end of file
@@ -0,0 +1,113 @@
+from datetime import date, timedelta
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+MAX_COUNT = 1000
+MAX_INTERVAL = 366
+
+# --- Rules ---
+def iso_date(value, name="date"):
+    """value as a normalized ISO date string; ValueError naming the field otherwise."""
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+def _positive(value, name, maximum):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= maximum:
+        raise ValueError(f"{name} must be an integer between 1 and {maximum}")
+    return value
+
+def parse_rule(body):
+    """The recurrence fields of a meal rule, validated and normalized:
+    freq (daily/weekly/monthly) every `interval` periods from `start`,
+    on `byDay` weekdays for weekly rules, ending after `until` or `count`
+    occurrences (or never), minus the `exceptions` dates. Raises ValueError."""
+    if not isinstance(body, dict):
+        raise ValueError("Send a JSON object")
+    if not (body.get("recipeId") and body.get("time") and body.get("start")):
+        raise ValueError("Missing fields (recipeId, time, start)")
+    freq = body.get("freq", "weekly")
+    if freq not in FREQUENCIES:
+        raise ValueError(f"freq must be one of: {', '.join(FREQUENCIES)}")
+
+    start = iso_date(body["start"], "start")
+    rule = {
+        "recipeId": body["recipeId"],
+        "time": str(body["time"]).strip().lower(),
+        "start": start,
+        "freq": freq,
+        "interval": _positive(body.get("interval", 1), "interval", MAX_INTERVAL),
+        "until": iso_date(body["until"], "until") if body.get("until") else None,
+        "count": _positive(body["count"], "count", MAX_COUNT) if body.get("count") is not None else None,
+    }
+    if freq == "weekly":
+        by_day = body.get("byDay") or [WEEKDAYS[date.fromisoformat(start).weekday()]]
+        if not isinstance(by_day, list) or any(str(d).lower() not in WEEKDAYS for d in by_day):
+            raise ValueError(f"byDay must be a list of: {', '.join(WEEKDAYS)}")
+        rule["byDay"] = sorted({str(d).lower() for d in by_day}, key=WEEKDAYS.index)
+    exceptions = body.get("exceptions") or []
+    if not isinstance(exceptions, list):
+        raise ValueError("exceptions must be a list of dates")
+    rule["exceptions"] = sorted({iso_date(d, "exceptions") for d in exceptions})
+    return rule
+
+# --- Expansion ---
+def _candidates(rule, first, origin):
+    # Every date the rule's pattern hits, from about origin on (never before first)
+    interval = rule["interval"]
+    if rule["freq"] == "daily":
+        k = max(0, (origin - first).days // interval)
+        while True:
+            yield first + timedelta(days=k * interval)
+            k += 1
+    elif rule["freq"] == "weekly":
+        weekdays = [WEEKDAYS.index(d) for d in rule["byDay"]]
+        week0 = first - timedelta(days=first.weekday())
+        k = max(0, (origin - week0).days // 7 // interval)
+        while True:
+            monday = week0 + timedelta(weeks=k * interval)
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if day >= first:
+                    yield day
+            k += 1
+    else:
+        month0 = first.year * 12 + first.month - 1
+        k = max(0, (origin.year * 12 + origin.month - 1 - month0) // interval)
+        while True:
+            year, month = divmod(month0 + k * interval, 12)
+            if year > date.max.year:
+                return
+            try:
+                yield date(year, month + 1, first.day)
+            except ValueError:
+                # Months without that day (the 31st, Feb 29) are skipped
+                pass
+            k += 1
+
+def occurrences(rule, start=None):
+    """The rule's occurrence dates from start (a date) on, in order. A
+    generator, and endless for rules without until or count: callers stop
+    at the end of their window."""
+    first = date.fromisoformat(rule["start"])
+    until = date.fromisoformat(rule["until"]) if rule.get("until") else None
+    count = rule.get("count")
+    skip = set(rule.get("exceptions", ()))
+    # A count includes every earlier occurrence, so only skip ahead without one
+    origin = start if start is not None and count is None and start > first else first
+    try:
+        for n, day in enumerate(_candidates(rule, first, origin)):
+            if (count is not None and n >= count) or (until is not None and day > until):
+                return
+            if (start is None or day >= start) and day.isoformat() not in skip:
+                yield day
+    except OverflowError:
+        return
+
+def next_after(rule, day):
+    """ISO date of the first occurrence after day (ISO date), or None."""
+    if day >= date.max.isoformat():
+        return None
+    upcoming = next(occurrences(rule, date.fromisoformat(day) + timedelta(days=1)), None)
+    return upcoming.isoformat() if upcoming else None
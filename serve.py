@@ -0,0 +1,156 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+from utils import store
+from routes import health
+
+# --- Server ---
+class PooledWSGIServer(WSGIServer):
+    """wsgiref's server with connections handled on a fixed thread pool and
+    a count of in-flight requests, so shutdown can wait for them."""
+
+    request_queue_size = 128
+
+    def __init__(self, address, threads):
+        super().__init__(address, WSGIRequestHandler)
+        self.threads = threads
+        self.pool = None
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def process_request(self, request, client_address):
+        if self.pool is None:
+            # Created lazily so each forked worker gets its own threads
+            self.pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="http")
+        with self._idle:
+            self._active += 1
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def drain(self, timeout):
+        """Wait for in-flight requests; False if some were still running."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+# --- Worker ---
+def _stopper(server, drain_grace):
+    """The SIGTERM/SIGINT handler. Health reports draining at once, but the
+    server keeps accepting for drain_grace seconds so load balancers see the
+    503 and stop routing here; then it stops accepting. A second signal cuts
+    the grace period short."""
+    hurry = threading.Event()
+
+    def shutdown():
+        hurry.wait(drain_grace)
+        # shutdown() waits for serve_forever(), which runs on the main thread
+        server.shutdown()
+
+    def stop(signum, frame):
+        if health.draining.is_set():
+            hurry.set()
+            return
+        health.draining.set()
+        threading.Thread(target=shutdown).start()
+    return stop
+
+def _serve(server, drain_timeout, drain_grace):
+    stop = _stopper(server, drain_grace)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # Per worker, after fork: data loads while the worker already accepts requests
+    from app import warm
+    warm()
+    server.serve_forever()
+
+    if not server.drain(drain_timeout):
+        print(f"[serve] {os.getpid()}: requests still running after {drain_timeout}s", file=sys.stderr)
+    if server.pool is not None:
+        server.pool.shutdown(wait=False)
+    store.close()
+    server.server_close()
+
+# --- Pre-fork Supervisor ---
+def _prefork(server, workers, drain_timeout, drain_grace):
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve(server, drain_timeout, drain_grace)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        pid, status = os.wait()
+        children.discard(pid)
+        if not stopping:
+            print(f"[serve] worker {pid} exited ({status}), restarting", file=sys.stderr)
+            spawn()
+    server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the BakeTrack API for production.")
+    parser.add_argument("--host", default=os.environ.get("BAKETRACK_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("BAKETRACK_PORT", "8000")))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("BAKETRACK_THREADS", "8")),
+                        help="request threads per worker process")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BAKETRACK_WORKERS", "1")),
+                        help="pre-forked worker processes (1 serves from this process)")
+    parser.add_argument("--drain-grace", type=float, default=float(os.environ.get("BAKETRACK_DRAIN_GRACE", "5")),
+                        help="seconds to keep accepting requests (health answering 503) after SIGTERM")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="seconds to wait for in-flight requests on shutdown")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1:
+        # Before forking, and before anything opens the store
+        store.configure(multiprocess=True)
+    from app import app, warm
+    if "BAKETRACK_MAX_STREAMS" not in os.environ:
+        # Each open change stream holds one of a worker's request threads;
+        # half of them stay for ordinary requests
+        from routes import changes
+        changes.configure_streams(max(1, args.threads // 2))
+    if args.workers > 1:
+        # Import every route module once here, so each forked (or respawned)
+        # worker starts with them loaded; data is loaded per worker
+        warm(background=False, data=False)
+
+    server = PooledWSGIServer((args.host, args.port), args.threads)
+    server.set_app(app)
+    print(f"[serve] http://{args.host}:{args.port} workers={args.workers} threads={args.threads}", file=sys.stderr)
+    if args.workers > 1:
+        _prefork(server, args.workers, args.drain_timeout, args.drain_grace)
+    else:
+        _serve(server, args.drain_timeout, args.drain_grace)
+
+if __name__ == "__main__":
+    main()
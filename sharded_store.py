@@ -0,0 +1,209 @@
+import fcntl
+import os
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from utils.store import BaseCollection, USER_LOCK_STRIPES, _norm
+from utils.json_os import read_json, write_json
+
+# Tenant files kept open (parsed and indexed) at once per collection;
+# the least recently used tenant is dropped beyond that.
+OPEN_TENANTS = int(os.environ.get("BAKETRACK_OPEN_TENANTS", "1024"))
+DEFAULT_SHARDS = int(os.environ.get("BAKETRACK_SHARDS", "64"))
+
+# --- Layout ---
+# <root>/layout.json records the shard count; a tenant lives in
+# <root>/<shard>/<userId>/ with shard = crc32(userId) % shards.
+def shard_of(user_id, shards):
+    return zlib.crc32(str(user_id).encode()) % shards
+
+def shard_dir(root, shard):
+    return os.path.join(root, f"{shard:03d}")
+
+def tenant_dir(root, user_id, shards):
+    user_id = str(user_id)
+    if not user_id or user_id.startswith(".") or os.sep in user_id:
+        raise ValueError(f"Unusable user id for a shard path: {user_id!r}")
+    return os.path.join(shard_dir(root, shard_of(user_id, shards)), user_id)
+
+def read_layout(root):
+    path = os.path.join(root, "layout.json")
+    return read_json(path) if os.path.exists(path) else None
+
+def write_layout(root, layout):
+    os.makedirs(root, exist_ok=True)
+    write_json(os.path.join(root, "layout.json"), layout)
+
+def tenants(root):
+    """(shard, userId) of every tenant directory present under root."""
+    if not os.path.isdir(root):
+        return
+    for shard_name in sorted(os.listdir(root)):
+        path = os.path.join(root, shard_name)
+        if shard_name.isdigit() and os.path.isdir(path):
+            for user_id in sorted(os.listdir(path)):
+                yield int(shard_name), user_id
+
+def hold_layout(root, exclusive=False):
+    """Open and flock <root>/layout.lock without waiting. Servers hold it
+    shared for their lifetime; rebalancing needs it exclusively. Returns
+    the fd, or None when the other side holds it."""
+    os.makedirs(root, exist_ok=True)
+    fd = os.open(os.path.join(root, "layout.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+# One in-process lock per tenant file, shared by every Collection opened on
+# it (an evicted tenant may still be in use when it is opened again).
+_file_locks = weakref.WeakValueDictionary()
+_file_locks_guard = threading.Lock()
+
+def _file_lock(path):
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = threading.RLock()
+        return lock
+
+# --- Collection ---
+class ShardedCollection(BaseCollection):
+    """A tenant collection split into one JSON file (or journal) per user.
+    Requests only load, index and rewrite the requesting user's file, and
+    writes from different users never contend on the same file or lock.
+    Lookups without a user scan every tenant and are meant for admin tools."""
+
+    def __init__(self, root, name, collection_cls, refs=None):
+        self.root = root
+        self.name = name
+        self.collection_cls = collection_cls
+        self.refs = dict(refs or {})
+        self._layout_fd = hold_layout(root)
+        if self._layout_fd is None:
+            raise RuntimeError(f"{root} is being rebalanced; wait for python -m shards rebalance to finish")
+        layout = read_layout(root)
+        if layout is None:
+            layout = {"shards": DEFAULT_SHARDS}
+            write_layout(root, layout)
+        if "previous" in layout:
+            raise RuntimeError(f"{root} has an unfinished rebalance; rerun python -m shards rebalance")
+        self.shards = layout["shards"]
+        self._open = OrderedDict()
+        self._guard = threading.Lock()
+
+    def _tenant(self, user_id):
+        with self._guard:
+            coll = self._open.get(user_id)
+            if coll is not None:
+                self._open.move_to_end(user_id)
+                return coll
+        path = tenant_dir(self.root, user_id, self.shards)
+        os.makedirs(path, exist_ok=True)
+        file_path = os.path.join(path, f"{self.name}.json")
+        stripe = zlib.crc32(str(user_id).encode()) % USER_LOCK_STRIPES
+        coll = self.collection_cls(file_path, (), self.refs, user_id=user_id,
+                                   lock=_file_lock(file_path), lock_name=f"{self.name}-{stripe}")
+        with self._guard:
+            coll = self._open.setdefault(user_id, coll)
+            self._open.move_to_end(user_id)
+            evicted = []
+            while len(self._open) > OPEN_TENANTS:
+                evicted.append(self._open.popitem(last=False)[1])
+        for old in evicted:
+            self._release(old)
+        return coll
+
+    def _release(self, coll):
+        if hasattr(coll, "_close_log"):
+            with coll._lock:
+                coll._close_log()
+
+    def _all_tenants(self):
+        for _, user_id in tenants(self.root):
+            yield self._tenant(user_id)
+
+    def resident(self):
+        with self._guard:
+            return list(self._open.values())
+
+    def sync(self, user_id=None):
+        # Tenants not resident are read fresh when next opened
+        if user_id is not None:
+            with self._guard:
+                colls = [self._open[user_id]] if user_id in self._open else []
+        else:
+            colls = self.resident()
+        for coll in colls:
+            coll.sync()
+
+    def close(self):
+        for coll in self.resident():
+            self._release(coll)
+        with self._guard:
+            self._open.clear()
+        if self._layout_fd is not None:
+            os.close(self._layout_fd)
+            self._layout_fd = None
+
+    # --- Reads ---
+    def get_for_user(self, user_id, record_id):
+        return self._tenant(user_id).get(record_id)
+
+    def for_user(self, user_id):
+        return self._tenant(user_id).all()
+
+    def all(self):
+        return [record for coll in self._all_tenants() for record in coll.all()]
+
+    def get(self, record_id):
+        for coll in self._all_tenants():
+            record = coll.get(record_id)
+            if record is not None:
+                return record
+        return None
+
+    def find(self, field, value):
+        value = _norm(value)
+        for coll in self._all_tenants():
+            for record in coll.all():
+                if _norm(record.get(field)) == value:
+                    return record
+        return None
+
+    def referencing(self, field, value, user_id=None):
+        if user_id is not None:
+            return self._tenant(user_id).referencing(field, value)
+        return [record for coll in self._all_tenants() for record in coll.referencing(field, value)]
+
+    # --- Writes ---
+    def _put_many(self, records):
+        by_user = {}
+        for record in records:
+            if record.get("userId") is None:
+                raise ValueError(f"{self.name} records need a userId in the sharded layout")
+            by_user.setdefault(record["userId"], []).append(record)
+        for user_id, owned in by_user.items():
+            self._tenant(user_id).update_many(owned)
+
+    def insert_many(self, records):
+        self._put_many(records)
+
+    def update_many(self, records):
+        self._put_many(records)
+
+    def delete_many(self, record_ids, user_id=None):
+        if user_id is not None:
+            return self._tenant(user_id).delete_many(record_ids)
+        removed = []
+        pending = set(record_ids)
+        for coll in self._all_tenants():
+            if not pending:
+                break
+            found = coll.delete_many([i for i in record_ids if i in pending])
+            pending.difference_update(r["id"] for r in found)
+            removed.extend(found)
+        return removed
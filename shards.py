@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import time
+import zlib
+from utils import store
+from utils.json_os import read_json, read_journal, encode_record, write_records, write_json
+from utils.sharded_store import (DEFAULT_SHARDS, shard_dir, tenant_dir, tenants,
+                                 read_layout, write_layout, hold_layout)
+
+# --- Flat -> Sharded ---
+def _read_flat(data_dir, name):
+    # Snapshot plus journal, read-only: a live server may be appending to the log
+    records = {r["id"]: r for r in read_json(os.path.join(data_dir, f"{name}.json"))}
+    entries, _ = read_journal(os.path.join(data_dir, f"{name}.log"))
+    for entry in entries:
+        if entry["op"] == "put":
+            records[entry["record"]["id"]] = entry["record"]
+        else:
+            records.pop(entry["id"], None)
+    return records.values()
+
+def _copy_pass(data_dir, root, shards, state):
+    """Write every tenant file whose records changed since the last pass.
+    state maps "<collection>/<userId>" to a checksum of what was written."""
+    changed = 0
+    for name in store.TENANT_COLLECTIONS:
+        by_user = {}
+        for record in _read_flat(data_dir, name):
+            if record.get("userId") is not None:
+                by_user.setdefault(record["userId"], []).append(encode_record(record))
+        prefix = f"{name}/"
+        gone = {key[len(prefix):] for key in state if key.startswith(prefix)} - set(by_user)
+        for user_id in gone:
+            by_user[user_id] = []
+        for user_id, encoded in by_user.items():
+            key = prefix + user_id
+            checksum = zlib.crc32(b"\n".join(encoded))
+            if state.get(key) == checksum:
+                continue
+            path = tenant_dir(root, user_id, shards)
+            os.makedirs(path, exist_ok=True)
+            write_records(os.path.join(path, f"{name}.json"), encoded)
+            if encoded:
+                state[key] = checksum
+            else:
+                state.pop(key, None)
+            changed += 1
+    return changed
+
+def migrate(data_dir, shards, interval, max_passes):
+    """Copy the flat files into the sharded layout while the API keeps
+    serving. Repeats catch-up passes (only rewriting tenants whose data
+    changed) until a pass finds nothing new. The flat files are left alone."""
+    root = os.path.join(data_dir, "shards")
+    layout = read_layout(root)
+    if layout is None:
+        layout = {"shards": shards}
+        write_layout(root, layout)
+    elif layout["shards"] != shards:
+        print(f"{root} already uses {layout['shards']} shards; keeping that")
+    state_path = os.path.join(root, "migrate-state.json")
+    state = read_json(state_path) if os.path.exists(state_path) else {}
+
+    for n in range(1, max_passes + 1):
+        started = time.perf_counter()
+        changed = _copy_pass(data_dir, root, layout["shards"], state)
+        write_json(state_path, state)
+        print(f"pass {n}: wrote {changed} tenant file(s) in {time.perf_counter() - started:.2f}s")
+        if not changed and n > 1:
+            break
+        time.sleep(interval)
+
+    print("To cut over: stop the API, run this command once more to copy the last writes,")
+    print("then start it with BAKETRACK_LAYOUT=sharded. The flat files can be removed afterwards.")
+
+# --- Rebalancing ---
+def rebalance(data_dir, shards):
+    """Move tenant directories to their shard under a new shard count. Needs
+    the API stopped; if interrupted, running it again finishes the job."""
+    root = os.path.join(data_dir, "shards")
+    layout = read_layout(root)
+    if layout is None:
+        raise SystemExit(f"No sharded layout in {root}")
+    fd = hold_layout(root, exclusive=True)
+    if fd is None:
+        raise SystemExit("The API is running on this data directory; stop it before rebalancing")
+    try:
+        write_layout(root, {"shards": shards, "previous": layout.get("previous", layout["shards"])})
+        moved = 0
+        for shard, user_id in list(tenants(root)):
+            target = tenant_dir(root, user_id, shards)
+            source = os.path.join(shard_dir(root, shard), user_id)
+            if source != target:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.rename(source, target)
+                moved += 1
+        for shard_name in os.listdir(root):
+            path = os.path.join(root, shard_name)
+            if shard_name.isdigit() and os.path.isdir(path) and not os.listdir(path):
+                os.rmdir(path)
+        write_layout(root, {"shards": shards})
+        print(f"moved {moved} tenant(s); {root} now has {shards} shards")
+    finally:
+        os.close(fd)
+
+def status(data_dir):
+    root = os.path.join(data_dir, "shards")
+    layout = read_layout(root)
+    if layout is None:
+        print(f"No sharded layout in {root}")
+        return
+    counts = {}
+    for shard, _ in tenants(root):
+        counts[shard] = counts.get(shard, 0) + 1
+    total = sum(counts.values())
+    print(json.dumps({
+        "layout": layout,
+        "tenants": total,
+        "shardsInUse": len(counts),
+        "largestShard": max(counts.values(), default=0),
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the per-tenant sharded data layout.")
+    parser.add_argument("--data-dir", default=store.DATA_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("migrate", help="copy the flat data files into shards (API may keep running)")
+    p.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    p.add_argument("--interval", type=float, default=1.0, help="seconds between catch-up passes")
+    p.add_argument("--max-passes", type=int, default=10)
+    p = commands.add_parser("rebalance", help="move tenants to a new shard count (API stopped)")
+    p.add_argument("--shards", type=int, required=True)
+    commands.add_parser("status", help="show the layout and tenant distribution")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate(args.data_dir, args.shards, args.interval, args.max_passes)
+    elif args.command == "rebalance":
+        rebalance(args.data_dir, args.shards)
+    else:
+        status(args.data_dir)
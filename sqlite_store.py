@@ -0,0 +1,243 @@
+import contextlib
+import json
+import sqlite3
+import threading
+from utils.store import BaseCollection, _norm, _emit, has_listeners
+from utils.metrics import StorageTimer
+from utils.json_os import dumps_compact
+
+# --- Connections ---
+class Database:
+    """One SQLite file in WAL mode with a connection per worker thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # Re-entrant per thread: only the outermost block begins and commits
+        conn = self.connect()
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if not depth:
+            self._local.after_commit = []
+        try:
+            if not depth:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if not depth:
+                conn.execute("COMMIT")
+        except BaseException:
+            if not depth:
+                conn.execute("ROLLBACK")
+                self._local.after_commit = []
+            raise
+        finally:
+            self._local.depth = depth
+        if not depth:
+            callbacks, self._local.after_commit = self._local.after_commit, []
+            for callback in callbacks:
+                callback()
+
+    def after_commit(self, callback):
+        """Run callback once the enclosing outermost transaction commits."""
+        self._local.after_commit.append(callback)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+        self._local = threading.local()
+
+# --- Collection ---
+class SqliteCollection(BaseCollection):
+    """A collection stored as JSON documents in one table. id, userId, unique
+    fields and extra columns are lifted out so they can be indexed."""
+
+    def __init__(self, db, name, unique=(), columns=(), refs=None):
+        self.db = db
+        self.name = name
+        self.unique = tuple(unique)
+        self.extra = tuple(columns)
+        self.refs = dict(refs or {})
+        self.columns = ("id", "userId") + self.unique + self.extra
+        self._seen = 0
+        self._seen_lock = threading.Lock()
+        self._create()
+
+    def _create(self):
+        cols = ", ".join(f'"{c}" TEXT' for c in self.columns[1:])
+        with self.db.transaction() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.name}" ("id" TEXT PRIMARY KEY, {cols}, "doc" TEXT NOT NULL)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{self.name}_user" ON "{self.name}" ("userId", "id")')
+            for field in self.unique:
+                conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{self.name}_{field}" ON "{self.name}" ("{field}")')
+            if self.extra:
+                names = ", ".join(f'"{c}"' for c in self.extra)
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{self.name}_user_{"_".join(self.extra)}" ON "{self.name}" ("userId", {names})')
+            if self.refs:
+                self._create_refs(conn)
+            conn.execute('CREATE TABLE IF NOT EXISTS "_generations" ("name" TEXT PRIMARY KEY, "value" INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO "_generations" VALUES (?, 0)', (self.name,))
+            self._seen = self._generation(conn)
+
+    def _create_refs(self, conn):
+        # Reverse index: (field, referenced id) -> referencing record id
+        table = f"{self.name}_refs"
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ("field" TEXT, "key" TEXT, "id" TEXT)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_key" ON "{table}" ("field", "key")')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_id" ON "{table}" ("id")')
+        if not exists:
+            records = [json.loads(doc) for (doc,) in conn.execute(f'SELECT doc FROM "{self.name}"')]
+            self._write_refs(conn, records)
+
+    def _write_refs(self, conn, records):
+        table = f"{self.name}_refs"
+        conn.executemany(f'DELETE FROM "{table}" WHERE "id" = ?', [(r["id"],) for r in records])
+        conn.executemany(
+            f'INSERT INTO "{table}" ("field", "key", "id") VALUES (?, ?, ?)',
+            [(field, key, r["id"]) for r in records for field, extract in self.refs.items() for key in set(extract(r))],
+        )
+
+    def _row(self, record):
+        values = [record["id"], record.get("userId")]
+        values += [_norm(record.get(f)) for f in self.unique]
+        values += [record.get(c) for c in self.extra]
+        return values + [dumps_compact(record)]
+
+    def _select(self, where="", params=()):
+        sql = f'SELECT doc FROM "{self.name}" {where} ORDER BY rowid'
+        with StorageTimer("read") as io:
+            docs = [doc for (doc,) in self.db.connect().execute(sql, params)]
+            io.bytes = sum(len(doc) for doc in docs)
+            return [json.loads(doc) for doc in docs]
+
+    # --- Generations ---
+    # Every write bumps the collection's row in _generations. A value this
+    # process didn't produce means another process wrote, and derived state
+    # built from events (indexes, caches) has to be reset.
+    def _generation(self, conn):
+        return conn.execute('SELECT "value" FROM "_generations" WHERE "name" = ?', (self.name,)).fetchone()[0]
+
+    def _bump(self, conn):
+        conn.execute('UPDATE "_generations" SET "value" = "value" + 1 WHERE "name" = ?', (self.name,))
+        value = self._generation(conn)
+        self.db.after_commit(lambda: self._advance(value))
+
+    def _advance(self, value):
+        with self._seen_lock:
+            if value == self._seen + 1:
+                self._seen = value
+
+    def sync(self, user_id=None):
+        value = self._generation(self.db.connect())
+        with self._seen_lock:
+            if value == self._seen:
+                return
+            self._seen = value
+        _emit(self.name, "reset")
+
+    # --- Reads ---
+    def all(self):
+        return self._select()
+
+    def get(self, record_id):
+        rows = self._select('WHERE "id" = ?', (record_id,))
+        return rows[0] if rows else None
+
+    def get_for_user(self, user_id, record_id):
+        rows = self._select('WHERE "id" = ? AND "userId" = ?', (record_id, user_id))
+        return rows[0] if rows else None
+
+    def for_user(self, user_id):
+        return self._select('WHERE "userId" = ?', (user_id,))
+
+    def iter_for_user(self, user_id):
+        sql = f'SELECT doc FROM "{self.name}" WHERE "userId" = ? ORDER BY rowid'
+        for (doc,) in self.db.connect().execute(sql, (user_id,)):
+            yield json.loads(doc)
+
+    def find(self, field, value):
+        rows = self._select(f'WHERE "{field}" = ?', (_norm(value),))
+        return rows[0] if rows else None
+
+    def referencing(self, field, value, user_id=None):
+        where = f'WHERE "id" IN (SELECT "id" FROM "{self.name}_refs" WHERE "field" = ? AND "key" = ?)'
+        params = (field, value)
+        if user_id is not None:
+            where += ' AND "userId" = ?'
+            params += (user_id,)
+        return self._select(where, params)
+
+    # --- Writes ---
+    def _upsert(self, records):
+        names = ", ".join(f'"{c}"' for c in self.columns + ("doc",))
+        marks = ", ".join("?" for _ in range(len(self.columns) + 1))
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in self.columns[1:] + ("doc",))
+        rows = [self._row(r) for r in records]
+        with StorageTimer("write") as io, self.db.transaction() as conn:
+            io.bytes = sum(len(row[-1]) for row in rows)
+            if has_listeners():
+                existing = self._existing(conn, [r["id"] for r in records])
+                events = [("update" if r["id"] in existing else "create", r) for r in records]
+                self.db.after_commit(lambda: self._emit_puts(events))
+            conn.executemany(
+                f'INSERT INTO "{self.name}" ({names}) VALUES ({marks}) ON CONFLICT("id") DO UPDATE SET {updates}',
+                rows,
+            )
+            if self.refs:
+                self._write_refs(conn, records)
+            self._bump(conn)
+
+    def _existing(self, conn, record_ids):
+        found = set()
+        for start in range(0, len(record_ids), 500):
+            chunk = record_ids[start:start + 500]
+            marks = ", ".join("?" for _ in chunk)
+            found.update(i for (i,) in conn.execute(f'SELECT "id" FROM "{self.name}" WHERE "id" IN ({marks})', chunk))
+        return found
+
+    def _emit_puts(self, events):
+        for op, record in events:
+            _emit(self.name, op, record.get("userId"), record["id"], record)
+
+    def _emit_deletes(self, records):
+        for record in records:
+            _emit(self.name, "delete", record.get("userId"), record["id"])
+
+    def insert_many(self, records):
+        self._upsert(records)
+
+    def update_many(self, records):
+        self._upsert(records)
+
+    def delete_many(self, record_ids, user_id=None):
+        removed = []
+        with StorageTimer("write"), self.db.transaction() as conn:
+            for record_id in record_ids:
+                row = conn.execute(f'SELECT doc FROM "{self.name}" WHERE "id" = ?', (record_id,)).fetchone()
+                if row:
+                    conn.execute(f'DELETE FROM "{self.name}" WHERE "id" = ?', (record_id,))
+                    removed.append(json.loads(row[0]))
+            if self.refs and removed:
+                conn.executemany(f'DELETE FROM "{self.name}_refs" WHERE "id" = ?', [(r["id"],) for r in removed])
+            if removed:
+                self.db.after_commit(lambda: self._emit_deletes(removed))
+                self._bump(conn)
+        return removed
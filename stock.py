@@ -0,0 +1,100 @@
+from bottle import request, response
+from datetime import date, timedelta
+from utils.store import collection
+from utils.indexes import SortedIndex
+from utils.pagination import page, PREFIX_END
+from utils.ledger import to_decimal, to_number
+
+PERIODS = ("day", "week", "month")
+DEFAULT_USAGE_DAYS = 28
+
+# Ledger entries per ingredient in time order, and the daily rollups by
+# day (all ingredients) and by ingredient then day
+_movement_index = SortedIndex("stock_movements", lambda m: (m["ingredientId"], m["at"]))
+_daily_index = SortedIndex("stock_daily", lambda b: (b["day"],))
+_ingredient_daily_index = SortedIndex("stock_daily", lambda b: (b["ingredientId"], b["day"]))
+
+# --- Helpers ---
+def _day_param(name, default):
+    value = request.query.get(name) or default
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+def _period(day, period):
+    if period == "month":
+        return day[:7]
+    if period == "week":
+        d = date.fromisoformat(day)
+        # Weeks start on Monday and are labelled by that day
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return day
+
+# --- Movements ---
+def get_movements(id):
+    """The ingredient's ledger entries in time order, paged with
+    ?limit=&after= and optionally limited to ?from=&to= dates."""
+    user_id = request.user_id
+    if not collection("ingredients").get_for_user(user_id, id):
+        response.status = 404
+        return {"success": False, "message": "Ingredient not found"}
+
+    start = request.query.get("from", "")
+    end = request.query.get("to", PREFIX_END)
+    try:
+        movements, cursor = page(_movement_index, user_id, request.query,
+                                 start=((id, start),), stop=((id, end + PREFIX_END),))
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+    return {"success": True, "data": movements, "nextCursor": cursor}
+
+# --- Usage ---
+def get_usage():
+    """Consumption per ingredient per ?period=day|week|month between ?from=
+    and ?to= (default: the last four weeks), optionally for one
+    ?ingredientId=. Summed from the daily buckets, never the ledger."""
+    user_id = request.user_id
+    period = request.query.get("period", "week")
+    ingredient_id = request.query.get("ingredientId")
+    today = date.today()
+    try:
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of: {', '.join(PERIODS)}")
+        start = _day_param("from", (today - timedelta(days=DEFAULT_USAGE_DAYS - 1)).isoformat())
+        end = _day_param("to", today.isoformat())
+    except ValueError as e:
+        response.status = 400
+        return {"success": False, "message": str(e)}
+
+    if ingredient_id:
+        index = _ingredient_daily_index
+        entries = index.range(user_id, start=((ingredient_id, start),), stop=((ingredient_id, end, ""),))
+    else:
+        index = _daily_index
+        entries = index.range(user_id, start=((start,),), stop=((end, ""),))
+
+    totals = {}
+    for bucket in index.records(user_id, [record_id for _, record_id in entries]):
+        key = (_period(bucket["day"], period), bucket["ingredientId"])
+        total = totals.setdefault(key, {"used": to_decimal(0), "restored": to_decimal(0), "adjusted": to_decimal(0)})
+        for field in total:
+            total[field] += to_decimal(bucket.get(field))
+
+    ingredients = collection("ingredients")
+    data = []
+    for (label, ing_id), total in sorted(totals.items()):
+        ingredient = ingredients.get_for_user(user_id, ing_id) or {}
+        data.append({
+            "period": label,
+            "ingredientId": ing_id,
+            "name": ingredient.get("name"),
+            "unit": ingredient.get("unit"),
+            "used": to_number(total["used"]),
+            "restored": to_number(total["restored"]),
+            # Consumed by meals that were kept
+            "net": to_number(total["used"] - total["restored"]),
+            "adjusted": to_number(total["adjusted"]),
+        })
+    return {"success": True, "data": data, "from": start, "to": end, "period": period}
@@ -0,0 +1,642 @@
+import atexit
+import contextlib
+import copy
+import fcntl
+import os
+import threading
+import time
+import weakref
+import zlib
+from utils.json_os import read_json, encode_entry, encode_record, read_journal, write_json, write_records
+from utils.metrics import StorageTimer
+
+DATA_DIR = os.environ.get("BAKETRACK_DATA_DIR", "data")
+
+# Journaled mode appends each mutation to <collection>.log instead of
+# rewriting the whole file; a background thread folds the log into the
+# snapshot. FSYNC_EVERY batches fsyncs (0 leaves flushing to the OS).
+# Collections marked "append_only" in SCHEMA are journaled either way.
+BACKEND = os.environ.get("BAKETRACK_BACKEND", "json")
+JOURNAL = os.environ.get("BAKETRACK_JOURNAL", "0") == "1"
+FSYNC_EVERY = int(os.environ.get("BAKETRACK_FSYNC_EVERY", "1"))
+COMPACT_INTERVAL = float(os.environ.get("BAKETRACK_COMPACT_INTERVAL", "30"))
+COMPACT_MIN_ENTRIES = int(os.environ.get("BAKETRACK_COMPACT_MIN_ENTRIES", "500"))
+
+# Set when several worker processes share DATA_DIR (serve.py --workers):
+# writes and transactions then also take file locks, and sync() picks up
+# other processes' writes before each request.
+MULTIPROCESS = os.environ.get("BAKETRACK_MULTIPROCESS", "0") == "1"
+USER_LOCK_STRIPES = 64
+
+# "sharded" keeps each tenant's ingredients, recipes and meals in their own
+# files under DATA_DIR/shards (JSON backend only; see sharded_store).
+LAYOUT = os.environ.get("BAKETRACK_LAYOUT", "flat")
+TENANT_COLLECTIONS = ("ingredients", "recipes", "meals", "meal_rules", "stock_movements", "stock_daily")
+
+def _recipe_ingredient_ids(recipe):
+    return [ri["ingredientId"] for ri in recipe.get("ingredients", [])]
+
+def _meal_recipe_ids(meal):
+    return [meal["recipeId"]] if meal.get("recipeId") else []
+
+# Extra lookups per collection; every collection is indexed by id and userId.
+# "refs" maintain reverse indexes (referenced id -> records) for cascades and
+# "columns" are additionally indexed per user by the SQLite backend.
+# "append_only" collections only grow, so the JSON backend always journals
+# them: a write appends one line instead of rewriting the whole history.
+SCHEMA = {
+    "users": {"unique": ("email",)},
+    "ingredients": {},
+    "recipes": {"refs": {"ingredientId": _recipe_ingredient_ids}},
+    "meals": {"columns": ("date", "time"), "refs": {"recipeId": _meal_recipe_ids}},
+    # Recurring meals, expanded into meals as they come due (see recurrence.py)
+    "meal_rules": {"refs": {"recipeId": _meal_recipe_ids}},
+    # Append-only stock ledger and its per-day rollups (see ledger.py)
+    "stock_movements": {"columns": ("ingredientId",), "append_only": True},
+    "stock_daily": {"columns": ("ingredientId", "day")},
+}
+
+def _norm(value):
+    return value.strip().lower() if isinstance(value, str) else value
+
+# --- Change Events ---
+_listeners = []
+
+def subscribe(listener):
+    """listener(name, op, user_id, record_id, record) runs after every committed
+    write. op is "create", "update" or "delete" (record is None), or "reset"
+    when a collection was reloaded wholesale (name None means all of them;
+    a user_id limits it to that user's records)."""
+    _listeners.append(listener)
+
+def has_listeners():
+    return bool(_listeners)
+
+def _emit(name, op, user_id=None, record_id=None, record=None):
+    for listener in _listeners:
+        listener(name, op, user_id, record_id, record)
+
+def _file_signature(file_path):
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# --- Storage Interface ---
+class BaseCollection:
+    """What route modules may call on a collection. Backends implement the
+    reads and the *_many writes; records are plain dicts carrying "id" and,
+    for tenant data, "userId"."""
+
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, record_id):
+        raise NotImplementedError
+
+    def get_for_user(self, user_id, record_id):
+        raise NotImplementedError
+
+    def for_user(self, user_id):
+        raise NotImplementedError
+
+    def sync(self, user_id=None):
+        # Catch up with writes made by other processes
+        pass
+
+    def iter_for_user(self, user_id):
+        # Backends that can stream override this
+        return iter(self.for_user(user_id))
+
+    def find(self, field, value):
+        raise NotImplementedError
+
+    def referencing(self, field, value, user_id=None):
+        raise NotImplementedError
+
+    def insert_many(self, records):
+        raise NotImplementedError
+
+    def update_many(self, records):
+        raise NotImplementedError
+
+    def delete_many(self, record_ids, user_id=None):
+        # user_id, when known, lets partitioned backends skip a lookup
+        raise NotImplementedError
+
+    def insert(self, record):
+        self.insert_many([record])
+
+    def update(self, record):
+        self.update_many([record])
+
+    def delete(self, record_id):
+        return self.delete_many([record_id])
+
+    def close(self):
+        pass
+
+# --- JSON Collection ---
+class Collection(BaseCollection):
+    """One JSON file kept resident in memory and indexed by id, userId and
+    any unique fields. The file is only re-parsed when its mtime/size change."""
+
+    def __init__(self, file_path, unique=(), refs=None, user_id=None, lock=None, lock_name=None):
+        self.file_path = file_path
+        self.name = os.path.splitext(os.path.basename(file_path))[0]
+        self.unique = tuple(unique)
+        self.refs = dict(refs or {})
+        # Set for one tenant's file in the sharded layout
+        self.user_id = user_id
+        self.lock_name = lock_name or self.name
+        self._lock = lock or threading.RLock()
+        self._signature = None
+        self._loaded = False
+        self._records = {}
+        self._by_user = {}
+        self._by_unique = {field: {} for field in self.unique}
+        self._by_ref = {field: {} for field in self.refs}
+        self._keys = {}
+        self._encoded = {}
+
+    # --- Loading ---
+    def _stat(self):
+        return _file_signature(self.file_path)
+
+    def _load(self):
+        return read_json(self.file_path)
+
+    def _refresh(self):
+        signature = self._stat()
+        if self._loaded and signature == self._signature:
+            return
+        with self._lock:
+            signature = self._stat()
+            if self._loaded and signature == self._signature:
+                return
+            self._reset(self._load())
+            self._signature = signature
+            self._loaded = True
+        _emit(self.name, "reset", self.user_id)
+
+    def _reset(self, records):
+        self._records = {}
+        self._by_user = {}
+        self._by_unique = {field: {} for field in self.unique}
+        self._by_ref = {field: {} for field in self.refs}
+        self._keys = {}
+        self._encoded = {}
+        for record in records:
+            self._index(record)
+
+    # --- Indexing ---
+    def _index(self, record):
+        record_id = record["id"]
+        user_id = record.get("userId")
+        uniques = tuple(_norm(record.get(field)) for field in self.unique)
+        refs = tuple(frozenset(extract(record)) for extract in self.refs.values())
+
+        self._records[record_id] = record
+        if user_id is not None:
+            self._by_user.setdefault(user_id, {})[record_id] = record
+        for field, value in zip(self.unique, uniques):
+            if value is not None:
+                self._by_unique[field][value] = record
+        for field, keys in zip(self.refs, refs):
+            for key in keys:
+                self._by_ref[field].setdefault(key, {})[record_id] = record
+        self._keys[record_id] = (user_id, uniques, refs)
+
+    def _unindex(self, record_id):
+        record = self._records.pop(record_id, None)
+        if record is None:
+            return None
+        user_id, uniques, refs = self._keys.pop(record_id)
+        self._encoded.pop(record_id, None)
+        owned = self._by_user.get(user_id)
+        if owned is not None:
+            owned.pop(record_id, None)
+            if not owned:
+                del self._by_user[user_id]
+        for field, value in zip(self.unique, uniques):
+            if self._by_unique[field].get(value) is record:
+                del self._by_unique[field][value]
+        for field, keys in zip(self.refs, refs):
+            for key in keys:
+                referencing = self._by_ref[field][key]
+                referencing.pop(record_id, None)
+                if not referencing:
+                    del self._by_ref[field][key]
+        return record
+
+    def _encode_all(self):
+        # Unchanged records reuse their cached encoding; only writes re-encode
+        encoded = self._encoded
+        chunks = []
+        for record_id, record in self._records.items():
+            chunk = encoded.get(record_id)
+            if chunk is None:
+                chunk = encoded[record_id] = encode_record(record)
+            chunks.append(chunk)
+        return chunks
+
+    def _persist(self, changes):
+        write_records(self.file_path, self._encode_all())
+        self._signature = self._stat()
+
+    def _persist_or_reload(self, changes):
+        # The indexes already hold the changes; if they didn't reach the file,
+        # drop them so the next access reloads what is actually on disk
+        try:
+            self._persist(changes)
+        except BaseException:
+            self._loaded = False
+            raise
+
+    def sync(self, user_id=None):
+        self._refresh()
+
+    # --- Reads ---
+    def all(self):
+        self._refresh()
+        return list(self._records.values())
+
+    def get(self, record_id):
+        self._refresh()
+        return self._records.get(record_id)
+
+    def get_for_user(self, user_id, record_id):
+        self._refresh()
+        return self._by_user.get(user_id, {}).get(record_id)
+
+    def for_user(self, user_id):
+        self._refresh()
+        return list(self._by_user.get(user_id, {}).values())
+
+    def find(self, field, value):
+        self._refresh()
+        return self._by_unique[field].get(_norm(value))
+
+    def referencing(self, field, value, user_id=None):
+        self._refresh()
+        records = list(self._by_ref[field].get(value, {}).values())
+        if user_id is not None:
+            records = [r for r in records if r.get("userId") == user_id]
+        return records
+
+    # --- Writes ---
+    def _put_many(self, records):
+        # Refresh under the file lock so another process's write isn't overwritten
+        with self._lock, process_lock(self.lock_name):
+            self._refresh()
+            ops = []
+            for record in records:
+                ops.append("update" if self._unindex(record["id"]) is not None else "create")
+                self._index(record)
+            self._persist_or_reload([("put", r) for r in records])
+            for op, record in zip(ops, records):
+                _emit(self.name, op, record.get("userId"), record["id"], record)
+
+    def insert_many(self, records):
+        self._put_many(records)
+
+    def update_many(self, records):
+        self._put_many(records)
+
+    def delete_many(self, record_ids, user_id=None):
+        with self._lock, process_lock(self.lock_name):
+            self._refresh()
+            removed = [r for r in (self._unindex(i) for i in record_ids) if r is not None]
+            if removed:
+                self._persist_or_reload([("del", r["id"]) for r in removed])
+            for record in removed:
+                _emit(self.name, "delete", record.get("userId"), record["id"])
+            return removed
+
+# --- Journaled Collection ---
+class JournaledCollection(Collection):
+    """Snapshot file plus an append-only log of compact put/del entries.
+    Loading replays the log over the snapshot; compact() rewrites the
+    snapshot atomically and truncates the log."""
+
+    def __init__(self, file_path, unique=(), refs=None, **kwargs):
+        super().__init__(file_path, unique, refs, **kwargs)
+        self.log_path = os.path.splitext(file_path)[0] + ".log"
+        self._log = None
+        self._unsynced = 0
+        self._entries = 0
+        self._torn = None
+
+    def _stat(self):
+        return (_file_signature(self.file_path), _file_signature(self.log_path))
+
+    def _load(self):
+        self._close_log()
+        records = {r["id"]: r for r in read_json(self.file_path)}
+        entries, valid = read_journal(self.log_path)
+        for entry in entries:
+            if entry["op"] == "put":
+                records[entry["record"]["id"]] = entry["record"]
+            else:
+                records.pop(entry["id"], None)
+        # An incomplete last line is skipped here: loads also run on the read
+        # path, where it may be another process's append in progress. Only a
+        # writer, holding the file lock, cuts it off (see _persist).
+        torn = os.path.exists(self.log_path) and valid < os.path.getsize(self.log_path)
+        self._torn = valid if torn else None
+        self._entries = len(entries)
+        return list(records.values())
+
+    def _persist(self, changes):
+        # Callers hold the file lock and have just refreshed, so a torn tail
+        # seen by that load is a crashed write: drop it so new entries start
+        # on a clean line
+        if self._torn is not None:
+            self._close_log()
+            os.truncate(self.log_path, self._torn)
+            self._torn = None
+        if self._log is None:
+            self._log = open(self.log_path, "a")
+        with StorageTimer("write") as io:
+            for op, value in changes:
+                entry = {"op": op, "record": value} if op == "put" else {"op": op, "id": value}
+                line = encode_entry(entry)
+                self._log.write(line)
+                io.bytes += len(line)
+            self._log.flush()
+            self._entries += len(changes)
+            self._unsynced += len(changes)
+            if FSYNC_EVERY and self._unsynced >= FSYNC_EVERY:
+                self._sync()
+        self._signature = self._stat()
+
+    def _sync(self):
+        if self._log is not None and self._unsynced:
+            os.fsync(self._log.fileno())
+        self._unsynced = 0
+
+    def _close_log(self):
+        if self._log is not None:
+            self._sync()
+            self._log.close()
+            self._log = None
+
+    def flush(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+                self._sync()
+
+    def compact(self):
+        with self._lock, process_lock(self.lock_name):
+            self._refresh()
+            if not self._entries:
+                return False
+            write_records(self.file_path, self._encode_all())
+            self._close_log()
+            open(self.log_path, "w").close()
+            self._entries = 0
+            self._torn = None
+            self._signature = self._stat()
+            return True
+
+# --- Registry ---
+_collections = {}
+_registry_lock = threading.Lock()
+
+_database = None
+_compactor = None
+
+def _open(name):
+    global _database
+    spec = SCHEMA.get(name, {})
+    if BACKEND == "sqlite":
+        from utils.sqlite_store import Database, SqliteCollection
+        if _database is None:
+            _database = Database(os.path.join(DATA_DIR, "baketrack.db"))
+        return SqliteCollection(_database, name, spec.get("unique", ()), spec.get("columns", ()), spec.get("refs"))
+
+    journal = JOURNAL or spec.get("append_only", False)
+    cls = JournaledCollection if journal else Collection
+    if journal:
+        _start_compactor()
+    if LAYOUT == "sharded" and name in TENANT_COLLECTIONS:
+        from utils.sharded_store import ShardedCollection
+        return ShardedCollection(os.path.join(DATA_DIR, "shards"), name, cls, spec.get("refs"))
+    path = os.path.join(DATA_DIR, f"{name}.json")
+    return cls(path, spec.get("unique", ()), spec.get("refs"))
+
+def collection(name):
+    coll = _collections.get(name)
+    if coll is None:
+        with _registry_lock:
+            coll = _collections.get(name)
+            if coll is None:
+                coll = _collections[name] = _open(name)
+    return coll
+
+def configure(data_dir=None, backend=None, journal=None, fsync_every=None, multiprocess=None, layout=None):
+    global DATA_DIR, BACKEND, JOURNAL, FSYNC_EVERY, MULTIPROCESS, LAYOUT, _database
+    flush()
+    with _registry_lock:
+        if data_dir is not None:
+            DATA_DIR = data_dir
+        if layout is not None:
+            LAYOUT = layout
+        if multiprocess is not None:
+            MULTIPROCESS = multiprocess
+        if backend is not None:
+            BACKEND = backend
+        if journal is not None:
+            JOURNAL = journal
+        if fsync_every is not None:
+            FSYNC_EVERY = fsync_every
+        for coll in _collections.values():
+            coll.close()
+        _collections.clear()
+        if _database is not None:
+            _database.close()
+            _database = None
+    _emit(None, "reset")
+
+def warm():
+    """Open every collection and load its data, so the first request
+    doesn't pay for parsing (sharded tenants still load on first use)."""
+    recover()
+    for name in SCHEMA:
+        collection(name).sync()
+
+def sync(user_id=None):
+    for coll in list(_collections.values()):
+        coll.sync(user_id)
+
+def close():
+    """Flush journals and close database connections, e.g. on shutdown."""
+    flush()
+    if _database is not None:
+        _database.close()
+
+# --- Cross-process Locks ---
+_held = threading.local()
+
+@contextlib.contextmanager
+def process_lock(name):
+    """Exclusive lock on DATA_DIR/locks/<name>.lock across processes; a no-op
+    unless MULTIPROCESS. Re-entrant per thread. flock() locks belong to the
+    open file, so threads of one process exclude each other as well."""
+    held = _held.__dict__.setdefault("names", set())
+    if not MULTIPROCESS or name in held:
+        yield
+        return
+
+    path = os.path.join(DATA_DIR, "locks", f"{name}.lock")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        held.add(name)
+        try:
+            yield
+        finally:
+            held.discard(name)
+    finally:
+        os.close(fd)
+
+# --- Journal Maintenance ---
+def _journaled():
+    colls = []
+    for coll in list(_collections.values()):
+        colls.extend(coll.resident() if hasattr(coll, "resident") else [coll])
+    return [c for c in colls if isinstance(c, JournaledCollection)]
+
+def compact_all(min_entries=1):
+    for coll in _journaled():
+        if coll._entries >= min_entries:
+            coll.compact()
+
+def flush():
+    for coll in _journaled():
+        coll.flush()
+
+def _compact_loop():
+    while True:
+        time.sleep(COMPACT_INTERVAL)
+        try:
+            compact_all(COMPACT_MIN_ENTRIES)
+        except OSError as e:
+            print(f"[store] compaction failed: {e}")
+
+def _start_compactor():
+    global _compactor
+    if _compactor is None:
+        _compactor = threading.Thread(target=_compact_loop, name="store-compactor", daemon=True)
+        _compactor.start()
+
+atexit.register(flush)
+
+# --- Transactions ---
+# One lock per tenant: a user's read-check-write sequences serialize, other
+# tenants proceed in parallel. Idle locks are dropped with the last reference.
+_user_locks = weakref.WeakValueDictionary()
+_user_locks_guard = threading.Lock()
+
+def user_lock(user_id):
+    with _user_locks_guard:
+        lock = _user_locks.get(user_id)
+        if lock is None:
+            lock = _user_locks[user_id] = threading.RLock()
+        return lock
+
+def batch():
+    """Group writes to several collections into one backend commit. Only
+    SQLite has one; JSON files change one at a time (see Transaction.commit)."""
+    if _database is not None:
+        return _database.transaction()
+    return contextlib.nullcontext()
+
+class Transaction:
+    """Staged writes across collections for one user. Reads return private
+    copies, so nothing is visible to other requests until commit(); leaving
+    the block without committing discards every staged change.
+
+    On SQLite the commit is one database transaction. JSON collections are
+    separate files, so a commit touching several of them first writes an
+    intent file with every change; if the process dies part way, the next
+    transaction for that user (or recover() at startup) applies it again."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._writes = {}
+        self._deletes = {}
+
+    def get_for_user(self, name, record_id):
+        if record_id in self._deletes.get(name, {}):
+            return None
+        staged = self._writes.get(name, {}).get(record_id)
+        if staged is not None:
+            return staged
+        record = collection(name).get_for_user(self.user_id, record_id)
+        return copy.deepcopy(record) if record else None
+
+    def put(self, name, record):
+        self._deletes.get(name, {}).pop(record["id"], None)
+        self._writes.setdefault(name, {})[record["id"]] = record
+
+    def delete(self, name, record_id):
+        self._writes.get(name, {}).pop(record_id, None)
+        self._deletes.setdefault(name, {})[record_id] = True
+
+    def commit(self):
+        writes = {name: list(records.values()) for name, records in self._writes.items() if records}
+        deletes = {name: list(ids) for name, ids in self._deletes.items() if ids}
+        if BACKEND != "sqlite" and len(writes) + len(deletes) > 1:
+            path = _intent_path(self.user_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_json(path, {"userId": self.user_id, "writes": writes, "deletes": deletes})
+            _apply(self.user_id, writes, deletes)
+            os.unlink(path)
+        else:
+            _apply(self.user_id, writes, deletes)
+        self._writes.clear()
+        self._deletes.clear()
+
+def _apply(user_id, writes, deletes):
+    # Puts and deletes of whole records, so applying twice is harmless
+    with batch():
+        for name, records in writes.items():
+            collection(name).update_many(records)
+        for name, record_ids in deletes.items():
+            collection(name).delete_many(record_ids, user_id)
+
+def _intent_path(user_id):
+    return os.path.join(DATA_DIR, "transactions", f"{user_id}.json")
+
+def _finish_pending(user_id):
+    # Callers hold the user's transaction locks
+    path = _intent_path(user_id)
+    if os.path.exists(path):
+        intent = read_json(path)
+        _apply(user_id, intent["writes"], intent["deletes"])
+        os.unlink(path)
+
+def recover():
+    """Finish the commits a crash interrupted (JSON backend only)."""
+    if BACKEND == "sqlite":
+        return
+    try:
+        names = os.listdir(os.path.join(DATA_DIR, "transactions"))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith(".json"):
+            with transaction(name[:-len(".json")]):
+                pass
+
+@contextlib.contextmanager
+def transaction(user_id):
+    stripe = zlib.crc32(str(user_id).encode()) % USER_LOCK_STRIPES
+    with user_lock(user_id), process_lock(f"user-{stripe}"):
+        if BACKEND != "sqlite":
+            _finish_pending(user_id)
+        yield Transaction(user_id)
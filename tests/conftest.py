@@ -0,0 +1,40 @@
+import os
+import sys
+import types
+import pytest
+
+# The sources import each other as utils.<module> and routes.<module>, the
+# packages they are deployed as; this checkout keeps them side by side, so
+# both names resolve to the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+for package in ("utils", "routes"):
+    if package not in sys.modules:
+        module = sys.modules[package] = types.ModuleType(package)
+        module.__path__ = [ROOT]
+
+from utils import crypto, store
+from benchmarks.wsgi import call
+
+PASSWORD = "test-password"
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path):
+    """Every test gets an empty store in its own directory."""
+    previous = store.DATA_DIR
+    crypto.configure_hashing(workers=0)
+    store.configure(data_dir=str(tmp_path))
+    yield tmp_path
+    store.configure(data_dir=previous)
+
+@pytest.fixture
+def app():
+    from app import app
+    return app
+
+@pytest.fixture
+def token(app):
+    call(app, "POST", "/api/signup", {"name": "Tester", "email": "tester@example.com", "password": PASSWORD})
+    _, _, payload = call(app, "POST", "/api/login", {"email": "tester@example.com", "password": PASSWORD})
+    return payload["token"]
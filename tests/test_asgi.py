@@ -0,0 +1,45 @@
+import asyncio
+import csv
+import io
+import json
+import pytest
+from benchmarks.wsgi import call
+
+asgi = pytest.importorskip("asgi")
+
+async def _asgi_get(path, token):
+    path, _, query = path.partition("?")
+    messages = [{"type": "http.request", "body": b""}]
+    sent = {"body": b""}
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        else:
+            sent["body"] += message.get("body", b"")
+
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+             "headers": [(b"authorization", f"Bearer {token}".encode())]}
+    await asgi.app(scope, receive, send)
+    return sent["status"], sent["body"]
+
+def test_export_streams_through_asgi(app, token):
+    for n in range(200):
+        call(app, "POST", "/api/ingredients", {"name": f"ingredient {n}", "unit": "kg", "category": "dry",
+                                               "quantity": n, "minQuantity": 1}, token)
+
+    async def exports():
+        # Several at once, so chunks can't all happen to land on one pool thread
+        return await asyncio.gather(*(_asgi_get(f"/api/ingredients/export?format={fmt}", token)
+                                      for fmt in ("csv", "ndjson", "csv", "ndjson")))
+
+    for (status, body), fmt in zip(asyncio.run(exports()), ("csv", "ndjson", "csv", "ndjson")):
+        assert status == 200
+        if fmt == "csv":
+            rows = list(csv.DictReader(io.StringIO(body.decode())))
+        else:
+            rows = [json.loads(line) for line in body.decode().splitlines()]
+        assert sorted(r["name"] for r in rows) == sorted(f"ingredient {n}" for n in range(200))
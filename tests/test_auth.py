@@ -0,0 +1,42 @@
+import hashlib
+from utils import crypto, store
+from routes import auth
+from benchmarks.wsgi import call
+
+def _signup(app, email, password="pw"):
+    return call(app, "POST", "/api/signup", {"name": "Baker", "email": email, "password": password})
+
+def _login(app, email, password):
+    return call(app, "POST", "/api/login", {"email": email, "password": password})[0]
+
+def test_duplicate_signup_is_rejected(app):
+    assert _signup(app, "baker@example.com")[0] == 200
+    status, _, payload = _signup(app, "Baker@example.com")
+    assert status == 400 and payload["message"] == "Email already registered"
+
+def test_unknown_email_costs_a_password_check(app, monkeypatch):
+    _signup(app, "baker@example.com")
+    runs = []
+    scrypt = crypto._scrypt
+    monkeypatch.setattr(crypto, "_scrypt", lambda *args: runs.append(1) or scrypt(*args))
+    assert _login(app, "baker@example.com", "wrong") == 401
+    assert _login(app, "nobody@example.com", "wrong") == 401
+    assert len(runs) == 2
+
+def test_rehash_on_login_does_not_undo_a_reset(app, monkeypatch):
+    # A legacy SHA-256 account is rehashed on its next login
+    store.collection("users").insert({"id": "u1", "name": "Baker", "email": "baker@example.com",
+                                      "password": hashlib.sha256(b"old").hexdigest()})
+    hash_password = auth.hash_password
+
+    def racing(password):
+        # The reset lands while the login is still computing the new hash
+        if password == "old":
+            monkeypatch.setattr(auth, "hash_password", hash_password)
+            call(app, "POST", "/api/forgot-password", {"email": "baker@example.com", "new_password": "new"})
+        return hash_password(password)
+    monkeypatch.setattr(auth, "hash_password", racing)
+
+    assert _login(app, "baker@example.com", "old") == 200
+    assert _login(app, "baker@example.com", "old") == 401
+    assert _login(app, "baker@example.com", "new") == 200
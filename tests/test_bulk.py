@@ -0,0 +1,48 @@
+from benchmarks.wsgi import call
+
+def _ingredients(app, token):
+    _, _, payload = call(app, "GET", "/api/ingredients", token=token)
+    return {i["name"]: i for i in payload["data"]}
+
+def test_ingredient_csv_round_trips_cost_and_nutrition(app, token):
+    call(app, "POST", "/api/ingredients", {"name": "Flour", "unit": "kg", "category": "dry", "quantity": 5,
+                                           "minQuantity": 1, "unitCost": 1.25,
+                                           "nutrition": {"calories": 364, "protein": 10.3}}, token)
+    call(app, "POST", "/api/ingredients", {"name": "Salt", "unit": "g", "category": "dry", "quantity": 100,
+                                           "minQuantity": 10}, token)
+    status, _, exported = call(app, "GET", "/api/ingredients/export?format=csv", token=token)
+    assert status == 200
+    assert exported.decode().splitlines()[0].endswith("unitCost,nutrition")
+
+    # Import the export into a second account
+    call(app, "POST", "/api/signup", {"name": "Other", "email": "other@example.com", "password": "pw"})
+    _, _, login = call(app, "POST", "/api/login", {"email": "other@example.com", "password": "pw"})
+    other = login["token"]
+    status, _, payload = call(app, "POST", "/api/ingredients/import", exported, other,
+                              headers={"Content-Type": "text/csv"})
+    assert status == 201, payload
+
+    imported = _ingredients(app, other)
+    assert imported["Flour"]["unitCost"] == 1.25
+    assert imported["Flour"]["nutrition"] == {"calories": 364, "protein": 10.3}
+    assert "unitCost" not in imported["Salt"] and "nutrition" not in imported["Salt"]
+
+def test_meal_import_keeps_done_and_its_stock(app, token):
+    _, _, ing = call(app, "POST", "/api/ingredients", {"name": "Flour", "unit": "kg", "category": "dry", "quantity": 10,
+                                                       "minQuantity": 0}, token)
+    _, _, rec = call(app, "POST", "/api/recipes", {"name": "Bread", "ingredients": [{"ingredientId": ing["id"], "quantity": 1}]}, token)
+    _, _, done = call(app, "POST", "/api/meals", {"date": "2040-01-01", "time": "lunch", "recipeId": rec["id"]}, token)
+    call(app, "PUT", f"/api/meals/{done['mealId']}/done", token=token)
+    call(app, "POST", "/api/meals", {"date": "2040-01-02", "time": "lunch", "recipeId": rec["id"]}, token)
+    _, _, exported = call(app, "GET", "/api/meals/export?format=csv", token=token)
+    _, _, meals = call(app, "GET", "/api/meals", token=token)
+    for meal in meals["data"]:
+        call(app, "DELETE", f"/api/meals/{meal['id']}", token=token)
+    stock = _ingredients(app, token)["Flour"]["quantity"]
+
+    status, _, payload = call(app, "POST", "/api/meals/import", exported, token, headers={"Content-Type": "text/csv"})
+    assert status == 201, payload
+    _, _, meals = call(app, "GET", "/api/meals", token=token)
+    assert [(m["date"], m["done"]) for m in meals["data"]] == [("2040-01-01", True), ("2040-01-02", False)]
+    # Only the pending meal takes stock again
+    assert _ingredients(app, token)["Flour"]["quantity"] == stock - 1
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from routes import changes
+from benchmarks.wsgi import call, stream
+
+def _ingredient(app, token, name):
+    return call(app, "POST", "/api/ingredients", {"name": name, "unit": "kg", "category": "dry",
+                                                  "quantity": 1, "minQuantity": 0}, token)[2]["id"]
+
+def test_thread_streams_are_capped(app, token, monkeypatch):
+    monkeypatch.setattr(changes, "_streams", changes._streams)
+    monkeypatch.setattr(changes, "MAX_STREAMS", changes.MAX_STREAMS)
+    changes.configure_streams(1)
+    path = f"/api/changes/stream?since={changes.feed.cursor()}"
+    status, _, body = stream(app, "GET", path, token=token)
+    try:
+        assert status == 200
+        assert call(app, "GET", path, token=token)[0] == 503
+    finally:
+        body.close()
+
+def test_asgi_streams_wait_without_a_thread(app, token, monkeypatch):
+    asgi = pytest.importorskip("asgi")
+    # Two pool threads for six open streams and an ordinary request
+    monkeypatch.setattr(asgi, "_executor", ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(changes, "STREAM_SECONDS", 1.0)
+    # Loaded first: a collection's first load resets the feed
+    _ingredient(app, token, "Salt")
+    cursor = changes.feed.cursor()
+
+    async def request(path):
+        path, _, query = path.partition("?")
+        received = {"body": b""}
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                received["status"] = message["status"]
+            received["body"] += message.get("body", b"")
+
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+                 "headers": [(b"authorization", f"Bearer {token}".encode())]}
+        await asgi.app(scope, receive, send)
+        received["at"] = time.monotonic()
+        return received
+
+    async def scenario():
+        streams = [asyncio.create_task(request(f"/api/changes/stream?since={cursor}")) for _ in range(6)]
+        await asyncio.sleep(0.2)
+        listed = await request("/api/ingredients")
+        _ingredient(app, token, "Flour")
+        return listed, await asyncio.gather(*streams)
+
+    listed, streams = asyncio.run(scenario())
+    assert listed["status"] == 200
+    for received in streams:
+        assert received["status"] == 200 and b"event: change" in received["body"]
+        # The ordinary request didn't wait for the streams to end
+        assert listed["at"] < received["at"]
+    assert changes._async_streams._value == changes.MAX_ASYNC_STREAMS
+
+def test_cursor_replays_later_changes_in_order(app, token):
+    # The first snapshot loads the collections, which resets the feed
+    call(app, "GET", "/api/changes", token=token)
+    status, _, snapshot = call(app, "GET", "/api/changes", token=token)
+    assert status == 200 and snapshot["snapshot"]
+    ids = [_ingredient(app, token, name) for name in ("Flour", "Sugar", "Salt")]
+
+    _, _, first = call(app, "GET", f"/api/changes?since={snapshot['cursor']}&limit=2", token=token)
+    assert not first["snapshot"]
+    assert [(e["collection"], e["op"], e["id"]) for e in first["data"]] == [("ingredients", "create", i) for i in ids[:2]]
+    _, _, rest = call(app, "GET", f"/api/changes?since={first['cursor']}", token=token)
+    assert [e["id"] for e in rest["data"]] == ids[2:]
+    _, _, idle = call(app, "GET", f"/api/changes?since={rest['cursor']}", token=token)
+    assert idle["data"] == [] and idle["cursor"] == rest["cursor"]
+
+    # A cursor from another process (or a restart) gets a snapshot
+    _, _, foreign = call(app, "GET", f"/api/changes?since=0000beef.{changes.feed.seq}", token=token)
+    assert foreign["snapshot"] and len(foreign["data"]["ingredients"]) == 3
+
+def test_trimmed_buffer_needs_a_snapshot():
+    feed = changes.ChangeFeed(size=2)
+    for record_id in ("a", "b", "c"):
+        feed("ingredients", "create", "u1", record_id, {"id": record_id})
+    feed("ingredients", "create", "u2", "d", {"id": "d"})
+
+    # "a" (seq 1) fell out of u1's buffer: replaying after it still works,
+    # replaying it does not
+    events, cursor = feed.since("u1", 1)
+    assert [e["id"] for e in events] == ["b", "c"] and cursor == feed.cursor()
+    assert feed.since("u1", 0) is None
+    assert [e["id"] for e in feed.since("u2", 0)[0]] == ["d"]
+
+    # The user's data reloaded from disk: their old cursors are stale
+    feed("ingredients", "reset", "u1", None, None)
+    assert feed.since("u1", 3) is None
+    assert feed.since("u1", feed.seq) == ([], feed.cursor())
@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+from utils import store
+from benchmarks.wsgi import call
+
+TODAY = date.today()
+
+def _day(offset):
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+def _ingredient(app, token, name, quantity=1, **fields):
+    body = dict({"name": name, "unit": "kg", "category": "dry", "quantity": quantity, "minQuantity": 0}, **fields)
+    return call(app, "POST", "/api/ingredients", body, token)[2]["id"]
+
+def test_summary_follows_every_mutation(app, token, data_dir):
+    flour = _ingredient(app, token, "Flour", 2)
+    yeast = _ingredient(app, token, "Yeast", 1, minQuantity=5)
+    _ingredient(app, token, "Milk", expiryDate=_day(-1))
+    _ingredient(app, token, "Eggs", expiryDate=_day(3))
+    _ingredient(app, token, "Salt", expiryDate=_day(30))
+    _, _, recipe = call(app, "POST", "/api/recipes", {"name": "Bread", "ingredients": [{"ingredientId": flour, "quantity": 1}]}, token)
+    _, _, meal = call(app, "POST", "/api/meals", {"recipeId": recipe["id"], "date": _day(0), "time": "dinner"}, token)
+    call(app, "POST", "/api/meals", {"recipeId": recipe["id"], "date": _day(1), "time": "dinner"}, token)
+    call(app, "PUT", f"/api/meals/{meal['mealId']}/done", token=token)
+    call(app, "PUT", f"/api/ingredients/{flour}", {"minQuantity": 1}, token)
+    call(app, "DELETE", f"/api/ingredients/{yeast}", token=token)
+
+    _, _, summary = call(app, "GET", "/api/dashboard", token=token)
+    assert summary["data"]["counts"] == {"ingredients": 4, "recipes": 1, "meals": 2, "mealsPending": 1, "mealsDone": 1,
+                                         "lowStock": 1, "expired": 1, "expiring": 1}
+    assert [i["name"] for i in summary["data"]["lowStock"]] == ["Flour"]
+    assert [m["date"] for m in summary["data"]["todayMeals"]] == [_day(0)]
+    assert [m["date"] for m in summary["data"]["upcomingMeals"]] == [_day(1)]
+
+    # The same summary rebuilt from the files
+    store.configure(data_dir=str(data_dir))
+    assert call(app, "GET", "/api/dashboard", token=token)[2] == summary
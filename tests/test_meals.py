@@ -0,0 +1,129 @@
+import threading
+from datetime import date, timedelta
+from utils import store
+from routes import meals
+from benchmarks.wsgi import call
+
+TODAY = date.today()
+
+def _day(offset):
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+def _kitchen(app, token, quantity):
+    _, _, ing = call(app, "POST", "/api/ingredients", {"name": "Flour", "unit": "kg", "category": "dry",
+                                                       "quantity": quantity, "minQuantity": 0}, token)
+    _, _, rec = call(app, "POST", "/api/recipes", {"name": "Bread", "ingredients": [{"ingredientId": ing["id"], "quantity": 1}]}, token)
+    return ing["id"], rec["id"]
+
+def _stock(app, token, ingredient_id):
+    _, _, payload = call(app, "GET", f"/api/ingredients/{ingredient_id}", token=token)
+    return payload["data"]["quantity"]
+
+def _meal_dates(user_id):
+    return sorted(m["date"] for m in store.collection("meals").for_user(user_id))
+
+def test_reads_never_materialize(app, token):
+    ing, rec = _kitchen(app, token, 0)
+    status, _, payload = call(app, "POST", "/api/meals/rules", {"recipeId": rec, "time": "dinner", "start": _day(0), "freq": "daily"}, token)
+    assert status == 201 and payload["meals"] == [] and payload["data"]["blocked"]["date"] == _day(0)
+    user_id = payload["data"]["userId"]
+    call(app, "PUT", f"/api/ingredients/{ing}", {"quantity": 100}, token)
+
+    for path in ("/api/meals", "/api/dashboard"):
+        assert call(app, "GET", path, token=token)[0] == 200
+    assert _meal_dates(user_id) == [] and _stock(app, token, ing) == 100
+
+    # The background pass materializes the horizon
+    created = meals.materialize_all()
+    assert len(created) == meals.RECURRING_HORIZON_DAYS + 1
+    assert _stock(app, token, ing) == 100 - len(created)
+
+def test_missed_occurrences_are_skipped_not_backfilled(app, token):
+    ing, rec = _kitchen(app, token, 0)
+    _, _, payload = call(app, "POST", "/api/meals/rules", {"recipeId": rec, "time": "dinner", "start": _day(0), "freq": "daily"}, token)
+    rule = payload["data"]
+    # Blocked since three days ago: those occurrences have passed
+    rule = dict(rule, start=_day(-5), through=_day(-4), next=_day(-3))
+    store.collection("meal_rules").update(rule)
+    call(app, "PUT", f"/api/ingredients/{ing}", {"quantity": 2}, token)
+
+    meals.materialize_all()
+    assert _meal_dates(rule["userId"]) == [_day(0), _day(1)]
+    assert _stock(app, token, ing) == 0
+    _, _, listed = call(app, "GET", f"/api/meals?from={_day(-5)}", token=token)
+    assert min(m["date"] for m in listed["data"]) == _day(0)
+
+def test_plan_reserves_pending_rule_occurrences(app, token):
+    ing, rec = _kitchen(app, token, 1)
+    # Past the horizon, so nothing is materialized or deducted yet
+    start = meals.RECURRING_HORIZON_DAYS + 3
+    call(app, "POST", "/api/meals/rules", {"recipeId": rec, "time": "dinner", "start": _day(start), "freq": "weekly"}, token)
+    assert _stock(app, token, ing) == 1
+
+    slots = [{"date": _day(start), "time": "dinner", "recipeId": rec},
+             {"date": _day(start + 1), "time": "lunch", "recipeId": rec}]
+    _, _, payload = call(app, "POST", "/api/meals/plan", {"slots": slots}, token)
+    data = payload["data"]
+    assert data["slots"][0]["reason"].startswith("Meal already exists")
+    assert data["slots"][1]["reason"] == "Not enough stock"
+    assert data["reserved"] == {ing: 1}
+    assert data["shortfall"] == {ing: 1}
+
+def _login(app, email):
+    call(app, "POST", "/api/signup", {"name": "Other", "email": email, "password": "pw"})
+    return call(app, "POST", "/api/login", {"email": email, "password": "pw"})[2]["token"]
+
+def _due_rule(app, token, recipe_id):
+    # Starts past the horizon, then comes due
+    start = meals.RECURRING_HORIZON_DAYS + 3
+    _, _, payload = call(app, "POST", "/api/meals/rules", {"recipeId": recipe_id, "time": "dinner", "start": _day(start),
+                                                           "freq": "monthly"}, token)
+    rule = dict(payload["data"], start=_day(0), through=_day(-1), next=_day(0))
+    store.collection("meal_rules").update(rule)
+    return rule
+
+def test_recipe_without_ingredients_materializes(app, token):
+    _, _, recipe = call(app, "POST", "/api/recipes", {"name": "Air"}, token)
+    rule = _due_rule(app, token, recipe["id"])
+    created = meals.materialize_all()
+    assert [m["date"] for m in created] == [_day(0)]
+    assert store.collection("meal_rules").get(rule["id"]).get("blocked") is None
+
+def test_one_failing_user_does_not_stop_the_others(app, token, monkeypatch):
+    _, rec = _kitchen(app, token, 10)
+    mine = _due_rule(app, token, rec)
+    other = _login(app, "other@example.com")
+    _, other_rec = _kitchen(app, other, 10)
+    broken = _due_rule(app, other, other_rec)
+
+    materialize_due = meals.materialize_due
+    def failing(user_id):
+        if user_id == broken["userId"]:
+            raise KeyError("ingredients")
+        return materialize_due(user_id)
+    monkeypatch.setattr(meals, "materialize_due", failing)
+
+    created = meals.materialize_all()
+    assert [(m["userId"], m["date"]) for m in created] == [(mine["userId"], _day(0))]
+
+def test_concurrent_meals_never_oversell_stock(app, token):
+    ing, rec = _kitchen(app, token, 5)
+    start = threading.Barrier(12)
+    statuses = []
+
+    def schedule(offset):
+        start.wait()
+        status, _, _ = call(app, "POST", "/api/meals", {"recipeId": rec, "date": _day(offset), "time": "dinner"}, token)
+        statuses.append(status)
+
+    threads = [threading.Thread(target=schedule, args=(n,)) for n in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every deduction that was accepted is in the stock, and no more
+    assert sorted(statuses) == [201] * 5 + [400] * 7
+    assert _stock(app, token, ing) == 0
+    _, _, listed = call(app, "GET", f"/api/meals?from={_day(0)}&to={_day(11)}", token=token)
+    assert len(listed["data"]) == 5
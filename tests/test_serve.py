@@ -0,0 +1,49 @@
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+import serve
+from routes import health
+
+def _health(port):
+    try:
+        return urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=5).status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def test_sigterm_keeps_serving_draining_health_for_the_grace_period(app):
+    server = serve.PooledWSGIServer(("127.0.0.1", 0), 2)
+    server.set_app(app)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        assert _health(port) == 200
+        started = time.monotonic()
+        serve._stopper(server, 1.0)(signal.SIGTERM, None)
+        # Still accepting, and telling the load balancer to go away
+        assert _health(port) == 503
+        thread.join(5)
+        assert not thread.is_alive() and time.monotonic() - started >= 1.0
+    finally:
+        health.draining.clear()
+        if thread.is_alive():
+            server.shutdown()
+        server.pool.shutdown()
+        server.server_close()
+
+def test_second_signal_cuts_the_grace_period_short(app):
+    server = serve.PooledWSGIServer(("127.0.0.1", 0), 2)
+    server.set_app(app)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        stop = serve._stopper(server, 60)
+        stop(signal.SIGTERM, None)
+        stop(signal.SIGINT, None)
+        thread.join(5)
+        assert not thread.is_alive()
+    finally:
+        health.draining.clear()
+        server.server_close()
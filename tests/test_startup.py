@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A fresh interpreter: this one has imported the route modules already
+SCRIPT = """
+import json, sys, types
+sys.path.insert(0, sys.argv[1])
+for package in ("utils", "routes"):
+    module = sys.modules[package] = types.ModuleType(package)
+    module.__path__ = [sys.argv[1]]
+
+def loaded():
+    return sorted(name for name in sys.modules if name.startswith("routes."))
+
+import app
+from benchmarks.wsgi import call
+before = loaded()
+status = call(app.app, "GET", "/api/health")[0]
+print(json.dumps({"before": before, "status": status, "after": loaded()}))
+"""
+
+def test_route_modules_load_on_first_request(data_dir):
+    env = dict(os.environ, BAKETRACK_DATA_DIR=str(data_dir))
+    result = subprocess.run([sys.executable, "-c", SCRIPT, ROOT], cwd=str(data_dir), env=env,
+                            capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.splitlines()[-1])
+    assert report == {"before": [], "status": 200, "after": ["routes.health"]}
@@ -0,0 +1,40 @@
+from datetime import date
+from decimal import Decimal
+from utils import store
+from utils.ledger import bucket_id
+from benchmarks.wsgi import call
+
+TODAY = date.today().isoformat()
+
+def _kitchen(app, token):
+    _, _, ing = call(app, "POST", "/api/ingredients", {"name": "Flour", "unit": "kg", "category": "dry",
+                                                       "quantity": 1.2, "minQuantity": 0}, token)
+    _, _, rec = call(app, "POST", "/api/recipes", {"name": "Bread", "ingredients": [{"ingredientId": ing["id"], "quantity": 0.1}]}, token)
+    return ing["id"], rec["id"]
+
+def test_ledger_and_rollups_add_up_to_the_stock(app, token):
+    ing, rec = _kitchen(app, token)
+    meal_ids = []
+    for time in ("breakfast", "lunch", "dinner"):
+        _, _, meal = call(app, "POST", "/api/meals", {"recipeId": rec, "date": TODAY, "time": time}, token)
+        meal_ids.append(meal["mealId"])
+    call(app, "DELETE", f"/api/meals/{meal_ids[0]}", token=token)
+    call(app, "PUT", f"/api/ingredients/{ing}", {"quantity": 3}, token)
+
+    _, _, listed = call(app, "GET", f"/api/ingredients/{ing}/movements", token=token)
+    movements = listed["data"]
+    assert [m["reason"] for m in movements] == ["initial", "deduct", "deduct", "deduct", "restore", "adjust"]
+    # Each balance is the running sum of the deltas, without float drift
+    balance = Decimal(0)
+    for movement in movements:
+        balance += Decimal(str(movement["delta"]))
+        assert Decimal(str(movement["balance"])) == balance
+    assert balance == 3
+    _, _, stock = call(app, "GET", f"/api/ingredients/{ing}", token=token)
+    assert stock["data"]["quantity"] == 3
+
+    _, _, usage = call(app, "GET", f"/api/stock/usage?period=day&from={TODAY}&to={TODAY}", token=token)
+    assert usage["data"] == [{"period": TODAY, "ingredientId": ing, "name": "Flour", "unit": "kg",
+                              "used": 0.3, "restored": 0.1, "net": 0.2, "adjusted": 3.2}]
+    bucket = store.collection("stock_daily").get(bucket_id(ing, TODAY))
+    assert bucket["movements"] == len(movements)
@@ -0,0 +1,64 @@
+import os
+from utils import store
+
+def _movement(n):
+    return {"id": f"mov{n}", "userId": "u1", "ingredientId": "ing1", "reason": "deduct", "delta": -1, "balance": 100 - n}
+
+def test_ledger_appends_without_rewriting_history(data_dir):
+    store.configure(journal=False)
+    movements = store.collection("stock_movements")
+    movements.insert(_movement(0))
+    store.compact_all()
+    snapshot = os.path.join(data_dir, "stock_movements.json")
+    before = os.stat(snapshot)
+
+    for n in range(1, 51):
+        movements.insert(_movement(n))
+
+    # Each movement is one appended log line; the snapshot is left alone
+    after = os.stat(snapshot)
+    assert (after.st_size, after.st_mtime_ns) == (before.st_size, before.st_mtime_ns)
+    with open(os.path.join(data_dir, "stock_movements.log")) as log:
+        assert sum(1 for _ in log) == 50
+    # Collections without the flag keep rewriting their snapshot
+    store.collection("ingredients").insert({"id": "ing1", "userId": "u1", "name": "Flour"})
+    assert not os.path.exists(os.path.join(data_dir, "ingredients.log"))
+
+    store.configure(data_dir=str(data_dir))
+    assert len(store.collection("stock_movements").for_user("u1")) == 51
+
+def test_failed_write_keeps_memory_in_step_with_the_file(data_dir, monkeypatch):
+    ingredients = store.collection("ingredients")
+    ingredients.insert({"id": "ing1", "userId": "u1", "name": "Flour", "quantity": 5})
+
+    def full_disk(*args):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(store, "write_records", full_disk)
+    try:
+        ingredients.update({"id": "ing1", "userId": "u1", "name": "Flour", "quantity": 2})
+    except OSError:
+        pass
+    else:
+        raise AssertionError("the write should have failed")
+
+    assert ingredients.get("ing1")["quantity"] == 5
+
+def test_interrupted_commit_is_finished_on_restart(data_dir, monkeypatch):
+    def crash(records):
+        raise KeyboardInterrupt
+    meals = store.collection("meals")
+    monkeypatch.setattr(meals, "update_many", crash)
+    try:
+        with store.transaction("u1") as tx:
+            tx.put("ingredients", {"id": "ing1", "userId": "u1", "name": "Flour", "quantity": 3})
+            tx.put("meals", {"id": "meal1", "userId": "u1", "recipeId": "rec1"})
+            tx.commit()
+    except KeyboardInterrupt:
+        pass
+    assert store.collection("ingredients").get("ing1")["quantity"] == 3
+    assert meals.get("meal1") is None
+
+    store.configure(data_dir=str(data_dir))
+    store.warm()
+    assert store.collection("meals").get("meal1") is not None
+    assert not os.listdir(os.path.join(data_dir, "transactions"))